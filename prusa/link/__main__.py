@@ -15,6 +15,7 @@ from lockfile.pidlockfile import PIDLockFile  # type: ignore
 from prusa.connect.printer import __version__ as sdk_version
 
 from . import __version__ as link_version
+from .binary_log import logdump
 from .config import Config
 from .const import EXIT_TIMEOUT
 from .interesting_logger import InterestingLogger, InterestingLogRotator
@@ -111,7 +112,8 @@ def main():
         nargs='?',
         default="start",
         type=str,
-        help="daemon action (start|stop|restart|status) (default: start)")
+        help="daemon action (start|stop|restart|status|logdump) "
+        "(default: start)")
     parser.add_argument("-f",
                         "--foreground",
                         action="store_true",
@@ -189,6 +191,9 @@ def main():
 
         set_log_levels(config)
 
+        if args.command == "logdump":
+            return logdump(config.daemon.binary_log_file)
+
         pid_file = PIDLockFile(config.daemon.pid_file)
         pid = pid_file.read_pid() if pid_file.is_locked() else None
 
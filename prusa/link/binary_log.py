@@ -0,0 +1,313 @@
+"""
+Contains the BinaryLog class and the functions for decoding its file
+
+The interesting log can go into a size capped, memory mapped ring file
+instead of the syslog. A record is a few bytes: the time, the level,
+interned ids of the thread name and of the message template, and the
+packed arguments. Nothing is formatted until the file gets decoded
+by "prusalink logdump"
+"""
+import logging
+import mmap
+import os
+import struct
+from threading import Lock
+from time import monotonic, time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from .const import BINARY_LOG_ARG_MAX_LENGTH, BINARY_LOG_TEMPLATE_SIZE
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"PLBL"
+VERSION = 2
+
+# magic, version, ring size, template table used bytes, head, tail,
+# record count
+HEADER = struct.Struct("<4sHIIIII")
+# length, wall clock time, level, thread name id, template id, arg count
+RECORD = struct.Struct("<IdBHHB")
+TEMPLATE_LENGTH = struct.Struct("<H")
+PADDING = struct.Struct("<I")
+
+# A template id meaning the template is the first argument instead
+INLINE_TEMPLATE = 0xFFFF
+
+ARG_NONE = 0
+ARG_INT = 1
+ARG_FLOAT = 2
+ARG_STR = 3
+ARG_BYTES = 4
+ARG_BOOL = 5
+
+INT64 = struct.Struct("<q")
+FLOAT64 = struct.Struct("<d")
+LENGTH = struct.Struct("<H")
+
+
+class BinaryLogRecord(NamedTuple):
+    """One decoded record"""
+    timestamp: float  # wall clock
+    thread: str
+    level: int
+    template: str
+    args: Tuple[Any, ...]
+
+    def format(self) -> str:
+        """The record as a log line"""
+        try:
+            message = self.template % self.args if self.args \
+                else self.template
+        except (TypeError, ValueError):
+            message = f"{self.template} {self.args!r}"
+        return f"{self.timestamp:.6f} {logging.getLevelName(self.level)} " \
+               f"[{self.thread}] {message}"
+
+
+def pack_arg(arg: Any) -> bytes:
+    """Packs one message argument, the unknown types as their str()"""
+    if arg is None:
+        return bytes((ARG_NONE, ))
+    if isinstance(arg, bool):
+        return bytes((ARG_BOOL, int(arg)))
+    if isinstance(arg, int) and -2**63 <= arg < 2**63:
+        return bytes((ARG_INT, )) + INT64.pack(arg)
+    if isinstance(arg, float):
+        return bytes((ARG_FLOAT, )) + FLOAT64.pack(arg)
+    if isinstance(arg, (bytes, bytearray)):
+        data = bytes(arg[:BINARY_LOG_ARG_MAX_LENGTH])
+        return bytes((ARG_BYTES, )) + LENGTH.pack(len(data)) + data
+    data = str(arg).encode("utf-8", "replace")[:BINARY_LOG_ARG_MAX_LENGTH]
+    return bytes((ARG_STR, )) + LENGTH.pack(len(data)) + data
+
+
+def unpack_args(data: bytes, count: int) -> List[Any]:
+    """Unpacks the arguments packed by pack_arg"""
+    args: List[Any] = []
+    offset = 0
+    for _ in range(count):
+        arg_type = data[offset]
+        offset += 1
+        if arg_type == ARG_NONE:
+            args.append(None)
+        elif arg_type == ARG_BOOL:
+            args.append(bool(data[offset]))
+            offset += 1
+        elif arg_type == ARG_INT:
+            args.append(INT64.unpack_from(data, offset)[0])
+            offset += INT64.size
+        elif arg_type == ARG_FLOAT:
+            args.append(FLOAT64.unpack_from(data, offset)[0])
+            offset += FLOAT64.size
+        elif arg_type in (ARG_STR, ARG_BYTES):
+            length = LENGTH.unpack_from(data, offset)[0]
+            offset += LENGTH.size
+            raw = data[offset:offset + length]
+            offset += length
+            args.append(raw.decode("utf-8", "replace")
+                        if arg_type == ARG_STR else raw)
+        else:
+            raise ValueError(f"Unknown argument type {arg_type}")
+    return args
+
+
+def read_templates(buffer, used: int) -> List[str]:
+    """Reads the interned strings, their index is their id"""
+    templates = []
+    offset = HEADER.size
+    while offset < HEADER.size + used:
+        length = TEMPLATE_LENGTH.unpack_from(buffer, offset)[0]
+        offset += TEMPLATE_LENGTH.size
+        templates.append(
+            bytes(buffer[offset:offset + length]).decode("utf-8", "replace"))
+        offset += length
+    return templates
+
+
+class BinaryLog:
+    """
+    Writes log records into a ring in a memory mapped file. The file
+    is re-used after a restart, so the records from before a crash
+    are still there. The oldest records get overwritten when the ring
+    is full, a record never wraps around the ring end
+    """
+
+    def __init__(self, path: str, size: int) -> None:
+        self.path = path
+        self.lock = Lock()
+        self.ring_offset = HEADER.size + BINARY_LOG_TEMPLATE_SIZE
+        self.ring_size = max(size - self.ring_offset, RECORD.size * 16)
+        file_size = self.ring_offset + self.ring_size
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            reuse = os.fstat(fd).st_size == file_size
+            if not reuse:
+                os.ftruncate(fd, file_size)
+            self.buffer = mmap.mmap(fd, file_size)
+        finally:
+            os.close(fd)
+
+        self.templates: Dict[str, int] = {}
+        self.template_used = 0
+        self.head = self.tail = self.count = 0
+        if reuse:
+            reuse = self._load()
+        if not reuse:
+            self.buffer[:self.ring_offset] = bytes(self.ring_offset)
+        self._write_header()
+
+    def _load(self) -> bool:
+        """Picks up where the previous run stopped, if the file is valid"""
+        try:
+            (magic, version, ring_size, self.template_used, self.head,
+             self.tail, self.count) = HEADER.unpack_from(self.buffer)
+            if (magic, version, ring_size) != (MAGIC, VERSION,
+                                               self.ring_size):
+                return False
+            for template_id, template in enumerate(
+                    read_templates(self.buffer, self.template_used)):
+                self.templates[template] = template_id
+            return True
+        except (struct.error, UnicodeDecodeError):
+            log.warning("Binary log %s is damaged, starting over", self.path)
+            self.template_used = self.head = self.tail = self.count = 0
+            self.templates.clear()
+            return False
+
+    def _write_header(self) -> None:
+        """Stores the ring position, so the file can be decoded any time"""
+        HEADER.pack_into(self.buffer, 0, MAGIC, VERSION, self.ring_size,
+                         self.template_used, self.head, self.tail,
+                         self.count)
+
+    def _intern(self, template: str) -> int:
+        """Returns the template id, adds it to the table if it's new"""
+        template_id = self.templates.get(template)
+        if template_id is not None:
+            return template_id
+        data = template.encode("utf-8", "replace")
+        needed = TEMPLATE_LENGTH.size + len(data)
+        if (self.template_used + needed > BINARY_LOG_TEMPLATE_SIZE
+                or len(self.templates) >= INLINE_TEMPLATE):
+            return INLINE_TEMPLATE
+        offset = HEADER.size + self.template_used
+        TEMPLATE_LENGTH.pack_into(self.buffer, offset, len(data))
+        offset += TEMPLATE_LENGTH.size
+        self.buffer[offset:offset + len(data)] = data
+        self.template_used += needed
+        template_id = len(self.templates)
+        self.templates[template] = template_id
+        return template_id
+
+    def _evict(self) -> None:
+        """Forgets the oldest record"""
+        if self.tail + PADDING.size > self.ring_size:
+            self.tail = 0
+            return
+        length = PADDING.unpack_from(self.buffer,
+                                     self.ring_offset + self.tail)[0]
+        if length == 0:
+            self.tail = 0
+            return
+        self.tail += length
+        self.count -= 1
+
+    def write(self, timestamp: float, thread_name: str, level: int,
+              template: Any, args: tuple = ()) -> None:
+        """
+        Appends a record, timestamp is from time.monotonic(). It's stored
+        as the wall clock time, as the monotonic time starts over on every
+        boot and the file outlives those. The clock offset is taken anew
+        every time, the wall clock can jump when it gets synchronized
+        """
+        wall_time = timestamp + time() - monotonic()
+        with self.lock:
+            thread_id = self._intern(thread_name)
+            if thread_id == INLINE_TEMPLATE:
+                thread_id = self._intern("?")
+            template = str(template)
+            template_id = self._intern(template)
+            if template_id == INLINE_TEMPLATE:
+                args = (template, ) + tuple(args)
+            packed = b"".join(pack_arg(arg) for arg in args[:255])
+            length = RECORD.size + len(packed)
+            if length > self.ring_size // 2:
+                return
+
+            if self.head + length > self.ring_size:
+                # Mark the rest of the ring as unused and start over
+                while self.count > 0 and self.tail >= self.head:
+                    self._evict()
+                if self.head + PADDING.size <= self.ring_size:
+                    PADDING.pack_into(self.buffer,
+                                      self.ring_offset + self.head, 0)
+                self.head = 0
+            while self.count > 0 and \
+                    self.head <= self.tail < self.head + length:
+                self._evict()
+            if self.count == 0:
+                self.tail = self.head
+
+            offset = self.ring_offset + self.head
+            RECORD.pack_into(self.buffer, offset, length, wall_time, level,
+                             thread_id, template_id, min(len(args), 255))
+            offset += RECORD.size
+            self.buffer[offset:offset + len(packed)] = packed
+            self.head += length
+            self.count += 1
+            self._write_header()
+
+    def close(self) -> None:
+        """Flushes and un-maps the file"""
+        with self.lock:
+            self.buffer.flush()
+            self.buffer.close()
+
+
+def read_binary_log(path: str) -> Iterator[BinaryLogRecord]:
+    """Decodes the records of a binary log file, oldest first"""
+    # pylint: disable=too-many-locals
+    with open(path, "rb") as log_file:
+        data = log_file.read()
+    (magic, version, ring_size, template_used, _, tail,
+     count) = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a binary log of version {VERSION}")
+    templates = read_templates(data, template_used)
+    ring_offset = HEADER.size + BINARY_LOG_TEMPLATE_SIZE
+
+    position = tail
+    for _ in range(count):
+        if position + PADDING.size > ring_size or PADDING.unpack_from(
+                data, ring_offset + position)[0] == 0:
+            position = 0
+        offset = ring_offset + position
+        (length, timestamp, level, thread_id, template_id,
+         arg_count) = RECORD.unpack_from(data, offset)
+        args = unpack_args(data[offset + RECORD.size:offset + length],
+                           arg_count)
+        if template_id == INLINE_TEMPLATE:
+            template = str(args.pop(0))
+        else:
+            template = templates[template_id]
+        yield BinaryLogRecord(timestamp, templates[thread_id],
+                              level, template, tuple(args))
+        position += length
+
+
+def logdump(path: Optional[str]) -> int:
+    """Prints the binary log as text, the "prusalink logdump" command"""
+    if not path:
+        print("The binary log is not configured, see binary_log_size")
+        return 1
+    try:
+        for record in read_binary_log(path):
+            print(record.format())
+    except FileNotFoundError:
+        print(f"There is no binary log at {path}")
+        return 1
+    except (ValueError, struct.error, IndexError) as exception:
+        print(f"Failed to decode {path}: {exception}")
+        return 1
+    return 0
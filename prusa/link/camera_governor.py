@@ -9,7 +9,7 @@ from prusa.connect.printer.camera_configurator import CameraConfigurator
 from prusa.connect.printer.camera_controller import CameraController
 from .const import CAMERA_SCAN_INTERVAL
 from .interesting_logger import InterestingLogRotator
-from .util import loop_until
+from .util import loop_until, set_thread_nice
 
 log = logging.getLogger("my_camera_configurator")
 
@@ -18,9 +18,12 @@ class CameraGovernor:
     """A module for continually refreshing and adding cameras"""
 
     def __init__(self, camera_configurator: CameraConfigurator,
-                 camera_controller: CameraController) -> None:
+                 camera_controller: CameraController,
+                 nice: Optional[int] = None) -> None:
         self.camera_configurator = camera_configurator
         self.camera_controller = camera_controller
+        # The cameras it re-starts inherit its nice value
+        self.nice = nice
 
         self._governance_quit_event = Event()
         self._governance_thread: Optional[Thread] = None
@@ -48,6 +51,8 @@ class CameraGovernor:
             daemon=True
         )
         self._governance_thread.start()
+        if self.nice is not None:
+            set_thread_nice(self.nice, self._governance_thread.native_id)
 
     def stop(self) -> None:
         """Stops the auto-add loop"""
@@ -15,10 +15,15 @@ from prusa.connect.printer.const import CapabilityType, NotSupported, \
 from . import v4l2
 from .encoders import MJPEGEncoder, BufferDetails, \
     get_appropriate_encoder
+from ..metrics import REGISTRY
 from ..util import is_potato_cpu, prctl_name
 
 log = logging.getLogger(__name__)
 
+PHOTO_TIME = REGISTRY.histogram("prusalink_camera_photo_seconds",
+                                "Time to take and encode a photo",
+                                driver="picamera")
+
 PICAMERA_SUPPORTED = False
 try:
     from libcamera import (  # type: ignore
@@ -321,6 +326,7 @@ class PiCameraDriver(CameraDriver):
         self.controls_to_set[controls.LensPosition] = \
             self._focus_transform(focus)
 
+    @PHOTO_TIME.time()
     def take_a_photo(self):
         """Asks for eight photos but is only interested in the last one"""
         prctl_name()
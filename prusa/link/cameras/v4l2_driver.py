@@ -19,10 +19,15 @@ from prusa.connect.printer.const import CapabilityType, NotSupported, \
     CAMERA_WAIT_TIMEOUT
 from .encoders import MJPEGEncoder, BufferDetails, get_appropriate_encoder
 from . import v4l2
+from ..metrics import REGISTRY
 from ..util import is_potato_cpu, prctl_name
 
 log = logging.getLogger(__name__)
 
+PHOTO_TIME = REGISTRY.histogram("prusalink_camera_photo_seconds",
+                                "Time to take and encode a photo",
+                                driver="v4l2")
+
 
 # --- code taken from v4l2py, unused features cut
 
@@ -508,6 +513,7 @@ class V4L2Driver(CameraDriver):
         self.encoder.stride = (resolution.width
                                * BYTES_PER_PIXEL.get(pixel_format, 0))
 
+    @PHOTO_TIME.time()
     def take_a_photo(self):
         """Takes a photo, blocking while doing it"""
         prctl_name()
@@ -270,6 +270,13 @@ class FoldernameTooLong(BadRequestError):
     id = "foldername-too-long"
 
 
+class InvalidSDPath(BadRequestError):
+    """400 Invalid SD Card Path"""
+    title = "Invalid SD Card Path"
+    text = "The printer can write only 8.3 named G-code files onto the " \
+           "SD card, like /folder/file.gco"
+
+
 class FileUploadFailed(BadRequestError):
     """400 File Upload Failed"""
     title = "File Upload Failed"
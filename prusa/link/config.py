@@ -90,6 +90,12 @@ class Config(Get):
                     ("pid_file", str, "./prusalink.pid"),
                     ("power_panic_file", str, "./power_panic"),
                     ("threshold_file", str, "./threshold.data"),
+                    ("job_history_dir", str, "./job_history"),
+                    ("eta_file", str, "./eta_correction.json"),
+                    ("sd_index_file", str, "./sd_index.json"),
+                    ("binary_log_file", str, "./interesting_log.bin"),
+                    ("binary_log_size", int, 0),  # KiB, 0 is off
+                    ("uplink_spool_file", str, "./uplink_spool.json"),
                     ("user", str, "pi"),
                     ("group", str, "pi"),
                 )))
@@ -106,7 +112,9 @@ class Config(Get):
         if args.pidfile:
             self.daemon.pid_file = abspath(args.pidfile)
 
-        for file_ in ('pid_file', 'power_panic_file', 'threshold_file'):
+        for file_ in ('pid_file', 'power_panic_file', 'threshold_file',
+                      'job_history_dir', 'eta_file', 'sd_index_file',
+                      'binary_log_file', 'uplink_spool_file'):
             setattr(
                 self.daemon, file_,
                 abspath(join(self.daemon.data_dir, getattr(self.daemon,
@@ -156,6 +164,11 @@ class Config(Get):
                     ("storage", tuple, [], ':'),
                     # relative to HOME
                     ("directories", tuple, ("./PrusaLink gcodes", ), ':'),
+                    ("prioritize_serial", bool, True),
+                    ("short_gil_switch", bool, False),
+                    ("optimize_gcode", bool, False),
+                    ("fit_arcs", bool, False),
+                    ("arc_tolerance", float, 0.05),
                 )))
         if args.serial_port:
             self.printer.port = args.serial_port
@@ -174,6 +187,14 @@ class Config(Get):
                     ("auto_detect", bool, True),
                 )))
 
+        # [profiler]
+        self.profiler = Model(
+            self.get_section(
+                "profiler",
+                (
+                    ("frequency", int, 0),  # samples per second, 0 is off
+                )))
+
         Config.instance = self
 
     def set_global_log_level(self, args):
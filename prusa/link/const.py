@@ -73,7 +73,8 @@ IP_UPDATE_INTERVAL = 5
 QUIT_INTERVAL = 0.2
 SD_INTERVAL = 0.2
 SD_FILESCAN_INTERVAL = 60
-DIR_RESCAN_INTERVAL = 1
+DIR_RESCAN_INTERVAL = 1  # without inotify
+DIR_WATCH_RESCAN_INTERVAL = 60  # with inotify, in case an event got missed
 PRINTER_BOOT_WAIT = 8
 SEND_INFO_RETRY = 5
 SERIAL_REOPEN_TIMEOUT = 2
@@ -96,12 +97,28 @@ TIME_FOR_SNAPSHOT = 1
 
 # --- Lcd queue ---
 LCD_QUEUE_SIZE = 30
+# Everything gets re-checked this often, in case a change was not signalled
+LCD_FULL_CHECK_INTERVAL = 10
 
 # --- Serial queue ---
 RX_SIZE = 128  # Not used much, limits the max serial message size
 SERIAL_QUEUE_TIMEOUT = 25
 SERIAL_QUEUE_MONITOR_INTERVAL = 1
 HISTORY_LENGTH = 100  # How many messages to remember for Resends
+# Shares of the gaps in the print stream, polling vs LCD and such
+SERIAL_POLLING_WEIGHT = 3
+SERIAL_COSMETIC_WEIGHT = 1
+SERIAL_POLL_DEADLINE = 5  # Polls wait at most this long for a print gap
+
+# --- Connect uplink ---
+UPLINK_SPOOL_SIZE = 256  # events kept while Connect is unreachable
+UPLINK_MIN_BACKOFF = 1  # s, first retry after a failed send
+UPLINK_MAX_BACKOFF = 60  # s, the retries slow down up to this
+
+# --- EEPROM mirror ---
+EEPROM_SIZE = 4096
+EEPROM_MIRROR_MAX_GAP = 64  # read values this close together at once
+EEPROM_MIRROR_MAX_AGE = 1  # values polled together share one read
 
 # --- Is planner fed ---
 QUEUE_SIZE = 10000  # From how many messages to compute the percentile
@@ -114,6 +131,42 @@ USE_DYNAMIC_THRESHOLD = True  # Compute the percentile or use a fixed value?
 STATS_EVERY = 100
 TAIL_COMMANDS = 10  # how many commands after the last progress report
 PRINT_QUEUE_SIZE = 4
+READ_AHEAD_LINES = 4096  # how many G-codes to have ready for sending
+READ_AHEAD_LOW_WATER = 256  # warn about slow storage below this many
+READ_AHEAD_BLOCK_SIZE = 64 * 1024
+BYTE_POSITION_INTERVAL = 1  # report the file position at most this often
+BYTE_POSITION_DELTA = 0.01  # unless it moved by this part of the file
+ARC_MIN_SEGMENTS = 3  # fewer G1 segments are not worth an arc
+ARC_MAX_SEGMENTS = 64  # don't hold back more lines than this for one arc
+ARC_MAX_RADIUS = 1000  # mm, a bigger arc is as good as a line
+ARC_EXTRUSION_TOLERANCE = 0.05  # relative difference of the segment flows
+
+# --- Print stats ---
+MOTION_CHUNK_SIZE = 65536  # how many moves to compute the times for at once
+MOTION_TABLE_RESOLUTION = 4096  # bytes of file per time table entry
+MOTION_CORRECTION_AFTER = 60  # predicted seconds before trusting the ratio
+MOTION_CORRECTION_MIN = 0.5
+MOTION_CORRECTION_MAX = 3.0
+
+# --- ETA estimation ---
+ETA_SMOOTHING = 0.1  # weight of the newest sample in the correction
+ETA_MAX_SAMPLE_GAP = 5 * 60  # longer gaps are pauses, not printing
+ETA_FACTOR_MIN = 0.25
+ETA_FACTOR_MAX = 4.0
+ETA_MIN_WEIGHT_TO_SAVE = 0.5  # don't remember corrections of short prints
+
+# --- Job history ---
+HISTORY_SAMPLE_INTERVAL = 10
+HISTORY_FLUSH_INTERVAL = 60  # batch the journal writes, spare the SD card
+HISTORY_COMPACT_SIZE = 256 * 1024  # compact a journal growing beyond this
+HISTORY_MAX_SIZE = 16 * 1024 * 1024  # of all journals together
+
+# --- Uploads ---
+UPLOAD_BLOCK_SIZE = 1024 * 1024  # write uploads in blocks of this size
+# Write rate budget while USB printing, depends on the print's read ahead
+UPLOAD_MIN_RATE = 256 * 1024  # bytes per second
+UPLOAD_MAX_RATE = 32 * 1024 * 1024
+UPLOAD_BURST = 4 * UPLOAD_BLOCK_SIZE
 
 # --- Storage ---
 MAX_FILENAME_LENGTH = 52
@@ -128,17 +181,44 @@ BLACKLISTED_PATHS = [
 ]
 BLACKLISTED_NAMES = [SD_STORAGE_NAME]
 SFN_TO_LFN_EXTENSIONS = {"GCO": "gcode", "G": "g", "GC": "gc"}
+SD_INDEX_MAX_DIRECTORIES = 256  # remembered directory listings
+SD_UPLOAD_WINDOW = 16  # lines waiting in the serial queue during SD uploads
+SD_UPLOAD_PROGRESS_INTERVAL = 1  # report the SD upload progress this often
 
 RESET_PIN = 22  # RPi gpio pin for resetting printer
 SUPPORTED_FIRMWARE = "3.10.1"
 MINIMAL_FIRMWARE = Version(SUPPORTED_FIRMWARE)
+# The first firmware with precise G2/G3 arcs
+MINIMAL_ARC_FIRMWARE = Version("3.13.0")
 MAX_INT = (2**31) - 1
 STATE_HISTORY_SIZE = 10
 
+# --- Thread priorities ---
+# Nice values, the serial threads go first, the camera encoding
+# and the web requests wait for them
+SERIAL_THREAD_NICE = -10
+BACKGROUND_THREAD_NICE = 10
+# How often the running thread is asked to pass the GIL, in seconds
+GIL_SWITCH_INTERVAL = 0.001
+
 # --- Interesting_Logger ---
 LOG_BUFFER_SIZE = 200
+LOG_RING_DEAD_THREADS = 16  # rings of finished threads to keep around
+BINARY_LOG_TEMPLATE_SIZE = 64 * 1024  # room for interned message templates
+BINARY_LOG_ARG_MAX_LENGTH = 512  # longer str and bytes args get cut
 AFTERMATH_LOG_SIZE = 100
 
+# --- Sampling profiler ---
+PROFILER_MAX_DEPTH = 64  # deeper stacks get cut off
+PROFILER_MAX_STACKS = 4096  # distinct stacks to remember
+PROFILER_CPU_INTERVAL = 5  # how often to read the per thread CPU time
+
+# --- Metrics ---
+# Histogram buckets span powers of two from 2^MIN to 2^MAX seconds
+HISTOGRAM_MIN_EXPONENT = -14  # ~61 us
+HISTOGRAM_MAX_EXPONENT = 7  # 128 s
+HISTOGRAM_SUB_BUCKETS = 4
+
 # --- Selected log files---
 GZ_SUFFIX = ".gz"
 LOGS_PATH = "/var/log"
@@ -184,6 +264,14 @@ class LimitsFDM:
     temp_nozzle_min = 0
     temp_nozzle_max = 305
 
+    # --- Motion limits for time estimation (firmware defaults) ---
+    # in mm/s and mm/s^2, the feedrates above are in mm/min for commands
+    max_feedrate_x = 200
+    max_feedrate_y = 200
+    max_feedrate_z = 12
+    max_feedrate_e = 120
+    acceleration = 1250
+
 
 class LimitsMK25(LimitsFDM):
     """Printer MK2.5 Limits object"""
@@ -221,6 +309,13 @@ class LimitsMK3S(LimitsFDM):
     subversion = 1
 
 
+PRINTER_LIMITS = {
+    PrinterType.I3MK25: LimitsMK25,
+    PrinterType.I3MK25S: LimitsMK25S,
+    PrinterType.I3MK3: LimitsMK3,
+    PrinterType.I3MK3S: LimitsMK3S,
+}
+
 PRINT_STATE_PAIRING = {
     "sdn_lfn": PrintState.SD_PRINTING,
     "sd_paused": PrintState.SD_PAUSED,
@@ -7,7 +7,9 @@ from typing import List
 
 import prctl  # type: ignore
 
+from .binary_log import BinaryLog
 from .config import Settings
+from .interesting_logger import InterestingLogRotator
 from .printer_adapter import prusa_link
 from .printer_adapter.prusa_link import PrusaLink
 from .printer_adapter.updatable import Thread
@@ -57,6 +59,10 @@ class Daemon:
 
         prctl.set_name("pl#main")
         self.settings = Settings(self.cfg.printer.settings)
+        if self.cfg.daemon.binary_log_size:
+            InterestingLogRotator.get_instance().set_binary_log(
+                BinaryLog(self.cfg.daemon.binary_log_file,
+                          self.cfg.daemon.binary_log_size * 1024))
         self.http = ExThread(target=run_http,
                              args=(self, not daemon),
                              name="http")
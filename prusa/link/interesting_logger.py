@@ -3,12 +3,15 @@ import logging
 import sys
 import threading
 import traceback
-from collections import deque
 from copy import copy
+from heapq import merge
 from logging import CRITICAL, DEBUG, ERROR, INFO, NOTSET, WARNING, Logger
-from multiprocessing import RLock
+from threading import RLock, current_thread, local
+from time import monotonic
+from typing import List, Optional
 
-from .const import AFTERMATH_LOG_SIZE, LOG_BUFFER_SIZE
+from .binary_log import BinaryLog
+from .const import AFTERMATH_LOG_SIZE, LOG_BUFFER_SIZE, LOG_RING_DEAD_THREADS
 from .printer_adapter.structures.mc_singleton import MCSingleton
 
 log = logging.getLogger("interesting_logger")
@@ -43,17 +46,74 @@ class DecoySrcfile:
 logging._srcfile = DecoySrcfile()  # type: ignore
 
 
+class LogRing:
+    """
+    A preallocated ring of log records, written only by its own thread,
+    so it needs no lock. A record is the time, the level and references
+    to the message and its arguments, nothing gets formatted until
+    the records are needed
+    """
+
+    def __init__(self, thread: threading.Thread) -> None:
+        self.thread = thread
+        self.records: List[Optional[tuple]] = [None] * LOG_BUFFER_SIZE
+        self.index = 0
+
+    def append(self, level, msg, args, kwargs) -> None:
+        """Overwrites the oldest record"""
+        self.records[self.index] = (monotonic(), level, msg, args, kwargs)
+        self.index = (self.index + 1) % LOG_BUFFER_SIZE
+
+    def get_records(self, since: float) -> List[tuple]:
+        """
+        The records newer than since, oldest first,
+        with the thread name after the time
+        """
+        index = self.index
+        name = self.thread.name
+        # Copying a list is atomic, the owner can keep on writing
+        records = self.records[index:] + self.records[:index]
+        return [(record[0], name) + record[1:] for record in records
+                if record is not None and record[0] > since]
+
+
 class InterestingLogRotator(metaclass=MCSingleton):
     """
-    Stores all logs in a rotating queue, on trigger logs the current queue
-    plus AFTERMATH_LOG_SIZE messages forward
+    Stores all logs in per thread rotating buffers, on trigger logs the
+    newest LOG_BUFFER_SIZE of them plus AFTERMATH_LOG_SIZE messages forward
     """
 
     def __init__(self):
-        self.log_buffer = deque(maxlen=LOG_BUFFER_SIZE)
+        self.rings: List[LogRing] = []
+        self.thread_ring = local()
+        # Records older than this have already been dumped
+        self.dumped_until = 0.0
         self.additional_messages_to_print = 0
         self.log_lock = RLock()
         self.skipped_loggers = set()
+        # When set, triggered dumps go here instead of the text log
+        self.binary_log: Optional[BinaryLog] = None
+
+    def set_binary_log(self, binary_log: Optional[BinaryLog]):
+        """Starts or stops recording the dumps into a binary log"""
+        with self.log_lock:
+            self.binary_log = binary_log
+
+    def _get_ring(self) -> LogRing:
+        """Returns the ring of the calling thread, makes one if needed"""
+        ring = getattr(self.thread_ring, "ring", None)
+        if ring is not None:
+            return ring
+        ring = LogRing(current_thread())
+        self.thread_ring.ring = ring
+        with self.log_lock:
+            # Forget the oldest finished threads, keep the newer ones,
+            # they could have logged what led up to a trigger
+            dead = [old for old in self.rings if not old.thread.is_alive()]
+            for old in dead[:max(0, len(dead) - LOG_RING_DEAD_THREADS)]:
+                self.rings.remove(old)
+            self.rings = self.rings + [ring]
+        return ring
 
     def skip_logger(self, logger_to_skip):
         """
@@ -77,15 +137,20 @@ class InterestingLogRotator(metaclass=MCSingleton):
         """
         If the log entry should be written out and was not, lets do it
         if there is nothing interesting going on, adds the log entry
-        ino the rotating queue
+        into the calling thread's ring without taking any lock
         """
-        with self.log_lock:
-            if self.additional_messages_to_print > 0:
-                self.additional_messages_to_print -= 1
-                if not got_printed:
-                    self._log(level, msg, *args, **kwargs)
-            else:
-                self.log_buffer.appendleft((level, msg, args, kwargs))
+        if self.additional_messages_to_print > 0:
+            with self.log_lock:
+                if self.additional_messages_to_print > 0:
+                    self.additional_messages_to_print -= 1
+                    if self.binary_log is not None:
+                        self.binary_log.write(monotonic(),
+                                              current_thread().name, level,
+                                              msg, args)
+                    elif not got_printed:
+                        self._log(level, msg, *args, **kwargs)
+                    return
+        self._get_ring().append(level, msg, args, kwargs)
 
     @staticmethod
     def _log(level, msg, *args, **kwargs):
@@ -113,9 +178,20 @@ class InterestingLogRotator(metaclass=MCSingleton):
         """
         with self.log_lock:
             self.additional_messages_to_print = AFTERMATH_LOG_SIZE
+            dumped_until = monotonic()
+            records = list(merge(*(ring.get_records(self.dumped_until)
+                                   for ring in self.rings),
+                                 key=lambda record: record[0]))
+            self.dumped_until = dumped_until
+            if self.binary_log is not None:
+                log.warning("Interesting log triggered by %s, recorded "
+                            "into %s", by_what, self.binary_log.path)
+                self._record(by_what, records[-LOG_BUFFER_SIZE:])
+                return
+
             log.warning("Interesting log triggered by %s", by_what)
-            while self.log_buffer:
-                level, msg, args, kwargs = self.log_buffer.pop()
+            for record in records[-LOG_BUFFER_SIZE:]:
+                _, _, level, msg, args, kwargs = record
                 self._log(level, msg, *args, **kwargs)
 
             log.warning("Repeat - triggered by %s", by_what)
@@ -140,6 +216,27 @@ class InterestingLogRotator(metaclass=MCSingleton):
                                 thread.name)
                 log.warning("")  # An empty line for better orientation
 
+    def _record(self, by_what: str, records: List[tuple]):
+        """Writes the dump into the binary log, stack traces included"""
+        binary_log = self.binary_log
+        assert binary_log is not None
+        name = current_thread().name
+        binary_log.write(monotonic(), name, WARNING,
+                         "Interesting log triggered by %s", (by_what, ))
+        for timestamp, thread_name, level, msg, args, _ in records:
+            binary_log.write(timestamp, thread_name, level, msg, args)
+
+        frames = sys._current_frames()
+        for thread in threading.enumerate():
+            frame = frames.get(thread.ident)  # type: ignore
+            if frame is None:
+                continue
+            binary_log.write(monotonic(), thread.name, WARNING,
+                             "Stack trace:")
+            for stack_frame in traceback.extract_stack(frame).format():
+                binary_log.write(monotonic(), thread.name, WARNING, "%s",
+                                 (stack_frame.rstrip(), ))
+
 
 class InterestingLogger(Logger):
     """The logger that will mirror log entries to the log rotator"""
@@ -0,0 +1,155 @@
+"""
+A lightweight registry of counters and histograms for the hot paths,
+exported in the Prometheus text format
+
+The metrics take no locks on update. An increment from two threads at once
+can very rarely get lost, which is a fair price for keeping the serial
+threads free of lock contention.
+"""
+from bisect import bisect_left
+from functools import wraps
+from threading import Lock
+from time import monotonic
+from typing import Dict, List, Tuple, Union
+
+from .const import (HISTOGRAM_MAX_EXPONENT, HISTOGRAM_MIN_EXPONENT,
+                    HISTOGRAM_SUB_BUCKETS)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def make_bounds() -> List[float]:
+    """
+    HDR-like bucket bounds, every power of two split into linear
+    sub-buckets, so the relative error is the same at every scale
+    """
+    bounds = []
+    for exponent in range(HISTOGRAM_MIN_EXPONENT, HISTOGRAM_MAX_EXPONENT):
+        low = 2.0**exponent
+        for sub_bucket in range(HISTOGRAM_SUB_BUCKETS):
+            bounds.append(low + low * sub_bucket / HISTOGRAM_SUB_BUCKETS)
+    bounds.append(2.0**HISTOGRAM_MAX_EXPONENT)
+    return bounds
+
+
+BOUNDS = make_bounds()
+
+
+def format_labels(labels: LabelKey, **extra: str) -> str:
+    """Makes the {name="value"} part of a metric line"""
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    inner = ",".join(f'{name}="{value}"' for name, value in pairs)
+    return f"{{{inner}}}"
+
+
+class Counter:
+    """A number that only goes up"""
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        """Increments the counter"""
+        self.value += amount
+
+    def export(self, name: str, labels: LabelKey) -> List[str]:
+        """Prometheus text lines of the counter"""
+        return [f"{name}{format_labels(labels)} {self.value}"]
+
+
+class Histogram:
+    """Counts observed values into fixed buckets"""
+
+    def __init__(self) -> None:
+        self.buckets = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Records a value, the last bucket is for everything too big"""
+        self.buckets[bisect_left(BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def time(self):
+        """Decorator recording how long the decorated function runs"""
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                started_at = monotonic()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.observe(monotonic() - started_at)
+            return wrapper
+        return decorator
+
+    def export(self, name: str, labels: LabelKey) -> List[str]:
+        """
+        Prometheus text lines of the histogram, every bucket counts
+        all the values up to its bound
+        """
+        lines = []
+        cumulative = 0
+        for bound, count in zip(BOUNDS, self.buckets):
+            cumulative += count
+            lines.append(f"{name}_bucket{format_labels(labels, le=str(bound))}"
+                         f" {cumulative}")
+        lines.append(f"{name}_bucket{format_labels(labels, le='+Inf')} "
+                     f"{self.count}")
+        lines.append(f"{name}_sum{format_labels(labels)} {self.sum}")
+        lines.append(f"{name}_count{format_labels(labels)} {self.count}")
+        return lines
+
+
+Metric = Union[Counter, Histogram]
+
+
+class MetricsRegistry:
+    """
+    Keeps the metrics by name and labels. Looking up a metric takes a lock,
+    so look them up once and keep the reference
+    """
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.metrics: Dict[str, Tuple[str, str, Dict[LabelKey, Metric]]] = {}
+
+    def _get(self, metric_class, metric_type, name, help_text, labels):
+        """Returns an existing metric, or makes a new one"""
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = (metric_type, help_text, {})
+            series = self.metrics[name][2]
+            if key not in series:
+                series[key] = metric_class()
+            return series[key]
+
+    def counter(self, name: str, help_text: str, **labels: str) -> Counter:
+        """Returns the counter with the given name and labels"""
+        return self._get(Counter, "counter", name, help_text, labels)
+
+    def histogram(self, name: str, help_text: str,
+                  **labels: str) -> Histogram:
+        """Returns the histogram with the given name and labels"""
+        return self._get(Histogram, "histogram", name, help_text, labels)
+
+    def export(self) -> str:
+        """All the metrics in the Prometheus text format"""
+        lines = []
+        with self.lock:
+            metrics = [(name, metric_type, help_text, dict(series))
+                       for name, (metric_type, help_text, series)
+                       in self.metrics.items()]
+        for name, metric_type, help_text, series in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, metric in series.items():
+                lines.extend(metric.export(name, labels))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,351 @@
+"""
+Contains implementation of the ArcFitter class
+
+Curves sliced without arc support are thousands of tiny G1 segments.
+Every one of them is a round trip to the printer, so the command rate
+instead of the motion limits sets the print speed. Runs of segments
+lying on a circle get replaced by a single G2 or G3
+"""
+import logging
+from math import pi
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from ..const import (ARC_EXTRUSION_TOLERANCE, ARC_MAX_RADIUS,
+                     ARC_MAX_SEGMENTS, ARC_MIN_SEGMENTS)
+from ..metrics import REGISTRY
+from .gcode_line import GcodeLine
+from .gcode_optimizer import canonical_number
+
+log = logging.getLogger(__name__)
+
+REPLACED_SEGMENTS = REGISTRY.counter(
+    "prusalink_arc_fitter_replaced_segments_total",
+    "G1 segments of USB prints replaced by arcs")
+ARCS = REGISTRY.counter(
+    "prusalink_arc_fitter_arcs_total",
+    "Arcs sent instead of G1 segments in USB prints")
+
+# G-codes not moving the print head, or moving it back where it was
+KEEPING_POSITION = frozenset(("G4", "G21", "G90", "G91", "G92"))
+
+
+class Arc(NamedTuple):
+    """A circle fitted through the points of a run"""
+    center: Tuple[float, float]
+    clockwise: bool
+
+
+class Segment(NamedTuple):
+    """A G1 move, which can become a part of an arc"""
+    target: Tuple[float, float]
+    extrusion: Optional[float]  # None for travel moves
+    words: Dict[str, str]
+
+
+def format_number(number: float, digits: int) -> str:
+    """Formats the number with at most the given count of decimals"""
+    return canonical_number(f"{number:.{digits}f}")
+
+
+def circle_center(start: np.ndarray, middle: np.ndarray,
+                  end: np.ndarray) -> Optional[np.ndarray]:
+    """The center of the circle through the points, None if on a line"""
+    determinant = 2 * (start[0] * (middle[1] - end[1])
+                       + middle[0] * (end[1] - start[1])
+                       + end[0] * (start[1] - middle[1]))
+    if abs(determinant) < 1e-9:
+        return None
+    start_sq = start @ start
+    middle_sq = middle @ middle
+    end_sq = end @ end
+    return np.array((
+        (start_sq * (middle[1] - end[1]) + middle_sq * (end[1] - start[1])
+         + end_sq * (start[1] - middle[1])) / determinant,
+        (start_sq * (end[0] - middle[0]) + middle_sq * (start[0] - end[0])
+         + end_sq * (middle[0] - start[0])) / determinant))
+
+
+def on_circle(points: np.ndarray, offsets: np.ndarray, radius: float,
+              tolerance: float) -> bool:
+    """
+    Are the points, given also as offsets from the center, and the
+    segments between them within the tolerance of the circle?
+    """
+    distances = np.hypot(offsets[:, 0], offsets[:, 1])
+    if np.abs(distances - radius).max() > tolerance:
+        return False
+    # How far the middle of each chord is from the circle
+    chords = np.diff(points, axis=0)
+    half_lengths = np.hypot(chords[:, 0], chords[:, 1]) / 2
+    sagittas = radius - np.sqrt(np.maximum(radius**2 - half_lengths**2, 0))
+    return bool(sagittas.max() <= tolerance)
+
+
+def turn_direction(offsets: np.ndarray) -> Optional[bool]:
+    """
+    True for clockwise, False for counterclockwise. None if the points
+    given as offsets from the center do not all go one way around,
+    or if they make a full circle
+    """
+    cross = offsets[:-1, 0] * offsets[1:, 1] - offsets[:-1, 1] * offsets[1:, 0]
+    if not ((cross > 0).all() or (cross < 0).all()):
+        return None
+    dot = (offsets[:-1] * offsets[1:]).sum(axis=1)
+    if np.arctan2(np.abs(cross), dot).sum() >= 2 * pi - 0.1:
+        return None
+    return bool(cross[0] < 0)
+
+
+def fit_arc(points: np.ndarray, tolerance: float) -> Optional[Arc]:
+    """
+    Fits a circle through the first, the middle and the last point.
+    Returns it, if every point and every segment between them is
+    within the tolerance of the circle, they all go in one direction
+    and do not make a full circle. Otherwise returns None
+    """
+    center = circle_center(points[0], points[len(points) // 2], points[-1])
+    if center is None:
+        return None
+    offsets = points - center
+    radius = float(np.hypot(*offsets[0]))
+    if not tolerance < radius <= ARC_MAX_RADIUS \
+            or not on_circle(points, offsets, radius, tolerance):
+        return None
+    clockwise = turn_direction(offsets)
+    if clockwise is None:
+        return None
+    return Arc((float(center[0]), float(center[1])), clockwise)
+
+
+class ArcFitter:
+    """
+    Streams the printed lines through, holding back the G1 moves, which
+    could be a part of an arc. Keeps track of the position and of the
+    modes, anything it does not understand ends the current run.
+
+    Only runs in the XY plane with absolute positioning are fitted. The
+    extrusion has to be even along the run, or missing for travel moves
+    """
+
+    def __init__(self, tolerance: float) -> None:
+        self.tolerance = tolerance
+
+        # Where the print head is after the last fed line, None if unknown
+        self.position: Optional[Tuple[float, float]] = None
+        self.relative = False
+        self.relative_e = False
+        self.e_position: Optional[float] = None
+        self.feed_rate: Optional[str] = None
+
+        # The run of segments being fitted
+        self.lines: List[GcodeLine] = []
+        self.segments: List[Segment] = []
+        self.start: Optional[Tuple[float, float]] = None
+        self.arc: Optional[Arc] = None
+
+        self.replaced_segments = 0
+        self.arcs = 0
+
+    def feed(self, line: GcodeLine) -> List[GcodeLine]:
+        """
+        Takes the next line, returns the lines ready to be sent,
+        which might be none
+        """
+        segment = None
+        if not line.layer_change:
+            segment = self._parse_segment(line.gcode)
+        if segment is None:
+            ready = self.flush()
+            self._track(line.gcode)
+            ready.append(line)
+            return ready
+
+        ready = []
+        feed_rate = segment.words.get("F")
+        if self.lines and feed_rate is not None \
+                and feed_rate != self.feed_rate:
+            # A run has to have one feed rate, this starts a new one
+            ready.extend(self.flush())
+        ready.extend(self._add(line, segment))
+        self._track(line.gcode)
+        return ready
+
+    def flush(self) -> List[GcodeLine]:
+        """Returns the held back lines, as an arc if they make one"""
+        if not self.lines:
+            return []
+        if self.arc is not None and len(self.segments) >= ARC_MIN_SEGMENTS:
+            ready = [self._make_arc()]
+        else:
+            ready = list(self.lines)
+        self._start_run(None)
+        return ready
+
+    def _start_run(self, start: Optional[Tuple[float, float]]) -> None:
+        """Forgets the current run, a new one begins at the given point"""
+        self.lines = []
+        self.segments = []
+        self.start = start
+        self.arc = None
+
+    def _add(self, line: GcodeLine, segment: Segment) -> List[GcodeLine]:
+        """Adds the segment to the run, if it still makes an arc"""
+        ready: List[GcodeLine] = []
+        if not self.lines:
+            self.start = self.position
+        while True:
+            segments = self.segments + [segment]
+            arc = None
+            if len(segments) >= 2:
+                arc = self._fit(segments)
+            if len(segments) < 2 or arc is not None:
+                self.lines.append(line)
+                self.segments = segments
+                self.arc = arc
+                if len(segments) >= ARC_MAX_SEGMENTS:
+                    ready.extend(self.flush())
+                return ready
+            if len(self.segments) >= ARC_MIN_SEGMENTS:
+                # The run made an arc, the segment begins the next one
+                end = self.segments[-1].target
+                ready.append(self._make_arc())
+                self._start_run(end)
+                continue
+            # No arc starts with the oldest segment, try without it
+            ready.append(self.lines.pop(0))
+            self.start = self.segments.pop(0).target
+            self.arc = None
+
+    def _fit(self, segments: List[Segment]) -> Optional[Arc]:
+        """Fits an arc through the run start and the segments"""
+        assert self.start is not None
+        points = np.array([self.start] + [seg.target for seg in segments])
+        extrusions = [seg.extrusion for seg in segments]
+        if any(extrusion is None for extrusion in extrusions):
+            if not all(extrusion is None for extrusion in extrusions):
+                return None
+        else:
+            chords = np.diff(points, axis=0)
+            ratios = np.array(extrusions) / np.hypot(chords[:, 0],
+                                                     chords[:, 1])
+            mean = ratios.mean()
+            if np.abs(ratios - mean).max() > abs(mean) * \
+                    ARC_EXTRUSION_TOLERANCE:
+                return None
+        return fit_arc(points, self.tolerance)
+
+    def _make_arc(self) -> GcodeLine:
+        """The G2 or G3 replacing the current run"""
+        assert self.arc is not None and self.start is not None
+        first, last = self.segments[0], self.segments[-1]
+        center_x, center_y = self.arc.center
+        end_x, end_y = last.target
+        words = [
+            "G2" if self.arc.clockwise else "G3",
+            "X" + last.words.get("X", format_number(end_x, 3)),
+            "Y" + last.words.get("Y", format_number(end_y, 3)),
+            "I" + format_number(center_x - self.start[0], 3),
+            "J" + format_number(center_y - self.start[1], 3),
+        ]
+        if last.extrusion is not None:
+            if self.relative_e:
+                extrusion = sum(seg.extrusion or 0 for seg in self.segments)
+                words.append("E" + format_number(extrusion, 5))
+            else:
+                words.append("E" + last.words["E"])
+        if "F" in first.words:
+            words.append("F" + first.words["F"])
+
+        self.replaced_segments += len(self.segments)
+        self.arcs += 1
+        REPLACED_SEGMENTS.inc(len(self.segments))
+        ARCS.inc()
+        return self.lines[-1]._replace(gcode=" ".join(words))
+
+    @staticmethod
+    def _parse_words(words: List[str]) -> Optional[Dict[str, str]]:
+        """The parameters by their letters, None if they can't be parsed"""
+        parameters = {}
+        for word in words:
+            if len(word) < 2 or word[0] in parameters:
+                return None
+            try:
+                float(word[1:])
+            except ValueError:
+                return None
+            parameters[word[0]] = word[1:]
+        return parameters
+
+    def _parse_segment(self, gcode: str) -> Optional[Segment]:
+        """Parses a G1 move, None if it can't be a part of an arc"""
+        words = gcode.split()
+        if not words or words[0] != "G1" or self.relative \
+                or self.position is None:
+            return None
+        parameters = self._parse_words(words[1:])
+        if parameters is None or not set(parameters) <= set("XYEF"):
+            return None
+        target = (float(parameters.get("X", self.position[0])),
+                  float(parameters.get("Y", self.position[1])))
+        if target == self.position:
+            return None
+        extrusion = None
+        if "E" in parameters:
+            extrusion = float(parameters["E"])
+            if not self.relative_e:
+                if self.e_position is None:
+                    return None
+                extrusion -= self.e_position
+        if "F" in parameters:
+            parameters["F"] = canonical_number(parameters["F"])
+        return Segment(target, extrusion, parameters)
+
+    def _track(self, gcode: str) -> None:
+        """Follows the position and the modes the line changes"""
+        words = gcode.split()
+        if not words:
+            return
+        command = words[0]
+        if command in {"G0", "G1", "G2", "G3", "G92"}:
+            self._track_move(command, words[1:])
+        elif command == "G90":
+            self.relative = False
+        elif command == "G91":
+            self.relative = True
+        elif command == "M82":
+            self.relative_e = False
+        elif command == "M83":
+            self.relative_e = True
+        elif command.startswith("G") and command not in KEEPING_POSITION:
+            # Homing, leveling and the like, the position is unknown now
+            self.position = None
+
+    def _track_move(self, command: str, words: List[str]) -> None:
+        """Follows the position a move or a G92 sets"""
+        parameters = self._parse_words(words)
+        if parameters is None:
+            self.position = self.e_position = None
+            return
+        if "F" in parameters and command != "G92":
+            self.feed_rate = canonical_number(parameters["F"])
+        if "E" in parameters and (command == "G92" or not (
+                self.relative_e or self.relative)):
+            self.e_position = float(parameters["E"])
+        if command != "G92" and self.relative:
+            self.position = None
+        elif "X" in parameters or "Y" in parameters:
+            if self.position is not None:
+                self.position = (
+                    float(parameters.get("X", self.position[0])),
+                    float(parameters.get("Y", self.position[1])))
+            elif "X" in parameters and "Y" in parameters:
+                self.position = (float(parameters["X"]),
+                                 float(parameters["Y"]))
+
+    def report(self) -> None:
+        """Logs how many segments got replaced"""
+        if self.arcs:
+            log.info("Arc fitting replaced %s segments by %s arcs",
+                     self.replaced_segments, self.arcs)
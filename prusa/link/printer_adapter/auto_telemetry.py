@@ -1,13 +1,13 @@
 """Contains implementation of the ReportingEnsurer class"""
 from re import Match
 from time import time
+from typing import Any, Dict
 
 from ..const import REPORTING_TIMEOUT
 from ..serial.helpers import enqueue_instruction, wait_for_instruction
 from ..serial.serial_parser import ThreadedSerialParser
 from ..serial.serial_queue import SerialQueue
 from .model import Model
-from .structures.model_classes import Telemetry
 from .structures.regular_expressions import (FAN_REGEX, HEATING_HOTEND_REGEX,
                                              HEATING_REGEX, POSITION_REGEX,
                                              TEMPERATURE_REGEX)
@@ -41,6 +41,9 @@ class AutoTelemetry(ThreadedUpdatable):
         self.last_seen_fans = 0.
         self.last_seen_temps = 0.
 
+    # These get called for every autoreport line, so the values go to the
+    # telemetry passer as they are, without building a Telemetry model
+
     def temps_recorded(self, sender, match: Match):
         """
         Reset the timeout for temperatures
@@ -50,13 +53,13 @@ class AutoTelemetry(ThreadedUpdatable):
         self.last_seen_temps = time()
 
         values = match.groupdict()
-        telemetry = Telemetry(temp_nozzle=float(values["ntemp"]))
+        telemetry: Dict[str, Any] = {"temp_nozzle": float(values["ntemp"])}
         if "btemp" in values:
-            telemetry.temp_bed = float(values["btemp"])
+            telemetry["temp_bed"] = float(values["btemp"])
         if "set_ntemp" in values and "set_btemp" in values:
-            telemetry.target_nozzle = float(values["set_ntemp"])
-            telemetry.target_bed = float(values["set_btemp"])
-        self.telemetry_passer.set_telemetry(telemetry)
+            telemetry["target_nozzle"] = float(values["set_ntemp"])
+            telemetry["target_bed"] = float(values["set_btemp"])
+        self.telemetry_passer.set_telemetry_values(telemetry)
 
     def positions_recorded(self, sender, match: Match):
         """
@@ -66,11 +69,10 @@ class AutoTelemetry(ThreadedUpdatable):
         assert sender is not None
         self.last_seen_positions = time()
 
-        values = match.groupdict()
-        self.telemetry_passer.set_telemetry(
-            Telemetry(axis_x=float(values["x"]),
-                      axis_y=float(values["y"]),
-                      axis_z=float(values["z"])))
+        self.telemetry_passer.set_telemetry_values({
+            "axis_x": float(match.group("x")),
+            "axis_y": float(match.group("y")),
+            "axis_z": float(match.group("z"))})
 
     def fans_recorded(self, sender, match: Match):
         """
@@ -80,14 +82,15 @@ class AutoTelemetry(ThreadedUpdatable):
         assert sender is not None
         self.last_seen_fans = time()
 
-        values = match.groupdict()
-        self.telemetry_passer.set_telemetry(
-            Telemetry(fan_extruder=int(values["hotend_rpm"]),
-                      fan_hotend=int(values["hotend_rpm"]),
-                      fan_print=int(values["print_rpm"]),
-                      target_fan_extruder=int(values["hotend_power"]),
-                      target_fan_hotend=int(values["hotend_power"]),
-                      target_fan_print=int(values["print_power"])))
+        hotend_rpm = int(match.group("hotend_rpm"))
+        hotend_power = int(match.group("hotend_power"))
+        self.telemetry_passer.set_telemetry_values({
+            "fan_extruder": hotend_rpm,
+            "fan_hotend": hotend_rpm,
+            "fan_print": int(match.group("print_rpm")),
+            "target_fan_extruder": hotend_power,
+            "target_fan_hotend": hotend_power,
+            "target_fan_print": int(match.group("print_power"))})
 
     def update(self):
         """
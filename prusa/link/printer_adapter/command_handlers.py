@@ -1,11 +1,12 @@
 """
 Implements all command PrusaLink command handlers
 Start, pause, resume and stop print as well as one for executing arbitrary
-gcodes, resetting the printer and sending the job info
+gcodes, resetting the printer, sending the job info and uploading to the SD
 """
 
 import abc
 import logging
+import os
 from pathlib import Path
 from re import Match
 from threading import Event
@@ -13,15 +14,21 @@ from time import time
 from typing import Dict, Optional, Set
 
 from prusa.connect.printer.const import Event as EventConst
-from prusa.connect.printer.const import Source, State
+from prusa.connect.printer.const import Source, State, TransferType
+from prusa.connect.printer.download import (FilenameTooLongError,
+                                            FoldernameTooLongError,
+                                            ForbiddenCharactersError,
+                                            TransferRunningError)
 
 from ..const import (PRINTER_BOOT_WAIT, QUIT_INTERVAL, RESET_PIN,
-                     SERIAL_QUEUE_TIMEOUT, STATE_CHANGE_TIMEOUT)
+                     SD_STORAGE_NAME, SERIAL_QUEUE_TIMEOUT,
+                     STATE_CHANGE_TIMEOUT)
 from ..serial.helpers import enqueue_instruction, enqueue_list_from_str
 from ..util import file_is_on_sd, round_to_five
 from .command import Command, NotStateToPrint, CommandFailed, FileNotFound
+from .filesystem.sd_upload import SDUpload, is_sfn_path
 from .state_manager import StateChange
-from .structures.model_classes import JobState
+from .structures.model_classes import JobState, SDState
 from .structures.regular_expressions import (OPEN_RESULT_REGEX,
                                              PRINTER_BOOT_REGEX,
                                              REJECTION_REGEX)
@@ -506,3 +513,59 @@ class CancelReady(Command):
             raise CommandFailed("Cannot cancel READY when not actually ready.")
         self.state_manager.idle()
         self.state_manager.stop_expecting_change()
+
+
+class UploadToSD(Command):
+    """Class for copying a file from the local storage onto the SD card"""
+    command_name = "upload_to_sd"
+
+    def __init__(self, path: str, sd_path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path_string = path
+        # The 8.3 path on the SD card, the firmware cannot do long names
+        self.sd_path = sd_path
+
+    def _run_command(self):
+        """
+        Streams the file onto the SD card. The printer cannot do anything
+        else in the meantime, so it's not possible while printing
+        """
+        if self.model.state_manager.printing_state is not None:
+            raise CommandFailed("Cannot write to the SD card while printing")
+
+        if self.model.sd_card.sd_state != SDState.PRESENT:
+            raise CommandFailed("There is no SD card to write to")
+
+        if not is_sfn_path(self.sd_path):
+            raise CommandFailed(
+                f"{self.sd_path} is not an 8.3 path of a G-code file")
+
+        if self.printer.fs.get(self.path_string) is None:
+            raise FileNotFound(
+                f"The file at {self.path_string} does not exist.")
+        os_path = self.printer.fs.get_os_path(self.path_string)
+
+        transfer = self.printer.transfer
+        try:
+            transfer.start(TransferType.FROM_PRINTER,
+                           f"/{SD_STORAGE_NAME}{self.sd_path}")
+        except (TransferRunningError, ForbiddenCharactersError,
+                FilenameTooLongError, FoldernameTooLongError) as exception:
+            raise CommandFailed(
+                "Cannot upload to the SD card now") from exception
+        transfer.size = os.path.getsize(os_path)
+        transfer.start_ts = time()
+
+        upload = SDUpload(self.serial_queue, os_path, self.sd_path, transfer)
+        try:
+            finished = upload.run(
+                lambda: self.running and not transfer.stop_ts)
+        finally:
+            transfer.type = TransferType.NO_TRANSFER
+            # Have the new file show up in the file tree
+            self.model.sd_card.invalidated = True
+
+        if not finished:
+            raise CommandFailed(
+                f"Upload to the SD card stopped at line "
+                f"{upload.confirmed_line}")
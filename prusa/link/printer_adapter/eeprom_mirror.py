@@ -0,0 +1,174 @@
+"""
+Contains implementation of the EEPROMMirror class
+
+Keeps a local image of the printer EEPROM parts PrusaLink knows about.
+Instead of a D3 read per value, the near values get read at once
+"""
+import logging
+import struct
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from ..const import (EEPROM_MIRROR_MAX_AGE, EEPROM_MIRROR_MAX_GAP,
+                     EEPROM_SIZE, SERIAL_POLL_DEADLINE)
+from ..serial.helpers import (enqueue_instruction, enqueue_matchable,
+                              wait_for_instruction)
+from ..serial.instruction import Instruction, Priority
+from ..serial.serial_queue import SerialQueue
+from ..util import get_d3_code
+from .structures.model_classes import EEPROMParams
+from .structures.regular_expressions import D3_OUTPUT_REGEX
+
+log = logging.getLogger(__name__)
+
+
+def span(params: Iterable[EEPROMParams]) -> Tuple[int, int]:
+    """The address and the size of the part covering all the values"""
+    address = min(param.value[0] for param in params)
+    return address, max(sum(param.value) for param in params) - address
+
+
+def describe(params: Iterable[EEPROMParams]) -> str:
+    """The EEPROM part of the values, for the logs"""
+    address, size = span(params)
+    return f"EEPROM 0x{address:04X}-0x{address + size - 1:04X}"
+
+
+class EEPROMRegion:
+    """A continuous part of the EEPROM, read by one D3 code"""
+
+    def __init__(self, params: List[EEPROMParams]) -> None:
+        self.params = params
+        self.address, self.size = span(params)
+        # Only one reader at a time, the others use what it got
+        self.lock = Lock()
+        # Read as a whole since the last reset
+        self.mirrored = False
+
+    def __str__(self):
+        return describe(self.params)
+
+
+def make_regions(params: Iterable[EEPROMParams]) -> List[EEPROMRegion]:
+    """Groups the values not further apart than EEPROM_MIRROR_MAX_GAP"""
+    groups: List[List[EEPROMParams]] = []
+    end = None
+    for param in sorted(params, key=lambda param: param.value[0]):
+        address, size = param.value
+        if end is None or address - end > EEPROM_MIRROR_MAX_GAP:
+            groups.append([])
+        groups[-1].append(param)
+        end = max(end or 0, address + size)
+    return [EEPROMRegion(group) for group in groups]
+
+
+class EEPROMMirror:
+    """
+    The values are read from the local image. The first value asked for
+    after a reset gets its whole region read, so the values polled
+    together share a single read. After that, only the values older
+    than EEPROM_MIRROR_MAX_AGE get refreshed, each on its own, as they
+    are polled at different intervals.
+
+    The writes go into the image right away. Until a read sent after
+    the write got confirmed, the written value stays dirty and the
+    refreshes don't overwrite it with what was there before
+    """
+
+    def __init__(self, serial_queue: SerialQueue,
+                 params: Iterable[EEPROMParams] = tuple(EEPROMParams)):
+        self.serial_queue = serial_queue
+        self.image = bytearray(EEPROM_SIZE)
+        self.view = memoryview(self.image)
+        self.regions = make_regions(params)
+        self.region_of: Dict[EEPROMParams, EEPROMRegion] = {
+            param: region
+            for region in self.regions for param in region.params}
+        self.read_at: Dict[EEPROMParams, float] = {}
+        self.dirty: Dict[EEPROMParams, Tuple[Instruction, bytes]] = {}
+        self.dirty_lock = Lock()
+
+    def read(self, param: EEPROMParams, struct_format: str,
+             should_wait: Callable[[], bool] = lambda: True
+             ) -> Tuple[Any, ...]:
+        """
+        Unpacks the value using the struct format, refreshes it first
+        if needed. Raises RuntimeError if the refresh fails
+        """
+        region = self.region_of[param]
+        with region.lock:
+            if not region.mirrored:
+                self._refresh(region.params, should_wait)
+                region.mirrored = True
+            elif monotonic() - self.read_at[param] > EEPROM_MIRROR_MAX_AGE:
+                self._refresh([param], should_wait)
+            with self.dirty_lock:
+                return struct.unpack_from(struct_format, self.view,
+                                          param.value[0])
+
+    def _refresh(self, params: List[EEPROMParams],
+                 should_wait: Callable[[], bool]) -> None:
+        """Reads the part covering the values from the printer"""
+        address, size = span(params)
+        with self.dirty_lock:
+            # These got written before the read, it's going to see them
+            written = {param: write for param, write in self.dirty.items()
+                       if write[0].is_confirmed()}
+        instruction = enqueue_matchable(
+            self.serial_queue, get_d3_code(address, size),
+            D3_OUTPUT_REGEX, priority=Priority.POLLING,
+            deadline=SERIAL_POLL_DEADLINE)
+        wait_for_instruction(instruction, should_wait)
+        if instruction.dropped or not instruction.is_confirmed():
+            raise RuntimeError(f"Failed to read {describe(params)}")
+
+        data = bytearray(size)
+        missing = size
+        for match in instruction.get_matches():
+            offset = int(match.group("address"), base=16) - address
+            chunk = bytes.fromhex(match.group("data").replace(" ", ""))
+            if offset < 0 or offset + len(chunk) > size:
+                continue
+            data[offset:offset + len(chunk)] = chunk
+            missing -= len(chunk)
+        if missing > 0:
+            raise RuntimeError(f"Incomplete read of {describe(params)}")
+
+        with self.dirty_lock:
+            self.view[address:address + size] = data
+            for param, (write, value) in list(self.dirty.items()):
+                if param not in params:
+                    continue
+                if written.get(param) == (write, value):
+                    del self.dirty[param]
+                else:
+                    # Not written yet, keep the newer value
+                    address, size = param.value
+                    self.view[address:address + size] = value
+        self.read_at.update(dict.fromkeys(params, monotonic()))
+        log.debug("Refreshed the mirror of %s", describe(params))
+
+    def write(self, param: EEPROMParams, value: bytes,
+              priority: Priority = Priority.POLLING) -> Instruction:
+        """
+        Writes the value into the image and into the printer EEPROM
+        :param priority: The scheduling class, the values that can't wait
+        for a gap in the print should go as CONTROL
+        """
+        address, size = param.value
+        if len(value) != size:
+            raise ValueError(f"{param.name} takes {size} bytes, "
+                             f"not {len(value)}")
+        with self.dirty_lock:
+            instruction = enqueue_instruction(
+                self.serial_queue, f"D3 Ax{address:04X} X{value.hex()}",
+                priority=priority)
+            self.view[address:address + size] = value
+            self.dirty[param] = (instruction, value)
+        return instruction
+
+    def invalidate(self) -> None:
+        """Makes the next reads go to the printer, after it got reset"""
+        for region in self.regions:
+            region.mirrored = False
@@ -0,0 +1,193 @@
+"""
+Contains implementation of the EtaEstimator class
+
+Corrects the time remaining reported by the printer by how fast the print
+actually goes. The correction is learned during the print and remembered
+for each printer, so the next print starts with a better guess.
+"""
+import json
+import logging
+import math
+import os
+from threading import Lock
+from time import monotonic
+from typing import Dict, Optional
+
+from prusa.connect.printer import Printer
+
+from ..config import Config
+from ..const import (ETA_FACTOR_MAX, ETA_FACTOR_MIN, ETA_MAX_SAMPLE_GAP,
+                     ETA_MIN_WEIGHT_TO_SAVE, ETA_SMOOTHING)
+from ..util import ensure_directory, get_clean_path
+from .structures.mc_singleton import MCSingleton
+from .structures.model_classes import Telemetry
+from .telemetry_passer import TelemetryPasser
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PRINTER_KEY = "default"
+
+
+class Ewma:
+    """
+    Exponentially weighted mean and variance, updated in O(1)
+
+    The weight says how much of the mean comes from the samples
+    instead of from the initial value. Without an initial value,
+    the first sample is taken as the mean
+    """
+
+    def __init__(self, initial: Optional[float] = 1.0,
+                 alpha: float = ETA_SMOOTHING):
+        self.alpha = alpha
+        self.mean = 0.0 if initial is None else initial
+        self.seeded = initial is not None
+        self.variance = 0.0
+        self.weight = 0.0
+
+    def update(self, value: float) -> None:
+        """Adds a sample"""
+        if not self.seeded:
+            self.mean = value
+            self.seeded = True
+            self.weight = self.alpha
+            return
+        diff = value - self.mean
+        increment = self.alpha * diff
+        self.mean += increment
+        self.variance = (1 - self.alpha) * (self.variance + diff * increment)
+        self.weight += self.alpha * (1 - self.weight)
+
+    @property
+    def confidence(self) -> float:
+        """
+        From 0 to 1, grows with the number of samples and drops with their
+        spread relative to the mean
+        """
+        if self.mean <= 0:
+            return 0.0
+        variation = math.sqrt(self.variance) / self.mean
+        return round(self.weight / (1 + variation), 2)
+
+
+class EtaEstimator(metaclass=MCSingleton):
+    """
+    Fuses the printer reported time remaining, progress from the byte
+    position and the wall clock time into a corrected time remaining.
+
+    With a time remaining from the printer, learns the ratio of the real
+    time to the reported time. Without it, learns the seconds per percent
+    of progress.
+    """
+
+    def __init__(self, cfg: Config, printer: Printer,
+                 telemetry_passer: TelemetryPasser):
+        self.printer = printer
+        self.telemetry_passer = telemetry_passer
+        self.lock = Lock()
+
+        self.factors_path = get_clean_path(cfg.daemon.eta_file)
+        ensure_directory(os.path.dirname(self.factors_path))
+        self.factors: Dict[str, float] = {}
+        try:
+            with open(self.factors_path, encoding='utf-8') as factors_file:
+                self.factors = {
+                    str(key): float(value)
+                    for key, value in json.load(factors_file).items()}
+        except (FileNotFoundError, ValueError, TypeError, AttributeError):
+            log.debug("No valid ETA correction factors found")
+
+        self.correction = Ewma()
+        self.pace = Ewma(initial=None)
+        self.has_remaining = False
+        self.last_remaining: Optional[tuple] = None
+        self.last_progress: Optional[tuple] = None
+
+    @property
+    def printer_key(self) -> str:
+        """The factors are stored under the printer serial number"""
+        return self.printer.sn or DEFAULT_PRINTER_KEY
+
+    def new_print(self) -> None:
+        """Starts learning anew, seeded from the previous prints"""
+        with self.lock:
+            seed = self.factors.get(self.printer_key, 1.0)
+            self.correction = Ewma(initial=seed)
+            self.pace = Ewma(initial=None)
+            self.has_remaining = False
+            self.last_remaining = None
+            self.last_progress = None
+        log.debug("ETA correction seeded with %s", seed)
+
+    def reanchor(self) -> None:
+        """Forget the last samples, so a pause does not count as printing"""
+        with self.lock:
+            self.last_remaining = None
+            self.last_progress = None
+
+    def print_ended(self) -> None:
+        """Remembers the learned correction for the next print"""
+        with self.lock:
+            if self.correction.weight < ETA_MIN_WEIGHT_TO_SAVE:
+                return
+            self.factors[self.printer_key] = round(self.correction.mean, 4)
+            factors = dict(self.factors)
+        tmp_path = self.factors_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding='utf-8') as factors_file:
+                json.dump(factors, factors_file)
+                factors_file.flush()
+                os.fsync(factors_file.fileno())
+            os.replace(tmp_path, self.factors_path)
+        except OSError:
+            log.exception("Failed to save the ETA correction factors")
+
+    def remaining_updated(self, remaining: int) -> None:
+        """
+        The printer reported a new time remaining in seconds.
+        The real time it took to get here gets compared to how much
+        the reported time dropped
+        """
+        now = monotonic()
+        with self.lock:
+            self.has_remaining = True
+            if self.last_remaining is not None:
+                last_at, last_remaining = self.last_remaining
+                elapsed = now - last_at
+                dropped = last_remaining - remaining
+                if dropped > 0 and elapsed <= ETA_MAX_SAMPLE_GAP:
+                    ratio = min(ETA_FACTOR_MAX,
+                                max(ETA_FACTOR_MIN, elapsed / dropped))
+                    self.correction.update(ratio)
+            self.last_remaining = (now, remaining)
+            corrected = remaining * self.correction.mean
+            confidence = self.correction.confidence
+        self._publish(corrected, confidence)
+
+    def progress_updated(self, progress: int) -> None:
+        """
+        Progress from the byte position got updated, used only if the
+        printer does not report the time remaining
+        """
+        now = monotonic()
+        with self.lock:
+            if self.has_remaining:
+                return
+            if self.last_progress is not None:
+                last_at, last_progress = self.last_progress
+                elapsed = now - last_at
+                advanced = progress - last_progress
+                if advanced > 0 and elapsed <= ETA_MAX_SAMPLE_GAP:
+                    self.pace.update(elapsed / advanced)
+            self.last_progress = (now, progress)
+            if not self.pace.weight:
+                return
+            corrected = self.pace.mean * (100 - progress)
+            confidence = self.pace.confidence
+        self._publish(corrected, confidence)
+
+    def _publish(self, corrected: float, confidence: float) -> None:
+        """Passes the corrected time remaining into telemetry"""
+        self.telemetry_passer.set_telemetry(
+            Telemetry(time_remaining_corrected=int(corrected),
+                      time_remaining_confidence=confidence))
@@ -2,19 +2,26 @@
 import logging
 import os
 from collections import deque
-from time import sleep
+from time import monotonic, sleep
 from typing import Optional
 
 from blinker import Signal  # type: ignore
+from packaging.version import InvalidVersion, Version
 
 from ..config import Config
-from ..const import PRINT_QUEUE_SIZE, QUIT_INTERVAL, STATS_EVERY, TAIL_COMMANDS
+from ..const import (BYTE_POSITION_DELTA, BYTE_POSITION_INTERVAL,
+                     MINIMAL_ARC_FIRMWARE, PRINT_QUEUE_SIZE, QUIT_INTERVAL,
+                     SERIAL_THREAD_NICE, STATS_EVERY, TAIL_COMMANDS)
 from ..serial.helpers import enqueue_instruction, wait_for_instruction
-from ..serial.instruction import Instruction
+from ..serial.instruction import Instruction, Priority
 from ..serial.serial_parser import ThreadedSerialParser
 from ..serial.serial_queue import SerialQueue
-from ..util import get_clean_path, get_gcode, get_print_stats_gcode, \
-    prctl_name
+from ..util import (get_clean_path, get_print_stats_gcode, prctl_name,
+                    set_thread_nice)
+from .arc_fitter import ArcFitter
+from .gcode_optimizer import MOVES, GcodeOptimizer, with_feed_rate
+from .gcode_line import GcodeLine
+from .gcode_reader import GcodeReader
 from .model import Model
 from .print_stats import PrintStats
 from .structures.mc_singleton import MCSingleton
@@ -40,6 +47,12 @@ class FilePrinter(metaclass=MCSingleton):
         self.serial_parser = serial_parser
         self.print_stats = print_stats
         self.model = model
+        self.prioritize = cfg.printer.prioritize_serial
+        self.optimize = cfg.printer.optimize_gcode
+        self.fit_arcs = cfg.printer.fit_arcs
+        self.arc_tolerance = cfg.printer.arc_tolerance
+        # Set once the printer firmware is known to do precise arcs
+        self.arcs_supported = False
 
         self.new_print_started_signal = Signal()
         self.print_stopped_signal = Signal()
@@ -68,6 +81,15 @@ class FilePrinter(metaclass=MCSingleton):
                                        lambda sender, match: self.resume())
 
         self.thread: Optional[Thread] = None
+        self.reader: Optional[GcodeReader] = None
+        # The print thread only writes the current position here,
+        # subscribers get notified at a limited rate
+        self.current_byte = 0
+        self.total_size = 0
+        self.published_byte = 0
+        self.published_at = 0.0
+        # Set after a pause, until the feed rate gets sent again
+        self.resend_feed_rate = False
 
     def start(self) -> None:
         """Power panic is not yet implemented, sso this does nothing"""
@@ -83,6 +105,29 @@ class FilePrinter(metaclass=MCSingleton):
         if self.thread is not None and self.thread.is_alive():
             self.thread.join()
 
+    @property
+    def headroom(self) -> float:
+        """
+        How far ahead of the printer is the file reading, from 0 to 1.
+        Other storage users should back off, when this gets low
+        """
+        reader = self.reader
+        if not self.data.printing or reader is None:
+            return 1.0
+        return reader.fill
+
+    def firmware_changed(self, firmware: str) -> None:
+        """Finds out, if the printer firmware can do the fitted arcs"""
+        without_buildnumber = firmware.split("-")[0]
+        try:
+            self.arcs_supported = \
+                Version(without_buildnumber) >= MINIMAL_ARC_FIRMWARE
+        except InvalidVersion:
+            self.arcs_supported = False
+        if self.fit_arcs and not self.arcs_supported:
+            log.warning("Not fitting arcs, the printer firmware %s is older "
+                        "than %s", firmware, MINIMAL_ARC_FIRMWARE)
+
     @property
     def pp_exists(self) -> bool:
         """Checks whether a file created on power panic exists"""
@@ -117,74 +162,154 @@ class FilePrinter(metaclass=MCSingleton):
         """
 
         prctl_name()
-        total_size = os.path.getsize(self.data.file_path)
-        with open(self.data.file_path, "r", encoding='utf-8') as file:
+        if self.prioritize:
+            set_thread_nice(SERIAL_THREAD_NICE)
+        self.total_size = os.path.getsize(self.data.file_path)
+        reader = self._start_reader(from_line)
+        try:
             # Reset the line counter, printing a new file
             self.serial_queue.reset_message_number()
 
             self.data.gcode_number = 0
             self.data.enqueued.clear()
-            line_index = 0
-            while True:
-                line = file.readline()
-
-                # Recognise the end of the file
-                if line == "":
-                    break
-
-                # This will make it PRINT_QUEUE_SIZE lines in front of what
-                # is being sent to the printer, which is another as much as
-                # 16 gcode commands in front of what's actually being printed.
-                current_byte = file.tell()
-                self.byte_position_signal.send(self,
-                                               current=current_byte,
-                                               total=total_size)
-
-                if line_index < from_line:
-                    continue
+            self.current_byte = 0
+            self.published_byte = 0
+            self.published_at = monotonic()
+            self.resend_feed_rate = False
+            self._print_lines(reader)
+            log.debug("Print ended")
+        finally:
+            self.publish_position(force=True)
+            self._stop_reader(reader)
+        self._print_ended()
 
-                if self.data.paused:
-                    log.debug("Pausing USB print")
-                    self.wait_for_unpause()
+    def _start_reader(self, from_line: int) -> GcodeReader:
+        """
+        Starts reading the file ahead, through the optimizer
+        and the arc fitter, if they are to be used
+        """
+        optimizer = GcodeOptimizer() if self.optimize else None
+        arc_fitter = None
+        if self.fit_arcs and self.arcs_supported:
+            arc_fitter = ArcFitter(self.arc_tolerance)
+        reader = GcodeReader(self.data.file_path, from_line, optimizer,
+                             arc_fitter)
+        self.reader = reader
+        reader.start()
+        return reader
+
+    def _stop_reader(self, reader: GcodeReader) -> None:
+        """Stops the reading, logs what the optimizations saved"""
+        reader.stop()
+        reader.wait_stopped()
+        self.reader = None
+        if reader.optimizer is not None:
+            reader.optimizer.report()
+        if reader.arc_fitter is not None:
+            reader.arc_fitter.report()
+
+    def _print_lines(self, reader: GcodeReader) -> None:
+        """Sends the lines until the file ends or the print gets stopped"""
+        while True:
+            line = reader.get(lambda: self.data.printing)
+
+            # Recognise the end of the file
+            if line is None:
+                if reader.error is not None:
+                    log.error("Stopping the print, the file could not "
+                              "be read")
+                    self.data.stopped_forcefully = True
+                break
 
-                    if not self.data.printing:
-                        break
+            # This will make it PRINT_QUEUE_SIZE lines in front of what
+            # is being sent to the printer, which is another as much as
+            # 16 gcode commands in front of what's actually being printed.
+            self.current_byte = line.end_offset
+            self.publish_position(line.layer_change)
 
-                    log.debug("Resuming USB print")
+            if self.data.paused and not self._wait_paused(reader):
+                break
 
-                # Trigger cameras on layer change
-                if ";LAYER_CHANGE" in line:
-                    self.layer_trigger_signal.send()
+            # Trigger cameras on layer change
+            if line.layer_change:
+                self.layer_trigger_signal.send()
 
-                self.data.line_number = line_index + 1
-                gcode = get_gcode(line)
-                if gcode:
-                    self.print_gcode(gcode)
-                    self.wait_for_queue()
-                    self.react_to_gcode(gcode)
+            self.data.line_number = line.line_index + 1
+            gcode = self._restore_feed_rate(line)
+            if gcode:
+                self.print_gcode(gcode)
+                self.wait_for_queue()
+                self.react_to_gcode(gcode)
 
-                line_index += 1
+            if not self.data.printing:
+                break
 
-                if not self.data.printing:
-                    break
+    def _wait_paused(self, reader: GcodeReader) -> bool:
+        """Waits out a pause, False if the print got stopped meanwhile"""
+        log.debug("Pausing USB print")
+        self.publish_position(force=True)
+        self.wait_for_unpause()
 
-            log.debug("Print ended")
+        if not self.data.printing:
+            return False
 
-            if self.pp_exists:
-                os.remove(self.data.pp_file_path)
-            self.data.printing = False
-            self.data.enqueued.clear()
+        log.debug("Resuming USB print")
+        # The printer could have changed the feed rate while paused
+        self.resend_feed_rate = True
+        if reader.optimizer is not None:
+            reader.optimizer.forget()
+        return True
 
-            if self.data.stopped_forcefully:
-                self.serial_queue.flush_print_queue()
-                self.data.enqueued.clear()  # Ensure this gets cleared
-                # This results in double stop on 3.10 hopefully will get
-                # changed
-                # Prevents the print head from stopping in the print
-                enqueue_instruction(self.serial_queue, "M603", to_front=True)
-                self.print_stopped_signal.send(self)
-            else:
-                self.print_finished_signal.send(self)
+    def _restore_feed_rate(self, line: GcodeLine) -> str:
+        """
+        The G-code of the line. The first move after a pause gets
+        the feed rate back, the lines read ahead could be missing it
+        """
+        gcode = line.gcode
+        if self.resend_feed_rate and gcode.split(" ", 1)[0] in MOVES:
+            gcode = with_feed_rate(gcode, line.feed_rate)
+            self.resend_feed_rate = False
+        return gcode
+
+    def _print_ended(self) -> None:
+        """Cleans up after the print, tells how it ended"""
+        if self.pp_exists:
+            os.remove(self.data.pp_file_path)
+        self.data.printing = False
+        self.data.enqueued.clear()
+
+        if self.data.stopped_forcefully:
+            self.serial_queue.flush_print_queue()
+            self.data.enqueued.clear()  # Ensure this gets cleared
+            # This results in double stop on 3.10 hopefully will get
+            # changed
+            # Prevents the print head from stopping in the print
+            enqueue_instruction(self.serial_queue, "M603", to_front=True)
+            self.print_stopped_signal.send(self)
+        else:
+            self.print_finished_signal.send(self)
+
+    def publish_position(self, layer_change=False, force=False):
+        """
+        Sends the byte position signal only once in a while, if the
+        position moved enough, or on a layer change
+        :param layer_change: the current line is a layer change
+        :param force: send anyway, unless the position did not change
+        """
+        current = self.current_byte
+        if current == self.published_byte:
+            return
+        now = monotonic()
+        if not (force or layer_change
+                or now - self.published_at >= BYTE_POSITION_INTERVAL
+                or current - self.published_byte
+                >= self.total_size * BYTE_POSITION_DELTA):
+            return
+        self.published_byte = current
+        self.published_at = now
+        self.byte_position_signal.send(self,
+                                       current=current,
+                                       total=self.total_size)
 
     def print_gcode(self, gcode):
         """Sends a gcode to print, keeps a small buffer of gcodes
@@ -255,7 +380,7 @@ class FilePrinter(metaclass=MCSingleton):
         percentage and estimated time left, the printer is expected to send
         back its standard print stats output for parsing in telemetry"""
         percent_done, time_remaining = self.print_stats.get_stats(
-            self.data.gcode_number)
+            self.data.gcode_number, self.current_byte)
 
         # Idk what to do here, idk what would have happened if we used
         # the other mode, so let's report both modes the same
@@ -263,7 +388,7 @@ class FilePrinter(metaclass=MCSingleton):
                                              percent_done, time_remaining)
         instruction = enqueue_instruction(self.serial_queue,
                                           stat_command,
-                                          to_front=True)
+                                          priority=Priority.PRINT)
         self.data.enqueued.append(instruction)
 
     def to_print_stats(self, gcode_number):
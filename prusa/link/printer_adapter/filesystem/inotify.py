@@ -0,0 +1,93 @@
+"""
+A minimal ctypes binding of the Linux inotify API
+
+Only what the storage watching needs, so there's no extra dependency
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+from typing import Dict, List, NamedTuple, Optional
+
+log = logging.getLogger(__name__)
+
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+
+class InotifyEvent(NamedTuple):
+    """One event read from the inotify descriptor"""
+    path: Optional[str]  # The watched path, None on a queue overflow
+    mask: int
+    name: str
+
+
+class Inotify:
+    """
+    Watches paths for changes. The descriptor does not block, poll it
+    to wait for the events
+    """
+
+    def __init__(self) -> None:
+        libc_name = ctypes.util.find_library("c")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.paths: Dict[int, str] = {}
+
+    def add_watch(self, path: str, mask: int) -> int:
+        """Starts watching a path, returns the watch descriptor"""
+        descriptor = self.libc.inotify_add_watch(self.fd, os.fsencode(path),
+                                                 mask)
+        if descriptor < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        self.paths[descriptor] = path
+        return descriptor
+
+    def remove_all(self) -> None:
+        """Stops watching everything"""
+        for descriptor in self.paths:
+            self.libc.inotify_rm_watch(self.fd, descriptor)
+        self.paths.clear()
+
+    def read_events(self) -> List[InotifyEvent]:
+        """Reads the events that are ready, does not wait for any"""
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            descriptor, mask, _, length = EVENT_HEADER.unpack_from(
+                data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_IGNORED:
+                self.paths.pop(descriptor, None)
+                continue
+            events.append(InotifyEvent(self.paths.get(descriptor), mask,
+                                       os.fsdecode(name)))
+        return events
+
+    def close(self) -> None:
+        """Closes the inotify descriptor"""
+        os.close(self.fd)
@@ -2,16 +2,19 @@
 and its files"""
 import calendar
 import logging
+import posixpath
 import re
+from collections import deque
 from itertools import islice
-from pathlib import Path
 from threading import Lock
 from time import time
-from typing import Optional
+from typing import Deque, Dict, List, Optional, Tuple
 
 from blinker import Signal  # type: ignore
 from prusa.connect.printer.const import State
+from prusa.connect.printer.files import File
 
+from ...config import Config
 from ...const import (MAX_FILENAME_LENGTH, SD_INTERVAL, SD_STORAGE_NAME,
                       SFN_TO_LFN_EXTENSIONS)
 from ...sdk_augmentation.file import SDFile
@@ -28,6 +31,7 @@ from ..structures.regular_expressions import (CONFIRMATION_REGEX, LFN_CAPTURE,
                                               SD_EJECTED_REGEX,
                                               SD_PRESENT_REGEX)
 from ..updatable import ThreadedUpdatable
+from .sd_index import FileRecord, PathTrie, SDIndex, directory_signature
 
 log = logging.getLogger(__name__)
 
@@ -55,15 +59,25 @@ def get_root():
 class FileTreeParser:
     """
     Parses the file tree from a printer supplied format
+
+    The file listings are grouped by directory. A directory with
+    the same listing as before gets its parsed records from the index.
+    The tree gets built in the order of the printer listing, the contents
+    of hidden directories are left out of it
     """
 
-    def __init__(self, matches):
+    def __init__(self, matches, index: Optional[SDIndex] = None):
         self.matches = matches
+        self.index = index
         self.tree = get_root()
-        self.current_dir = Path("/")
-        self.lfn_to_sfn_paths = {}
-        self.sfn_to_lfn_paths = {}
-        self.mixed_to_lfn_paths = {}
+        # A stack of (long path, tree node, listing number)
+        # of the directories entered
+        self.dir_stack: List[Tuple[str, Optional[File], int]] = [
+            ("/", self.tree, 0)]
+        self.lfn_to_sfn_paths = PathTrie()
+        self.sfn_to_lfn_paths = PathTrie()
+        self.mixed_to_lfn_paths = PathTrie()
+        self.reused = 0
 
         if not matches:
             return
@@ -74,38 +88,97 @@ class FileTreeParser:
             log.warning("Captured unexpected output.")
             return
 
+        lines = list(islice(matches, 1, len(matches) - 1))
+        listings = self.group_listings(lines)
+        # listing number -> the records of its files not yet added
+        records: Dict[int, Deque[FileRecord]] = {}
+        entered = 0
+
         # Captured can be three distinct lines.
         # Dir entry, dir exit, or a file listing.
-        for match in islice(matches, 1, len(matches) - 1):
+        for match in lines:
             groups = match.groupdict()
             if groups["dir_enter"] is not None:  # Dir entry
-                self.parse_dir(groups)
+                entered += 1
+                self.parse_dir(groups, entered)
             elif groups["file"] is not None:  # The list item
-                self.parse_file(groups)
+                # Only the lines without a long file name have no record
+                if groups["lfn"] is None:
+                    continue
+                long_dir_path, node, number = self.dir_stack[-1]
+                if number not in records:
+                    records[number] = deque(self.parse_listing(
+                        long_dir_path, listings[number]))
+                self.add_file(node, records[number].popleft())
             elif groups["dir_exit"] is not None:  # Dir exit
-                self.current_dir = self.current_dir.parent
+                if len(self.dir_stack) > 1:
+                    self.dir_stack.pop()
 
-    def check_uniqueness(self, path: Path):
-        """Checks, whether the supplied path is not present in the tree"""
-        # Ignores the first "/"
-        if self.tree.get(path.parts[1:]) is not None:
+        if self.reused:
+            log.debug("Re-used %s unchanged SD directory listings",
+                      self.reused)
+
+    @staticmethod
+    def group_listings(lines: List[re.Match]) -> Dict[int, List[re.Match]]:
+        """
+        Groups the file listing lines by directory. The directories
+        are numbered in the order they get entered, the root is zero
+        """
+        listings: Dict[int, List[re.Match]] = {0: []}
+        stack = [0]
+        for match in lines:
+            if match.group("dir_enter") is not None:
+                stack.append(len(listings))
+                listings[stack[-1]] = []
+            elif match.group("file") is not None:
+                listings[stack[-1]].append(match)
+            elif match.group("dir_exit") is not None and len(stack) > 1:
+                stack.pop()
+        return listings
+
+    def parse_listing(self, long_dir_path: str,
+                      dir_matches: List[re.Match]) -> List[FileRecord]:
+        """
+        Returns the records of the files of one directory, parses only
+        listings not found in the index
+        """
+        signature = directory_signature(
+            long_dir_path, [match.group(0) for match in dir_matches])
+        records = None
+        if self.index is not None:
+            records = self.index.get(signature)
+        if records is None:
+            records = []
+            for match in dir_matches:
+                record = self.parse_file(long_dir_path, match.groupdict())
+                if record is not None:
+                    records.append(record)
+            if self.index is not None:
+                self.index.put(signature, records)
+        else:
+            self.reused += 1
+        return records
+
+    def check_uniqueness(self, node: File, name: str, path: str):
+        """Checks, whether the supplied name is not present in the node"""
+        if name in node.children:
             log.error("Despite our efforts, there is a name conflict for %s",
                       path)
 
-    def parse_file(self, groups):
+    @staticmethod
+    def parse_file(long_dir_path: str, groups) -> Optional[FileRecord]:
         """Parses the file listing using the _captured groups"""
         # pylint: disable=too-many-locals
         short_path_string = groups["sfn"].lower()
         if short_path_string[0] != "/":
             short_path_string = "/" + short_path_string
-        short_filename = Path(short_path_string).name
-        short_dir_path = Path(short_path_string).parent
+        short_dir_path, _, short_filename = short_path_string.rpartition("/")
         short_extension = groups["extension"]
         long_extension = SFN_TO_LFN_EXTENSIONS[short_extension]
         raw_long_filename = groups["lfn"]
 
         if raw_long_filename is None:
-            return
+            return None
 
         # --- Parse the long file name ---
 
@@ -118,68 +191,85 @@ class FileTreeParser:
         else:
             long_file_name = raw_long_filename
 
-        long_path = self.current_dir.joinpath(long_file_name)
-        self.check_uniqueness(long_path)
-        long_path_string = str(long_path)
-
-        mixed_path = short_dir_path.joinpath(raw_long_filename)
-        mixed_path_string = str(mixed_path).lower()
-
-        # Add translation between the two
-        log.debug("Adding translation between %s and %s", long_path_string,
-                  short_path_string)
-        log.debug("Adding translation from %s to %s", mixed_path,
-                  long_path_string)
-        self.lfn_to_sfn_paths[long_path_string] = short_path_string
-        self.sfn_to_lfn_paths[short_path_string] = long_path_string
-        self.mixed_to_lfn_paths[mixed_path_string] = long_path_string
+        long_path_string = posixpath.join(long_dir_path, long_file_name)
+        mixed_path_string = posixpath.join(short_dir_path or "/",
+                                           raw_long_filename).lower()
 
         # --- parse additional properties ---
 
-        additional_properties = {}
-
+        size = None
         str_size = groups["size"]
         if str_size is not None:
-            additional_properties["size"] = int(str_size)
+            size = int(str_size)
 
+        m_timestamp = None
         str_m_time = groups["m_time"]
         if str_m_time is not None:
             m_time = fat_datetime_to_tuple(int(str_m_time, 16))
             m_timestamp = calendar.timegm(m_time)
-            additional_properties["m_timestamp"] = m_timestamp
 
+        return FileRecord(long_file_name, short_filename, too_long,
+                          long_path_string, short_path_string,
+                          mixed_path_string, size, m_timestamp)
+
+    def add_file(self, node: Optional[File], record: FileRecord):
+        """Adds a parsed file to the tree and the translation maps"""
+        # Add translation between the two
+        log.debug("Adding translation between %s and %s", record.long_path,
+                  record.short_path)
+        log.debug("Adding translation from %s to %s", record.mixed_path,
+                  record.long_path)
+        self.lfn_to_sfn_paths[record.long_path] = record.short_path
+        self.sfn_to_lfn_paths[record.short_path] = record.long_path
+        self.mixed_to_lfn_paths[record.mixed_path] = record.long_path
+
+        additional_properties = {}
+        if record.size is not None:
+            additional_properties["size"] = record.size
+        if record.m_timestamp is not None:
+            additional_properties["m_timestamp"] = record.m_timestamp
+
+        if node is None:  # In a hidden directory
+            return
         # Add the file to the tree
-        try:
-            self.tree.add_file(self.current_dir,
-                               long_file_name,
-                               short_filename,
-                               filename_too_long=too_long,
-                               **additional_properties)
-        except FileNotFoundError as exception:
-            log.exception(exception)
-
-    def parse_dir(self, groups):
-        """Parses the dir info using the _captured groups"""
+        self.check_uniqueness(node, record.name, record.long_path)
+        node.add(is_dir=False,
+                 name=record.name,
+                 ro=True,
+                 sfn=record.sfn,
+                 filename_too_long=record.too_long,
+                 **additional_properties)
+
+    def parse_dir(self, groups, number: int):
+        """
+        Parses the dir info using the _captured groups, the number
+        is the one of its listing
+        """
         long_dir_name = groups["ldn"]
-        short_dir_name = Path(groups["sdn"]).name
+        short_dir_name = posixpath.basename(groups["sdn"].rstrip("/"))
+        parent_path, parent, _ = self.dir_stack[-1]
 
         # Sanitize the dir name
         too_long = len(long_dir_name) >= MAX_FILENAME_LENGTH
         if too_long:
-            new_name = alternative_filename(long_dir_name, short_dir_name)
-            self.current_dir = self.current_dir.joinpath(new_name)
+            name = alternative_filename(long_dir_name, short_dir_name)
         else:
-            self.current_dir = self.current_dir.joinpath(long_dir_name)
-
-        self.check_uniqueness(self.current_dir)
-        # Add the dir to the tree
-        try:
-            self.tree.add_directory(self.current_dir.parent,
-                                    self.current_dir.name,
-                                    short_dir_name,
-                                    filename_too_long=too_long)
-        except FileNotFoundError as exception:
-            log.exception(exception)
+            name = long_dir_name
+
+        path = posixpath.join(parent_path, name)
+        node = None
+        if parent is not None:
+            self.check_uniqueness(parent, name, path)
+            # Add the dir to the tree
+            node = parent.add(is_dir=True,
+                              name=name,
+                              ro=True,
+                              sfn=short_dir_name,
+                              filename_too_long=too_long)
+        # The contents of hidden directories stay out of the tree
+        if path.startswith("/."):
+            node = None
+        self.dir_stack.append((path, node, number))
 
 
 class SDCard(ThreadedUpdatable):
@@ -206,7 +296,8 @@ class SDCard(ThreadedUpdatable):
     # Cycle fast, but re-scan only on events or in big intervals
     update_interval = SD_INTERVAL
 
-    def __init__(self, serial_queue: SerialQueue,
+    # pylint: disable=too-many-arguments
+    def __init__(self, cfg: Config, serial_queue: SerialQueue,
                  serial_parser: ThreadedSerialParser,
                  state_manager: StateManager, model: Model):
 
@@ -231,11 +322,12 @@ class SDCard(ThreadedUpdatable):
                                         last_checked_flash_air=time(),
                                         sd_state=SDState.UNSURE,
                                         files=None,
-                                        lfn_to_sfn_paths={},
-                                        sfn_to_lfn_paths={},
-                                        mixed_to_lfn_paths={},
+                                        lfn_to_sfn_paths=PathTrie(),
+                                        sfn_to_lfn_paths=PathTrie(),
+                                        mixed_to_lfn_paths=PathTrie(),
                                         is_flash_air=False)
         self.data = self.model.sd_card
+        self.index = SDIndex(cfg.daemon.sd_index_file)
         self.lock = Lock()
 
         super().__init__()
@@ -348,6 +440,9 @@ class SDCard(ThreadedUpdatable):
         not being unique, so this also ensures their uniqueness and
         fills in missing extensions
 
+        The firmware can only list the whole card, but only the directories
+        with a changed listing get parsed, the rest comes from the SD index
+
         :return: The constructed file tree. Also the translation data for
         converting between all used path formats get saved at the end
         """
@@ -357,7 +452,8 @@ class SDCard(ThreadedUpdatable):
                                         regexp=LFN_CAPTURE)
         wait_for_instruction(instruction, should_wait_evt=self.quit_evt)
         matches = instruction.get_matches()
-        file_tree_parser = FileTreeParser(matches)
+        file_tree_parser = FileTreeParser(matches, self.index)
+        self.index.save()
         return file_tree_parser
 
     def sd_inserted(self, sender, match: re.Match):
@@ -0,0 +1,171 @@
+"""
+Contains the PathTrie and the SDIndex classes
+
+The SD card listing is parsed one directory at a time. Parsed directories
+are remembered on disk by a signature of their listing, so only the
+directories that changed since the last listing need parsing again
+"""
+import json
+import logging
+import os
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from hashlib import sha1
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+from ...const import SD_INDEX_MAX_DIRECTORIES
+from ...util import ensure_directory, get_clean_path
+
+log = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+# The trie nodes map path segments to children, None to the value
+TrieNode = Dict[Optional[str], Any]
+
+
+class FileRecord(NamedTuple):
+    """A parsed file listing line, stored as a JSON list in the index"""
+    name: str
+    sfn: str
+    too_long: bool
+    long_path: str
+    short_path: str
+    mixed_path: str
+    size: Optional[int]
+    m_timestamp: Optional[int]
+
+
+class PathTrie(MutableMapping):
+    """
+    A mapping of "/" separated paths to values, storing every path
+    segment once. Deep trees with many files share the directory parts
+    of their paths
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.root: TrieNode = {}
+        self.length = 0
+        self.update(*args, **kwargs)
+
+    @staticmethod
+    def _parts(path: str) -> List[str]:
+        """Splits a path into segments, ignoring the leading slash"""
+        return path.strip("/").split("/")
+
+    def _find(self, path: str) -> Optional[TrieNode]:
+        """Returns the trie node for the path"""
+        node = self.root
+        for part in self._parts(path):
+            child = node.get(part)
+            if child is None:
+                return None
+            node = child
+        return node
+
+    def __getitem__(self, path: str):
+        node = self._find(path)
+        if node is None or None not in node:
+            raise KeyError(path)
+        return node[None]
+
+    def __setitem__(self, path: str, value) -> None:
+        node = self.root
+        for part in self._parts(path):
+            node = node.setdefault(part, {})
+        if None not in node:
+            self.length += 1
+        # The value is stored under None, no path segment can be None
+        node[None] = value
+
+    def __delitem__(self, path: str) -> None:
+        node = self._find(path)
+        if node is None or None not in node:
+            raise KeyError(path)
+        del node[None]
+        self.length -= 1
+
+    def __iter__(self) -> Iterator[str]:
+        stack = [("", self.root)]
+        while stack:
+            prefix, node = stack.pop()
+            for part, child in node.items():
+                if part is None:
+                    yield prefix or "/"
+                else:
+                    stack.append((f"{prefix}/{part}", child))
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __repr__(self) -> str:
+        return f"PathTrie({dict(self.items())})"
+
+
+def directory_signature(long_dir_path: str, lines: List[str]) -> str:
+    """
+    Identifies a directory listing, the long path is a part of it,
+    because the parsed paths depend on it
+    """
+    digest = sha1(long_dir_path.encode("utf-8"))
+    for line in lines:
+        digest.update(b"\n")
+        digest.update(line.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SDIndex:
+    """
+    Remembers the parsed file records of SD card directories by their
+    signature. Works for any card, an unchanged directory has the same
+    signature no matter which card it's on. Least recently used
+    directories get forgotten first
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = get_clean_path(index_path)
+        self.directories: "OrderedDict[str, List[list]]" = OrderedDict()
+        self.changed = False
+        try:
+            with open(self.index_path, encoding="utf-8") as index_file:
+                data = json.load(index_file)
+            if data.get("version") == INDEX_VERSION:
+                self.directories.update(data["directories"])
+        except (FileNotFoundError, ValueError, KeyError, TypeError,
+                AttributeError):
+            log.debug("No valid SD index found at %s", self.index_path)
+
+    def get(self, signature: str) -> Optional[List[FileRecord]]:
+        """Returns the records of a known directory listing"""
+        records = self.directories.get(signature)
+        if records is None:
+            return None
+        self.directories.move_to_end(signature)
+        try:
+            return [FileRecord(*record) for record in records]
+        except TypeError:
+            del self.directories[signature]
+            return None
+
+    def put(self, signature: str, records: List[FileRecord]) -> None:
+        """Remembers the records of a newly parsed directory"""
+        self.directories[signature] = [list(record) for record in records]
+        self.changed = True
+        while len(self.directories) > SD_INDEX_MAX_DIRECTORIES:
+            self.directories.popitem(last=False)
+
+    def save(self) -> None:
+        """Writes the index to disk, if anything new got parsed"""
+        if not self.changed:
+            return
+        ensure_directory(os.path.dirname(self.index_path))
+        tmp_path = self.index_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as index_file:
+                json.dump({"version": INDEX_VERSION,
+                           "directories": self.directories}, index_file)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            log.exception("Failed to save the SD index")
+        else:
+            self.changed = False
@@ -0,0 +1,197 @@
+"""
+Contains implementation of the SDUpload class
+
+Streams a file onto the printer's SD card between M28 and M29. The lines
+are numbered and check-summed like the printed ones, so the printer can ask
+for a re-send of the ones that got corrupted on the way.
+"""
+import logging
+import re
+from collections import deque
+from time import monotonic
+from typing import Callable, Deque, Optional, Tuple
+
+from prusa.connect.printer.download import Transfer
+
+from ...const import (QUIT_INTERVAL, SD_UPLOAD_PROGRESS_INTERVAL,
+                      SD_UPLOAD_WINDOW)
+from ...metrics import REGISTRY
+from ...serial.instruction import Instruction, MandatoryMatchableInstruction
+from ...serial.serial_queue import SerialQueue
+from ..gcode_reader import GcodeReader
+from ..structures.regular_expressions import SD_WRITE_REGEX
+
+log = logging.getLogger(__name__)
+
+UPLOADED_BYTES = REGISTRY.counter(
+    "prusalink_sd_upload_bytes_total",
+    "Bytes of G-code sent to be written onto the SD card")
+
+SFN_CHARACTERS = r"[a-z0-9!#$%&'()\-@^_`{}~]"
+SFN_DIRECTORY_REGEX = re.compile(rf"^{SFN_CHARACTERS}{{1,8}}$")
+SFN_FILE_REGEX = re.compile(rf"^{SFN_CHARACTERS}{{1,8}}\.(gco|g)$")
+
+
+def is_sfn_path(path: str) -> bool:
+    """
+    Checks the path is made of 8.3 names the firmware can write,
+    ending with a G-code file name, so the file shows up in the listing
+    """
+    parts = path.lower().split("/")
+    if parts[0] or len(parts) < 2:
+        return False
+    return all(SFN_DIRECTORY_REGEX.match(part) for part in parts[1:-1]) \
+        and SFN_FILE_REGEX.match(parts[-1]) is not None
+
+
+class SDUpload:
+    """
+    Writes one file onto the SD card. Owns the serial queue for the whole
+    upload, as the printer would write anything sent in between into the
+    file. Keeps a window of lines enqueued, so the next line goes out
+    right after the previous one got confirmed.
+
+    Comments and empty lines are left out, the printer does not need them
+    and they would only take time on the wire
+    """
+
+    def __init__(self, serial_queue: SerialQueue, source_path: str,
+                 sd_path: str, transfer: Optional[Transfer] = None):
+        if not is_sfn_path(sd_path):
+            raise ValueError(f"{sd_path} is not an 8.3 path of a G-code")
+        self.serial_queue = serial_queue
+        self.source_path = source_path
+        # The firmware accepts only lower case short names
+        self.sd_path = sd_path.lower()
+        self.transfer = transfer
+
+        # How far the printer confirmed to have written
+        self.confirmed_line = 0
+        self.confirmed_offset = 0
+        self.sent_bytes = 0
+        self.finished = False
+        self.interrupted = False
+        self.reported_at = 0.0
+
+    def _wait(self, instruction: Instruction,
+              keep_going: Callable[[], bool]) -> bool:
+        """
+        Waits for the instruction confirmation. If the serial queue
+        got flushed in the meantime, the upload is interrupted
+        """
+        while keep_going():
+            if instruction.wait_for_confirmation(timeout=QUIT_INTERVAL):
+                if not self.serial_queue.exclusive:
+                    log.warning("SD upload of %s got interrupted",
+                                self.sd_path)
+                    self.interrupted = True
+                    return False
+                return True
+        return False
+
+    def _report_progress(self, force=False):
+        """Passes the confirmed position to the transfer, not too often"""
+        if self.transfer is None:
+            return
+        now = monotonic()
+        if force or now - self.reported_at >= SD_UPLOAD_PROGRESS_INTERVAL:
+            self.reported_at = now
+            self.transfer.transferred = self.confirmed_offset
+
+    def run(self, keep_going: Callable[[], bool] = lambda: True) -> bool:
+        """
+        Opens the file for writing, streams the lines into it and closes
+        it. Returns True if the whole file got written
+        """
+        started_at = monotonic()
+        self.serial_queue.begin_exclusive()
+        try:
+            opening = MandatoryMatchableInstruction(
+                f"M28 {self.sd_path}", capture_matching=SD_WRITE_REGEX)
+            self.serial_queue.enqueue_exclusive(opening)
+            # Wait even if stopped, an opened file has to be closed
+            if not self._wait(opening, lambda: not self.serial_queue.closed):
+                return False
+            match = opening.match()
+            if match is None or match.group("ok") is None:
+                log.error("The printer refused to write into %s",
+                          self.sd_path)
+                return False
+
+            streamed = self._stream(keep_going)
+
+            if not self.interrupted:
+                # Close the file even if stopped, to leave the printer usable
+                closing = Instruction("M29")
+                self.serial_queue.enqueue_exclusive(closing)
+                self._wait(closing, lambda: not self.serial_queue.closed)
+            self.finished = streamed and not self.interrupted
+            if not self.finished:
+                self._delete()
+        finally:
+            self.serial_queue.end_exclusive()
+            self._report_progress(force=True)
+
+        elapsed = monotonic() - started_at
+        log.info("Written %s lines into %s in %.1fs, %.0f B/s on the wire",
+                 self.confirmed_line, self.sd_path, elapsed,
+                 self.sent_bytes / elapsed if elapsed else 0)
+        return self.finished
+
+    def _delete(self) -> None:
+        """
+        Deletes the incomplete file, so nobody prints it by mistake.
+        After an interruption, the printer is no longer ours, the deletion
+        waits in line with the other instructions then
+        """
+        log.warning("Deleting the incomplete %s", self.sd_path)
+        deletion = Instruction(f"M30 {self.sd_path}")
+        if self.interrupted:
+            self.serial_queue.enqueue_one(deletion, to_front=True)
+            return
+        self.serial_queue.enqueue_exclusive(deletion)
+        self._wait(deletion, lambda: not self.serial_queue.closed)
+
+    def _stream(self, keep_going: Callable[[], bool]) -> bool:
+        """Sends the file lines, returns True if all got confirmed"""
+        window: Deque[Tuple[Instruction, int, int]] = deque()
+        reader = GcodeReader(self.source_path)
+        reader.start()
+        try:
+            while True:
+                line = reader.get(keep_going)
+                if line is None:
+                    if not keep_going() or reader.error is not None:
+                        return False
+                    break
+                if not line.gcode:
+                    continue
+                instruction = Instruction(line.gcode, to_checksum=True)
+                self.serial_queue.enqueue_exclusive(instruction)
+                window.append((instruction, line.line_index,
+                               line.end_offset))
+
+                if len(window) >= SD_UPLOAD_WINDOW:
+                    if not self._confirm_oldest(window, keep_going):
+                        return False
+
+            while window:
+                if not self._confirm_oldest(window, keep_going):
+                    return False
+            return True
+        finally:
+            reader.stop()
+            reader.wait_stopped()
+
+    def _confirm_oldest(self, window: Deque[Tuple[Instruction, int, int]],
+                        keep_going: Callable[[], bool]) -> bool:
+        """Waits for the oldest line in the window to get written"""
+        instruction, index, end_offset = window.popleft()
+        if not self._wait(instruction, keep_going):
+            return False
+        self.confirmed_line = index + 1
+        self.confirmed_offset = end_offset
+        self.sent_bytes += len(instruction.data or b"")
+        UPLOADED_BYTES.inc(len(instruction.data or b""))
+        self._report_progress()
+        return True
@@ -5,21 +5,78 @@ track of Linux and folder storage.
 import abc
 import logging
 import os
+import re
 import select
-from typing import List, Set
+from time import monotonic
+from typing import Dict, List, Optional, Set, Tuple
 
 from blinker import Signal  # type: ignore
 
 from ...config import Config
 from ...const import (BLACKLISTED_NAMES, BLACKLISTED_PATHS, BLACKLISTED_TYPES,
-                      DIR_RESCAN_INTERVAL, QUIT_INTERVAL)
+                      DIR_RESCAN_INTERVAL, DIR_WATCH_RESCAN_INTERVAL)
 from ...util import ensure_directory, get_clean_path
 from ..model import Model
 from ..structures.module_data_classes import StorageData
 from ..updatable import ThreadedUpdatable
+from .inotify import (IN_ATTRIB, IN_CREATE, IN_DELETE, IN_DELETE_SELF,
+                      IN_MOVE_SELF, IN_MOVED_FROM, IN_MOVED_TO, IN_ONLYDIR,
+                      Inotify)
 
 log = logging.getLogger(__name__)
 
+MOUNTINFO_PATH = "/proc/self/mountinfo"
+OCTAL_ESCAPE = re.compile(r"\\([0-7]{3})")
+
+# What to watch on the configured directories and on their parents
+SELF_EVENTS = IN_ATTRIB | IN_DELETE_SELF | IN_MOVE_SELF
+CHILD_EVENTS = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ATTRIB
+
+
+def parse_mountinfo_line(line: str) -> Optional[Tuple[str, str]]:
+    """
+    Returns the mount point and the filesystem type from a mountinfo line.
+    The optional fields end with a lone dash, the type is right after it
+    """
+    fields = line.split(" ")
+    try:
+        separator = fields.index("-", 6)
+        mount_point = fields[4]
+        fs_type = fields[separator + 1]
+    except (ValueError, IndexError):
+        return None
+    # Spaces and such are escaped as octal numbers
+    mount_point = OCTAL_ESCAPE.sub(lambda match: chr(int(match.group(1), 8)),
+                                   mount_point)
+    return mount_point, fs_type
+
+
+class MountTable:
+    """
+    The mounts from mountinfo. On a change, only the added and removed
+    lines get parsed, the mount ID at the start keeps them unique
+    """
+
+    def __init__(self) -> None:
+        self.lines: Dict[str, Tuple[str, str]] = {}
+
+    def update(self, text: str) -> bool:
+        """Applies a new mountinfo, returns whether anything changed"""
+        new_lines = set(text.splitlines())
+        removed = self.lines.keys() - new_lines
+        added = new_lines - self.lines.keys()
+        for line in removed:
+            del self.lines[line]
+        for line in added:
+            mount = parse_mountinfo_line(line)
+            if mount is not None:
+                self.lines[line] = mount
+        return bool(removed or added)
+
+    def mounts(self) -> List[Tuple[str, str]]:
+        """The current mount points with their filesystem types"""
+        return list(self.lines.values())
+
 
 class Storage(ThreadedUpdatable):
     """
@@ -57,6 +114,20 @@ class Storage(ThreadedUpdatable):
 
         self.data.attached_set = set()
 
+        # Written into on stop, to wake the thread waiting for storage events
+        self.stop_read, self.stop_write = os.pipe()
+
+    def stop(self):
+        """Stops the thread, even if it's waiting for an event"""
+        super().stop()
+        os.write(self.stop_write, b"\0")
+
+    def wait_stopped(self):
+        """Waits for the thread to quit, closes the stop pipe"""
+        super().wait_stopped()
+        os.close(self.stop_read)
+        os.close(self.stop_write)
+
     def update(self):
         """
         Synchronizes our data model with the OS, produces signals for
@@ -154,7 +225,7 @@ class FilesystemStorage(Storage):
     """
 
     thread_name = "filesystem_storage_thread"
-    update_interval = 0  # The waiting is done in epoll timeout instead of here
+    update_interval = 0  # The waiting is done in epoll instead of here
 
     def __init__(self, model: Model, cfg: Config):
         FilesystemStorage.paths_to_storage = \
@@ -171,31 +242,40 @@ class FilesystemStorage(Storage):
         # which things are attached, before beginning to only observe changes
         self.force_update = True
 
+        self.mount_table = MountTable()
+
+        # The kernel signals a mount table change with POLLPRI
         # pylint: disable=consider-using-with
-        self.mtab = open("/etc/mtab", "r", encoding='utf-8')
-        self.epoll_obj = select.epoll(1)
-        self.epoll_obj.register(self.mtab.fileno(), select.EPOLLOUT)
+        self.mountinfo = open(MOUNTINFO_PATH, "r", encoding='utf-8')
+        self.epoll_obj = select.epoll(2)
+        self.epoll_obj.register(self.mountinfo.fileno(),
+                                select.EPOLLPRI | select.EPOLLERR)
+        self.epoll_obj.register(self.stop_read, select.EPOLLIN)
 
     def get_data_object(self) -> StorageData:
         return self.model.filesystem_storage
 
     def get_storage(self) -> Set[str]:
         """
-        Checks epoll for storage changes. if there are changes, gets
-        a new storage list from mtab.
+        Waits for storage changes. If there are changes, gets
+        a new storage list from the mount table.
         If not, returns the current storage
         """
-        # Non-empty epoll result means something regarding storage has changed
-        epoll_result = self.epoll_obj.poll(QUIT_INTERVAL)
-        if epoll_result or self.force_update:
+        changed = self.force_update
+        if not changed:
+            # Sleeps until the mount table changes, or until stopped
+            epoll_result = self.epoll_obj.poll()
+            changed = any(fd == self.mountinfo.fileno()
+                          for fd, _ in epoll_result)
+        if changed and not self.quit_evt.is_set():
             self.force_update = False
 
-            self.mtab.seek(0)
-            new_storage_set: Set[str] = set()
+            self.mountinfo.seek(0)
+            if not self.mount_table.update(self.mountinfo.read()):
+                return self.data.attached_set
 
-            line_list = self.mtab.readlines()
-            for line in line_list:
-                _name, string_path, fs_type, *_ = line.split(" ")
+            new_storage_set: Set[str] = set()
+            for string_path, fs_type in self.mount_table.mounts():
                 clean_path = get_clean_path(string_path)
 
                 if self.storage_belongs(clean_path, fs_type):
@@ -211,16 +291,20 @@ class FilesystemStorage(Storage):
         type_valid = is_wanted and fs_type not in BLACKLISTED_TYPES
         return is_wanted and type_valid
 
-    def stop(self):
-        """Stops this component"""
-        super().stop()
-        self.mtab.close()
+    def wait_stopped(self):
+        """Waits for the thread to quit, then closes the mount table"""
+        super().wait_stopped()
+        self.epoll_obj.close()
+        self.mountinfo.close()
 
 
 class FolderStorage(Storage):
     """
     Configured directories are reported as storage too,
     having the fs_type of "directory".
+
+    Rescans only when inotify reports a change to the directories or their
+    parents. Falls back to periodic rescans without inotify
     """
 
     def __init__(self, model: Model, cfg: Config):
@@ -237,8 +321,22 @@ class FolderStorage(Storage):
         for directory in self.data.configured_storage:
             ensure_directory(directory)
 
+        self.force_update = True
+        self.scanned_at = 0.0
+        self.inotify: Optional[Inotify] = None
+        self.poll = select.poll()
+        try:
+            self.inotify = Inotify()
+        except (OSError, AttributeError):
+            log.warning("Cannot use inotify, the storage directories will "
+                        "be re-scanned every %ss", DIR_RESCAN_INTERVAL)
+            self.update_interval = DIR_RESCAN_INTERVAL
+        else:
+            self.poll.register(self.inotify.fd, select.POLLIN)
+            self.poll.register(self.stop_read, select.POLLIN)
+
     thread_name = "folder_storage_thread"
-    update_interval = DIR_RESCAN_INTERVAL
+    update_interval = 0  # The waiting is done in inotify instead of here
 
     def get_data_object(self) -> StorageData:
         """
@@ -248,6 +346,54 @@ class FolderStorage(Storage):
         return self.model.folder_storage
 
     def get_storage(self) -> Set[str]:
+        """
+        Sleeps until an inotify event, or until stopped. Re-scans the
+        directories only if something happened to them, or if it's been
+        a long time
+        """
+        if self.inotify is not None and not self.force_update:
+            until_rescan = \
+                self.scanned_at + DIR_WATCH_RESCAN_INTERVAL - monotonic()
+            if until_rescan > 0:
+                self.poll.poll(until_rescan * 1000)
+            if self.quit_evt.is_set():
+                return self.data.attached_set
+            events = self.inotify.read_events()
+            since_scan = monotonic() - self.scanned_at
+            if not events and since_scan < DIR_WATCH_RESCAN_INTERVAL:
+                return self.data.attached_set
+        self.force_update = False
+        self.scanned_at = monotonic()
+
+        new_directory_set = self.scan()
+        if self.inotify is not None:
+            self.watch()
+        return new_directory_set
+
+    def watch(self):
+        """
+        Watches the configured directories and their parents, so their
+        creation gets noticed too. For a missing parent, the closest
+        existing ancestor gets watched instead
+        """
+        assert self.inotify is not None
+        self.inotify.remove_all()
+        masks: Dict[str, int] = {}
+        for directory in self.data.configured_storage:
+            if os.path.isdir(directory):
+                masks[directory] = masks.get(directory, 0) | SELF_EVENTS
+            parent = os.path.dirname(directory)
+            while parent != "/" and not os.path.isdir(parent):
+                parent = os.path.dirname(parent)
+            masks[parent] = masks.get(parent, 0) | CHILD_EVENTS
+        for path, mask in masks.items():
+            try:
+                self.inotify.add_watch(path, mask | IN_ONLYDIR)
+            except OSError:
+                log.debug("Cannot watch %s", path)
+
+    def scan(self) -> Set[str]:
+        """Checks which of the configured directories are usable"""
         new_directory_set: Set[str] = set()
         for directory in self.data.configured_storage:
 
@@ -272,3 +418,9 @@ class FolderStorage(Storage):
         exists = os.path.exists(directory)
         readable = exists and os.access(directory, os.R_OK)
         return exists and readable
+
+    def wait_stopped(self):
+        """Waits for the thread to quit, then stops watching"""
+        super().wait_stopped()
+        if self.inotify is not None:
+            self.inotify.close()
@@ -41,7 +41,7 @@ class StorageController:
         self.state_manager = state_manager
         self.model = model
 
-        self.sd_card = SDCard(self.serial_queue, self.serial_parser,
+        self.sd_card = SDCard(cfg, self.serial_queue, self.serial_parser,
                               self.state_manager, self.model)
         self.sd_card.sd_attached_signal.connect(self.sd_attached)
         self.sd_card.sd_detached_signal.connect(self.sd_detached)
@@ -0,0 +1,12 @@
+"""Contains the GcodeLine passed through the file printer pipeline"""
+from typing import NamedTuple, Optional
+
+
+class GcodeLine(NamedTuple):
+    """A pre-cleaned line of the printed file"""
+    line_index: int
+    end_offset: int
+    gcode: str
+    layer_change: bool
+    # The feed rate in effect for the move, if the optimizer knows it
+    feed_rate: Optional[str] = None
@@ -0,0 +1,172 @@
+"""
+Contains implementation of the GcodeReader class
+
+Reads the printed file ahead on its own thread, so slow storage does not
+stall the thread sending G-codes to the printer
+"""
+import logging
+from queue import Empty, Full, Queue
+from threading import Event
+from typing import Callable, List, Optional
+
+from ..const import (QUIT_INTERVAL, READ_AHEAD_BLOCK_SIZE, READ_AHEAD_LINES,
+                     READ_AHEAD_LOW_WATER)
+from ..util import get_gcode, prctl_name
+from .arc_fitter import ArcFitter
+from .gcode_line import GcodeLine
+from .gcode_optimizer import GcodeOptimizer
+from .updatable import Thread
+
+log = logging.getLogger(__name__)
+
+
+class GcodeReader:
+    """
+    Producer of the file printer pipeline. Pulls big blocks of the file,
+    splits them into lines and strips the comments. Only the lines
+    containing a G-code or a layer change make it into the bounded buffer.
+    If given an arc fitter and an optimizer, the G-codes go through
+    those on the way too.
+    """
+
+    def __init__(self, file_path: str, from_line: int = 0,
+                 optimizer: Optional[GcodeOptimizer] = None,
+                 arc_fitter: Optional[ArcFitter] = None) -> None:
+        self.file_path = file_path
+        self.from_line = from_line
+        self.optimizer = optimizer
+        self.arc_fitter = arc_fitter
+
+        self.buffer: "Queue[Optional[GcodeLine]]" = Queue(
+            maxsize=READ_AHEAD_LINES)
+        self.quit_evt = Event()
+        self.reached_end = False
+        self.finished = False
+        # Set when the file could not be read through, the end of the lines
+        # does not mean the end of the file then
+        self.error: Optional[Exception] = None
+        # Don't report the buffer being low, before it first fills up
+        self.low = True
+        self.thread = Thread(target=self._read,
+                             name="gcode_reader",
+                             daemon=True)
+
+    @property
+    def fill(self) -> float:
+        """How full is the buffer, from 0 to 1. Full once the file's read"""
+        if self.reached_end:
+            return 1.0
+        return self.buffer.qsize() / READ_AHEAD_LINES
+
+    def start(self) -> None:
+        """Starts reading ahead"""
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stops the reader, even if it's waiting for space in the buffer"""
+        self.quit_evt.set()
+
+    def wait_stopped(self) -> None:
+        """Waits for the reader thread to quit"""
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def _put(self, item: Optional[GcodeLine]) -> bool:
+        """Waits for space in the buffer. Returns False when stopped"""
+        while not self.quit_evt.is_set():
+            try:
+                self.buffer.put(item, timeout=QUIT_INTERVAL)
+            except Full:
+                continue
+            return True
+        return False
+
+    def _put_all(self, lines: List[GcodeLine]) -> bool:
+        """Optimizes the lines and puts them into the buffer"""
+        for line in lines:
+            if line.gcode and self.optimizer is not None:
+                line = line._replace(
+                    gcode=self.optimizer.optimize(line.gcode),
+                    feed_rate=self.optimizer.feed_rate)
+            if not self._put(line):
+                return False
+        return True
+
+    def _read(self) -> None:
+        """Reads the file block by block into the buffer"""
+        prctl_name()
+        line_index = 0
+        offset = 0
+        read = 0
+        remainder = b""
+        block = bytearray(READ_AHEAD_BLOCK_SIZE)
+        try:
+            with open(self.file_path, "rb", buffering=0) as file:
+                while not self.quit_evt.is_set():
+                    size = file.readinto(block)
+                    read += size
+                    if not size:
+                        self.reached_end = True
+                        lines = [remainder] if remainder else []
+                        remainder = b""
+                    else:
+                        lines = (remainder + block[:size]).split(b"\n")
+                        remainder = lines.pop()
+
+                    for raw_line in lines:
+                        # The last line does not have to end with a newline
+                        offset = min(offset + len(raw_line) + 1, read)
+                        index = line_index
+                        line_index += 1
+                        if index < self.from_line:
+                            continue
+                        line = raw_line.decode("utf-8", errors="replace")
+                        gcode = get_gcode(line)
+                        layer_change = ";LAYER_CHANGE" in line
+                        if not gcode and not layer_change:
+                            continue
+                        ready = [GcodeLine(index, offset, gcode,
+                                           layer_change)]
+                        if self.arc_fitter is not None:
+                            ready = self.arc_fitter.feed(ready[0])
+                        if not self._put_all(ready):
+                            return
+
+                    if not size:
+                        if self.arc_fitter is not None:
+                            self._put_all(self.arc_fitter.flush())
+                        break
+        except Exception as exception:  # pylint: disable=broad-except
+            log.exception("Failed to read %s", self.file_path)
+            self.error = exception
+        finally:
+            self._put(None)
+
+    def get(self, keep_waiting: Callable[[], bool]) -> Optional[GcodeLine]:
+        """
+        Pops the next ready line, None means the file has ended,
+        or failed to be read if the error is set.
+        Reports when the buffer runs low, as that means the storage
+        cannot keep up with the printer
+        """
+        if self.finished:
+            return None
+        buffered = self.buffer.qsize()
+        if buffered < READ_AHEAD_LOW_WATER and not self.reached_end:
+            if not self.low:
+                self.low = True
+                log.warning("G-code read ahead buffer is running low, "
+                            "%s lines buffered. The storage is too slow",
+                            buffered)
+        elif buffered >= READ_AHEAD_LOW_WATER:
+            self.low = False
+
+        while keep_waiting():
+            try:
+                item = self.buffer.get(timeout=QUIT_INTERVAL)
+            except Empty:
+                continue
+            if item is None:
+                self.finished = True
+            return item
+        return None
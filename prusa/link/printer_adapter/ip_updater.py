@@ -12,6 +12,7 @@ from prusa.connect.printer.conditions import CondState
 from ..conditions import LAN
 from ..const import IP_UPDATE_INTERVAL, IP_WRITE_TIMEOUT
 from ..serial.helpers import enqueue_instruction, wait_for_instruction
+from ..serial.instruction import Priority
 from ..serial.serial_queue import SerialQueue
 from ..util import get_local_ip, get_local_ip6
 from .model import Model
@@ -175,10 +176,12 @@ class IPUpdater(ThreadedUpdatable):
 
         if ip_address is None or reset:
             instruction = enqueue_instruction(self.serial_queue,
-                                              "M552 P0.0.0.0")
+                                              "M552 P0.0.0.0",
+                                              priority=Priority.COSMETIC)
         else:
             instruction = enqueue_instruction(self.serial_queue,
-                                              f"M552 P{ip_address}")
+                                              f"M552 P{ip_address}",
+                                              priority=Priority.COSMETIC)
 
         if timeout > 0:
             timeout_at = time() + timeout
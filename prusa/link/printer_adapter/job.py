@@ -2,18 +2,20 @@
 import logging
 import os
 import re
+import struct
 
 from blinker import Signal  # type: ignore
 from prusa.connect.printer import Printer
 
 from ..const import JOB_ENDING_STATES, SD_STORAGE_NAME, JOB_STARTING_STATES, \
     JOB_DESTROYING_STATES
-from ..serial.helpers import enqueue_instruction
+from ..serial.instruction import Priority
 from ..serial.serial_parser import ThreadedSerialParser
 from ..serial.serial_queue import SerialQueue
+from .eeprom_mirror import EEPROMMirror
 from .model import Model
 from .structures.mc_singleton import MCSingleton
-from .structures.model_classes import JobState
+from .structures.model_classes import EEPROMParams, JobState
 from .structures.module_data_classes import JobData
 
 log = logging.getLogger(__name__)
@@ -25,11 +27,12 @@ class Job(metaclass=MCSingleton):
     # pylint: disable=too-many-arguments
     def __init__(self, serial_parser: ThreadedSerialParser,
                  serial_queue: SerialQueue,
-                 model: Model, printer: Printer):
+                 model: Model, printer: Printer, eeprom: EEPROMMirror):
         # Sent every time the job id should disappear, appear or update
         self.printer = printer
         self.serial_parser = serial_parser
         self.serial_queue = serial_queue
+        self.eeprom = eeprom
 
         # Unused
         self.job_id_updated_signal = Signal()  # kwargs: job_id: int
@@ -143,9 +146,10 @@ class Job(metaclass=MCSingleton):
         if self.data.job_id is None:
             return
 
-        enqueue_instruction(self.serial_queue,
-                            f"D3 Ax0D05 X{self.data.job_id:08x}",
-                            to_front=True)
+        # Has to get there before the print does, not in its gaps
+        self.eeprom.write(EEPROMParams.JOB_ID,
+                          struct.pack(">I", self.data.job_id),
+                          priority=Priority.CONTROL)
 
     def set_file_path(self, path, path_incomplete, prepend_sd_storage):
         """Decides if the supplied file path is better, than what we had
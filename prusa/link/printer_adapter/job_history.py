@@ -0,0 +1,401 @@
+"""
+Contains implementation of the JobHistory class
+
+Keeps an append-only binary journal for every print job. Records are framed
+with their type, length and a crc32, so a journal cut short by a power loss
+can be read up to the last complete record and repaired.
+"""
+import json
+import logging
+import math
+import os
+import struct
+import zlib
+from enum import IntEnum
+from threading import Lock
+from time import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from prusa.connect.printer.const import State
+
+from ..config import Config
+from ..const import (HISTORY_COMPACT_SIZE, HISTORY_FLUSH_INTERVAL,
+                     HISTORY_MAX_SIZE, HISTORY_SAMPLE_INTERVAL)
+from ..util import ensure_directory, get_clean_path
+from .model import Model
+from .updatable import ThreadedUpdatable
+
+log = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".journal"
+
+# type, payload length, crc32 of the payload
+RECORD_HEADER = struct.Struct("<BHI")
+TIMESTAMP = struct.Struct("<d")
+PROGRESS = struct.Struct("<dbi")
+TEMPERATURES = struct.Struct("<dffff")
+
+
+class RecordType(IntEnum):
+    """Types of records stored in a job journal"""
+    STATE = 1
+    PROGRESS = 2
+    TEMPERATURES = 3
+    PAUSE = 4
+    RESUME = 5
+    SUMMARY = 6
+
+
+EVENT_TYPES = {RecordType.STATE, RecordType.PAUSE, RecordType.RESUME}
+
+
+def encode_record(record_type: RecordType, payload: bytes) -> bytes:
+    """Frames the payload, so it can be appended to a journal"""
+    return RECORD_HEADER.pack(record_type, len(payload),
+                              zlib.crc32(payload)) + payload
+
+
+def decode_records(data: bytes) -> Tuple[List[Tuple[RecordType, bytes]], int]:
+    """
+    Splits journal data into records
+    :return: the valid records and the length of data they occupy, anything
+    after that is a torn or corrupted write
+    """
+    records = []
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        record_type, length, crc = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            break
+        try:
+            records.append((RecordType(record_type), payload))
+        except ValueError:
+            break
+        offset = start + length
+    return records, offset
+
+
+def _optional(value: float) -> Optional[float]:
+    """NaN stands for a missing value in the packed records"""
+    if math.isnan(value):
+        return None
+    return round(value, 2)
+
+
+def record_to_dict(record_type: RecordType, payload: bytes) -> Dict[str, Any]:
+    """Decodes a record payload into a dict fit for the API"""
+    if record_type == RecordType.SUMMARY:
+        return json.loads(payload.decode("utf-8"))
+    timestamp = TIMESTAMP.unpack_from(payload)[0]
+    data: Dict[str, Any] = {"type": record_type.name, "time": timestamp}
+    if record_type == RecordType.STATE:
+        from_state, to_state = payload[TIMESTAMP.size:].decode(
+            "ascii").split(":")
+        data["from_state"] = from_state
+        data["to_state"] = to_state
+    elif record_type == RecordType.PROGRESS:
+        _, progress, time_remaining = PROGRESS.unpack(payload)
+        data["progress"] = progress if progress >= 0 else None
+        data["time_remaining"] = \
+            time_remaining if time_remaining >= 0 else None
+    elif record_type == RecordType.TEMPERATURES:
+        _, *temperatures = TEMPERATURES.unpack(payload)
+        for key, value in zip(("temp_nozzle", "target_nozzle", "temp_bed",
+                               "target_bed"), temperatures):
+            data[key] = _optional(value)
+    return data
+
+
+def summarize(records: List[Tuple[RecordType, bytes]]) -> Dict[str, Any]:
+    """
+    Folds the journal records into a summary, merging any previous summary
+    found among them
+    """
+    summary: Dict[str, Any] = {
+        "type": RecordType.SUMMARY.name,
+        "started": None,
+        "ended": None,
+        "samples": 0,
+        "pauses": 0,
+        "last_progress": None,
+        "last_time_remaining": None,
+        "max_temp_nozzle": None,
+        "max_temp_bed": None,
+    }
+
+    def maximum(key, value):
+        if value is not None and (summary[key] is None
+                                  or value > summary[key]):
+            summary[key] = value
+
+    def timestamp(value):
+        if value is None:
+            return
+        if summary["started"] is None or value < summary["started"]:
+            summary["started"] = value
+        if summary["ended"] is None or value > summary["ended"]:
+            summary["ended"] = value
+
+    for record_type, payload in records:
+        data = record_to_dict(record_type, payload)
+        if record_type == RecordType.SUMMARY:
+            # Events are kept through compaction, only samples get folded
+            summary["samples"] += data["samples"]
+            timestamp(data["started"])
+            timestamp(data["ended"])
+            maximum("max_temp_nozzle", data["max_temp_nozzle"])
+            maximum("max_temp_bed", data["max_temp_bed"])
+            if summary["last_progress"] is None:
+                summary["last_progress"] = data["last_progress"]
+                summary["last_time_remaining"] = data["last_time_remaining"]
+            continue
+
+        timestamp(data["time"])
+        if record_type == RecordType.PAUSE:
+            summary["pauses"] += 1
+        elif record_type == RecordType.PROGRESS:
+            summary["samples"] += 1
+            if data["progress"] is not None:
+                summary["last_progress"] = data["progress"]
+            if data["time_remaining"] is not None:
+                summary["last_time_remaining"] = data["time_remaining"]
+        elif record_type == RecordType.TEMPERATURES:
+            summary["samples"] += 1
+            maximum("max_temp_nozzle", data["temp_nozzle"])
+            maximum("max_temp_bed", data["temp_bed"])
+    return summary
+
+
+class JobHistory(ThreadedUpdatable):
+    """
+    Journals state transitions, progress and temperatures of print jobs.
+
+    Other components only append encoded records into a pending list,
+    the updater thread samples the telemetry, writes everything out in
+    batches with a single fsync, compacts and enforces the size limit
+    """
+    thread_name = "job_history"
+    update_interval = HISTORY_SAMPLE_INTERVAL
+
+    def __init__(self, cfg: Config, model: Model):
+        self.model = model
+        self.path = get_clean_path(cfg.daemon.job_history_dir)
+        ensure_directory(self.path)
+
+        self.lock = Lock()
+        self.pending: Dict[int, List[bytes]] = {}
+        self.to_compact: List[int] = []
+        self.flush_requested = False
+        self.last_flush = time()
+        self.last_job_id: Optional[int] = None
+        # Journals checked for a torn tail since we've started
+        self.verified: Set[int] = set()
+        super().__init__()
+
+    def journal_path(self, job_id: int) -> str:
+        """Returns the path of the journal for the given job id"""
+        return os.path.join(self.path, f"{job_id}{JOURNAL_SUFFIX}")
+
+    def _append(self, record_type: RecordType, payload: bytes) -> None:
+        """Adds a record for the current job, does not touch the disk"""
+        job_id = self.model.job.get_job_id_for_api()
+        if job_id is None:
+            return
+        with self.lock:
+            self.pending.setdefault(job_id, []).append(
+                encode_record(record_type, payload))
+            if job_id != self.last_job_id:
+                if self.last_job_id is not None:
+                    self.to_compact.append(self.last_job_id)
+                self.last_job_id = job_id
+
+    def state_changed(self, from_state: State, to_state: State) -> None:
+        """Records a state transition, pauses and resumes as events too"""
+        now = time()
+        self._append(
+            RecordType.STATE,
+            TIMESTAMP.pack(now) +
+            f"{from_state.value}:{to_state.value}".encode("ascii"))
+        if to_state == State.PAUSED:
+            self._append(RecordType.PAUSE, TIMESTAMP.pack(now))
+        elif from_state == State.PAUSED and to_state == State.PRINTING:
+            self._append(RecordType.RESUME, TIMESTAMP.pack(now))
+        if to_state not in {State.PRINTING, State.PAUSED}:
+            # The job is about to end, get the transition on the disk
+            with self.lock:
+                self.flush_requested = True
+
+    def job_ended(self) -> None:
+        """Schedules the journal of the last job for compaction"""
+        with self.lock:
+            if self.last_job_id is not None:
+                self.to_compact.append(self.last_job_id)
+                self.last_job_id = None
+            self.flush_requested = True
+
+    def _sample(self) -> None:
+        """Takes the progress and temperatures from the latest telemetry"""
+        telemetry = self.model.latest_telemetry
+        now = time()
+
+        def packed(value):
+            return float("nan") if value is None else value
+
+        progress = telemetry.progress
+        time_remaining = telemetry.time_remaining
+        self._append(
+            RecordType.PROGRESS,
+            PROGRESS.pack(now, -1 if progress is None else progress,
+                          -1 if time_remaining is None else time_remaining))
+        self._append(
+            RecordType.TEMPERATURES,
+            TEMPERATURES.pack(now, packed(telemetry.temp_nozzle),
+                              packed(telemetry.target_nozzle),
+                              packed(telemetry.temp_bed),
+                              packed(telemetry.target_bed)))
+
+    def update(self):
+        """Samples the telemetry, flushes and compacts when it's time"""
+        if self.model.job.get_job_id_for_api() is not None \
+                and self.model.state_manager.current_state == State.PRINTING:
+            self._sample()
+
+        with self.lock:
+            flush = self.flush_requested or self.to_compact or \
+                time() - self.last_flush > HISTORY_FLUSH_INTERVAL
+        if flush:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes out the pending records, each journal gets one fsync"""
+        with self.lock:
+            pending = self.pending
+            self.pending = {}
+            to_compact = self.to_compact
+            self.to_compact = []
+            self.flush_requested = False
+            self.last_flush = time()
+
+        for job_id, records in pending.items():
+            try:
+                self._write(job_id, b"".join(records))
+            except OSError:
+                log.exception("Failed to write the journal of job %s",
+                              job_id)
+                continue
+            if job_id not in to_compact and os.path.getsize(
+                    self.journal_path(job_id)) > HISTORY_COMPACT_SIZE:
+                to_compact.append(job_id)
+
+        for job_id in set(to_compact):
+            try:
+                self.compact(job_id)
+            except OSError:
+                log.exception("Failed to compact the journal of job %s",
+                              job_id)
+        if to_compact:
+            self.enforce_retention()
+
+    def _write(self, job_id: int, data: bytes) -> None:
+        """Appends data to a journal, a torn tail gets cut off first"""
+        path = self.journal_path(job_id)
+        with open(path, "ab+") as journal:
+            if job_id not in self.verified:
+                journal.seek(0)
+                _, valid_length = decode_records(journal.read())
+                if valid_length != journal.tell():
+                    log.warning("Repairing a damaged journal of job %s",
+                                job_id)
+                    journal.truncate(valid_length)
+                self.verified.add(job_id)
+            journal.write(data)
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def compact(self, job_id: int) -> None:
+        """
+        Replaces the samples in a journal with a summary record.
+        Events are kept. The new journal is written aside and renamed over
+        the old one, so a crash leaves one or the other intact
+        """
+        path = self.journal_path(job_id)
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as journal:
+            records, _ = decode_records(journal.read())
+
+        summary = summarize(records)
+        compacted = [
+            encode_record(record_type, payload)
+            for record_type, payload in records
+            if record_type in EVENT_TYPES
+        ]
+        compacted.append(
+            encode_record(RecordType.SUMMARY,
+                          json.dumps(summary).encode("utf-8")))
+
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as journal:
+            journal.write(b"".join(compacted))
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(temp_path, path)
+        log.debug("Compacted the journal of job %s", job_id)
+
+    def enforce_retention(self) -> None:
+        """Deletes the oldest journals above the total size limit"""
+        journals = []
+        for name in os.listdir(self.path):
+            if not name.endswith(JOURNAL_SUFFIX):
+                continue
+            stat = os.stat(os.path.join(self.path, name))
+            journals.append((stat.st_mtime, stat.st_size, name))
+
+        total_size = sum(size for _, size, _ in journals)
+        for _, size, name in sorted(journals):
+            if total_size <= HISTORY_MAX_SIZE:
+                break
+            if name == f"{self.last_job_id}{JOURNAL_SUFFIX}":
+                continue
+            os.remove(os.path.join(self.path, name))
+            total_size -= size
+            log.debug("Removed an old journal %s", name)
+
+    def get_history(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Reads the journal of a job including not yet written records
+        :return: None if nothing is known about the job
+        """
+        data = b""
+        path = self.journal_path(job_id)
+        if os.path.exists(path):
+            with open(path, "rb") as journal:
+                data = journal.read()
+        with self.lock:
+            data += b"".join(self.pending.get(job_id, []))
+        if not data:
+            return None
+
+        records, _ = decode_records(data)
+        history: Dict[str, Any] = {
+            "id": job_id,
+            "summary": None,
+            "events": [],
+            "samples": []
+        }
+        for record_type, payload in records:
+            record = record_to_dict(record_type, payload)
+            if record_type == RecordType.SUMMARY:
+                history["summary"] = record
+            elif record_type in EVENT_TYPES:
+                history["events"].append(record)
+            else:
+                history["samples"].append(record)
+        return history
+
+    def wait_stopped(self):
+        """Waits for the thread, then writes out whatever is left"""
+        super().wait_stopped()
+        self.flush()
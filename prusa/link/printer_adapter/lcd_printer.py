@@ -7,9 +7,9 @@ import math
 from functools import partial
 from pathlib import Path
 from queue import Queue
-from threading import Event
+from threading import Event, Lock
 from time import time
-from typing import Callable
+from typing import Callable, Dict, Optional, Set
 
 import unidecode
 from prusa.connect.printer import Printer
@@ -20,9 +20,11 @@ from prusa.connect.printer.const import State, TransferType
 from ..conditions import DEVICE, FW, ID, JOB_ID, LAN, PHY, SN, UPGRADED, \
     NET_TRACKER
 from ..config import Settings
-from ..const import (FW_MESSAGE_TIMEOUT, PRINTING_STATES, QUIT_INTERVAL,
-                     SLEEP_SCREEN_TIMEOUT)
+from ..const import (FW_MESSAGE_TIMEOUT, LCD_FULL_CHECK_INTERVAL,
+                     PRINTING_STATES, SLEEP_SCREEN_TIMEOUT)
+from ..metrics import REGISTRY
 from ..serial.helpers import enqueue_instruction, wait_for_instruction
+from ..serial.instruction import Instruction, Priority
 from ..serial.serial_parser import ThreadedSerialParser
 from ..serial.serial_queue import SerialQueue
 from .model import Model
@@ -35,6 +37,11 @@ from ..util import prctl_name
 
 log = logging.getLogger(__name__)
 
+LCD_DUPLICATE = REGISTRY.counter(
+    "prusalink_lcd_skipped_total",
+    "LCD messages not sent to the printer",
+    reason="duplicate")
+
 WELCOME_CHIME = [
     "M300 P100 S3200", "M300 P25 S0", "M300 P25 S4800", "M300 P75 S0",
     "M300 P25 S4800"
@@ -79,6 +86,18 @@ IDLE_PRIORITY = 10
 
 NETWORK_ERROR_GRACE = 20
 
+# The parts of the situation to re-check, when something changes
+CHECK_PRINTING = "printing"
+CHECK_ERRORS = "errors"
+CHECK_WIZARD = "wizard"
+CHECK_UPLOAD = "upload"
+CHECK_READY = "ready"
+CHECK_IDLE = "idle"
+ALL_CHECKS = (CHECK_PRINTING, CHECK_ERRORS, CHECK_WIZARD, CHECK_UPLOAD,
+              CHECK_READY, CHECK_IDLE)
+# Everything showing the IP or depending on the network conditions
+NETWORK_CHECKS = (CHECK_ERRORS, CHECK_WIZARD, CHECK_READY, CHECK_IDLE)
+
 
 def through_queue(func):
     """A decorator to mke functions use the LCDPrinter event queue when called
@@ -116,6 +135,21 @@ class LCDPrinter(metaclass=MCSingleton):
 
         self.notiff_event = Event()
 
+        # Only the changed parts of the situation get checked again
+        self.checks: Dict[str, Callable[[], None]] = {
+            CHECK_PRINTING: self._check_printing,
+            CHECK_ERRORS: self._check_errors,
+            CHECK_WIZARD: self._check_wizard,
+            CHECK_UPLOAD: self._check_upload,
+            CHECK_READY: self._check_ready,
+            CHECK_IDLE: self._check_idle,
+        }
+        self.check_lock = Lock()
+        self.to_check: Set[str] = set(ALL_CHECKS)
+        # Checks depending on time, and when to run them again
+        self.check_at: Dict[str, float] = {}
+        self.full_check_at = 0.0
+
         if self.settings.printer.network_error_chime:
             self.error_screen = Screen(chime_gcode=ERROR_CHIME)
         else:
@@ -172,6 +206,8 @@ class LCDPrinter(metaclass=MCSingleton):
         self.idle_from = time()
         # Used for ignoring LCD status updated that we generate
         self.ignore = 0
+        # The text of our last message, so it's not sent twice in a row
+        self.shown_text: Optional[str] = None
         self.serial_parser.add_decoupled_handler(LCD_UPDATE_REGEX,
                                                  self.lcd_updated)
 
@@ -194,6 +230,8 @@ class LCDPrinter(metaclass=MCSingleton):
         if self.ignore > 0:
             self.ignore -= 1
         else:
+            # Whatever we've shown is gone now
+            self.shown_text = None
             self._reset_idle()
             self.fw_msg_end_at = time() + FW_MESSAGE_TIMEOUT
             self.add_event(self.carousel.set_rewind)
@@ -207,13 +245,31 @@ class LCDPrinter(metaclass=MCSingleton):
 
     def whats_going_on(self):
         """Get a grip on the situation and set up the screens and carousel
-        accordingly"""
-        self._check_printing()
-        self._check_errors()
-        self._check_wizard()
-        self._check_upload()
-        self._check_ready()
-        self._check_idle()
+        accordingly. Checks only what changed or what's due"""
+        now = time()
+        if now >= self.full_check_at:
+            self.full_check_at = now + LCD_FULL_CHECK_INTERVAL
+            self._mark(*ALL_CHECKS)
+        for name, check_at in list(self.check_at.items()):
+            if now >= check_at:
+                del self.check_at[name]
+                self._mark(name)
+
+        with self.check_lock:
+            to_check, self.to_check = self.to_check, set()
+        for name in ALL_CHECKS:
+            if name in to_check:
+                self.checks[name]()
+
+    def _mark(self, *names: str):
+        """Marks the parts of the situation to check on the next wakeup"""
+        with self.check_lock:
+            self.to_check.update(names)
+
+    def _check_again_at(self, name: str, timestamp: float):
+        """Schedules a time dependent check"""
+        self.check_at[name] = min(self.check_at.get(name, timestamp),
+                                  timestamp)
 
     def _check_printing(self):
         """Should a printing display be activated? And what should it say?"""
@@ -242,10 +298,11 @@ class LCDPrinter(metaclass=MCSingleton):
         if NET_TRACKER.is_tracked(error):  # Silence the error until timeout
             if self.network_error_at is None:
                 self.network_error_at = time()
-                return None
 
             time_since_error = time() - self.network_error_at
             if time_since_error < NETWORK_ERROR_GRACE:
+                self._check_again_at(
+                    CHECK_ERRORS, self.network_error_at + NETWORK_ERROR_GRACE)
                 return None
 
         return error
@@ -259,6 +316,7 @@ class LCDPrinter(metaclass=MCSingleton):
 
         if error is not None and not error_grace_ended:
             self.carousel.enable(self.wait_screen)
+            self._check_again_at(CHECK_ERRORS, self.ignore_errors_to)
         else:
             self._message_and_disable(self.wait_screen, "PrusaLink OK")
 
@@ -401,7 +459,10 @@ class LCDPrinter(metaclass=MCSingleton):
 
     def _check_idle(self):
         """Should the idle screen be shown? And what should it say?"""
-        if time() - self.idle_from > SLEEP_SCREEN_TIMEOUT and LAN:
+        idle_at = self.idle_from + SLEEP_SCREEN_TIMEOUT
+        if time() < idle_at:
+            self._check_again_at(CHECK_IDLE, idle_at)
+        if time() > idle_at and LAN:
             self.carousel.enable(self.idle_screen)
             ip = self.model.ip_updater.local_ip
             speed = self.model.latest_telemetry.speed
@@ -427,14 +488,18 @@ class LCDPrinter(metaclass=MCSingleton):
             self.carousel.disable(self.idle_screen)
 
     def get_wait_interval(self):
-        """How long to wait until the next line might want to be shown"""
+        """
+        How long to wait until the next line might want to be shown,
+        or until a time dependent check is due. Changes wake us up sooner
+        """
         current_time = time()
 
-        wait_for = QUIT_INTERVAL
-        wait_for = max(wait_for, self.fw_msg_end_at - current_time)
-        if self.current_line is not None:
-            wait_for = max(wait_for, self.current_line.ends_at - current_time)
-        return wait_for
+        wake_at = min([self.full_check_at, *self.check_at.values()])
+        if self.fw_msg_end_at > current_time:
+            wake_at = min(wake_at, self.fw_msg_end_at)
+        elif self.current_line is not None:
+            wake_at = min(wake_at, self.current_line.ends_at)
+        return max(0.0, wake_at - current_time)
 
     def should_advance_carousel(self):
         """Should we get a new line from the carousel?"""
@@ -455,7 +520,7 @@ class LCDPrinter(metaclass=MCSingleton):
             self.notiff_event.wait(self.get_wait_interval())
             self.notiff_event.clear()
 
-            if not self.event_queue.empty():
+            while not self.event_queue.empty():
                 handler = self.event_queue.get()
                 handler()
 
@@ -470,42 +535,50 @@ class LCDPrinter(metaclass=MCSingleton):
 
     def _print(self, line: LCDLine, to_wait=None):
         """
-        Sends the given message using M117 gcode and waits for its
-        confirmation
+        Sends the given message using M117 gcode. The message waits for
+        a gap in the print and gets replaced, if a newer one comes before
+        that. Text already on the LCD is not sent again
 
         :param line: Text to be shown in the status portion of the printer LCD
+        :param to_wait: if given, waits for the confirmation while it's True
         """
         if line.resets_idle:
             self._reset_idle()
         ascii_text = unidecode.unidecode(line.text)
-        self.ignore += 1
-        instruction = enqueue_instruction(self.serial_queue,
-                                          f"M117 \x7E{ascii_text}",
-                                          to_front=True)
+
+        if ascii_text == self.shown_text:
+            LCD_DUPLICATE.inc()
+        else:
+            self.shown_text = ascii_text
+            self.ignore += 1
+            instruction = Instruction(f"M117 \x7E{ascii_text}")
+            if self.serial_queue.replace_lcd(instruction) is not None:
+                # The replaced one won't make the printer report anything
+                self.ignore -= 1
+
+            if to_wait is not None and wait_for_instruction(instruction,
+                                                            to_wait):
+                log.debug("Printed: '%s' on the LCD.", line.text)
 
         # Play a sound accompanying the newly shown thing
         if line.chime_gcode:
             for command in line.chime_gcode:
-                enqueue_instruction(self.serial_queue, command)
+                enqueue_instruction(self.serial_queue, command,
+                                    priority=Priority.COSMETIC)
 
-        if to_wait is None:
-            success = wait_for_instruction(instruction,
-                                           should_wait_evt=self.quit_evt)
-        else:
-            success = wait_for_instruction(instruction, to_wait)
-        if success:
-            log.debug("Printed: '%s' on the LCD.", line.text)
         line.reset_end()
 
     def _reset_idle(self):
         """Reset the idle time form to the current time"""
         self.idle_from = time()
+        self._mark(CHECK_IDLE)
 
     def stop(self, fast=False):
         """
         Stops the module, if not required to go fast, prints a goodbye message
         """
         self.quit_evt.set()
+        self.notify()
         if not fast:
             time_out_at = time() + 5
             self.wait_stopped()
@@ -521,13 +594,23 @@ class LCDPrinter(metaclass=MCSingleton):
         self.event_queue.put(handler)
         self.notify()
 
-    def notify(self):
-        """Wakes up the LCD printer, so it checks its state"""
+    def notify(self, *names: str):
+        """
+        Wakes up the LCD printer, so it checks the named parts
+        of the situation, or all of them if none are named
+        """
+        self._mark(*(names or ALL_CHECKS))
         self.notiff_event.set()
 
+    def printer_reconnected(self):
+        """The printer got reset, so our last message is not shown anymore"""
+        self.shown_text = None
+        self.ignore = 0
+
     def reset_error_grace(self):
         """Resets the grace period for errors to clear"""
         self.ignore_errors_to = time() + ERROR_GRACE
+        self.notify(CHECK_ERRORS)
 
     @through_queue
     def print_message(self, line: LCDLine):
@@ -0,0 +1,225 @@
+"""
+Contains implementation of the MotionModel class
+
+Predicts how long the printer spends on each part of a G-code file, so the
+progress and time remaining of USB prints can be estimated by the byte
+offset instead of by the number of G-codes sent
+"""
+import logging
+from typing import Dict, List, Optional, Type
+
+import numpy as np
+
+from ..const import (MOTION_CHUNK_SIZE, MOTION_TABLE_RESOLUTION, LimitsFDM,
+                     LimitsMK3S)
+
+log = logging.getLogger(__name__)
+
+AXES = "XYZE"
+
+
+class MotionModel:
+    """
+    Built in a single streaming pass over a file. The parsed moves are
+    collected into chunks, their durations are computed with numpy using
+    a trapezoidal speed profile clamped by the printer's motion limits.
+    The result is a table of cumulative time by byte offset, sampled
+    every MOTION_TABLE_RESOLUTION bytes
+    """
+
+    def __init__(self, limits: Type[LimitsFDM] = LimitsMK3S):
+        self.max_speeds = np.array([
+            limits.max_feedrate_x, limits.max_feedrate_y,
+            limits.max_feedrate_z, limits.max_feedrate_e
+        ], dtype=np.float64)
+        self.acceleration = float(limits.acceleration)
+
+        # Parser state
+        self.position: Dict[str, float] = dict.fromkeys(AXES, 0.0)
+        self.feedrate = 1500.0  # mm/min
+        self.relative = False
+        self.relative_e = False
+
+        # Pending moves of the current chunk
+        self._targets: List[List[float]] = []
+        self._feedrates: List[float] = []
+        self._offsets: List[int] = []
+        self._dwells: List[float] = []
+        self._dwell_offsets: List[int] = []
+        self._chunk_start = np.zeros(4, dtype=np.float64)
+
+        # Finished chunks of (line end offset, cumulative time)
+        self._table_offsets: List[np.ndarray] = []
+        self._table_times: List[np.ndarray] = []
+        self._elapsed = 0.0
+        self._last_sampled = -MOTION_TABLE_RESOLUTION
+
+        self.offsets: Optional[np.ndarray] = None
+        self.times: Optional[np.ndarray] = None
+
+    @property
+    def total_time(self) -> float:
+        """The predicted duration of the whole file in seconds"""
+        return self._elapsed
+
+    def feed(self, gcode: str, end_offset: int) -> None:
+        """
+        Parses a G-code, already stripped of comments
+        :param gcode: the G-code to parse
+        :param end_offset: the byte offset right behind its line
+        """
+        if not gcode:
+            return
+        words = gcode.split()
+        command = words[0].upper()
+        if command in ("G0", "G1"):
+            self._move(words[1:], end_offset)
+        elif command == "G4":
+            self._dwell(words[1:], end_offset)
+        elif command == "G90":
+            self.relative = False
+            self.relative_e = False
+        elif command == "G91":
+            self.relative = True
+            self.relative_e = True
+        elif command == "M82":
+            self.relative_e = False
+        elif command == "M83":
+            self.relative_e = True
+        elif command == "G92":
+            self._set_position(words[1:])
+        elif command == "G28":
+            self._home(words[1:])
+
+    def _parameters(self, words):
+        """Returns a dict of numeric parameters of a G-code"""
+        parameters = {}
+        for word in words:
+            try:
+                parameters[word[0].upper()] = float(word[1:])
+            except (ValueError, IndexError):
+                continue
+        return parameters
+
+    def _move(self, words, end_offset):
+        """Tracks the move target, the time gets computed per chunk"""
+        parameters = self._parameters(words)
+        if "F" in parameters and parameters["F"] > 0:
+            self.feedrate = parameters["F"]
+        for axis in AXES:
+            if axis not in parameters:
+                continue
+            relative = self.relative_e if axis == "E" else self.relative
+            if relative:
+                self.position[axis] += parameters[axis]
+            else:
+                self.position[axis] = parameters[axis]
+        self._targets.append([self.position[axis] for axis in AXES])
+        self._feedrates.append(self.feedrate)
+        self._offsets.append(end_offset)
+        if len(self._targets) >= MOTION_CHUNK_SIZE:
+            self._process_chunk()
+
+    def _dwell(self, words, end_offset):
+        """G4 waits for P milliseconds or S seconds"""
+        parameters = self._parameters(words)
+        seconds = parameters.get("S", 0.0) + parameters.get("P", 0.0) / 1000
+        self._dwells.append(seconds)
+        self._dwell_offsets.append(end_offset)
+
+    def _set_position(self, words):
+        """G92 moves the coordinate system, not the head"""
+        self._process_chunk()
+        parameters = self._parameters(words)
+        if not parameters:
+            parameters = dict.fromkeys(AXES, 0.0)
+        for axis in AXES:
+            if axis in parameters:
+                self.position[axis] = parameters[axis]
+        self._chunk_start = np.array([self.position[axis] for axis in AXES])
+
+    def _home(self, words):
+        """G28 puts the homed axes to zero"""
+        self._process_chunk()
+        homed = {word[0].upper() for word in words if word} & set("XYZ")
+        for axis in homed or "XYZ":
+            self.position[axis] = 0.0
+        self._chunk_start = np.array([self.position[axis] for axis in AXES])
+
+    def _process_chunk(self):
+        """Computes the durations of the pending moves with numpy"""
+        dwell_times = np.array(self._dwells, dtype=np.float64)
+        dwell_offsets = np.array(self._dwell_offsets, dtype=np.int64)
+        self._dwells.clear()
+        self._dwell_offsets.clear()
+
+        if self._targets:
+            targets = np.array(self._targets, dtype=np.float64)
+            starts = np.vstack((self._chunk_start, targets[:-1]))
+            self._chunk_start = targets[-1].copy()
+            deltas = np.abs(targets - starts)
+
+            xyz_distance = np.sqrt(np.sum(deltas[:, :3]**2, axis=1))
+            # Extruder only moves are measured by the extruded length
+            distance = np.where(xyz_distance > 0, xyz_distance,
+                                deltas[:, 3])
+            speed = np.array(self._feedrates, dtype=np.float64) / 60
+
+            # Slow down the whole move, if any axis would go too fast
+            safe_distance = np.where(distance > 0, distance, 1.0)
+            axis_speeds = deltas * (speed / safe_distance)[:, np.newaxis]
+            scale = np.max(axis_speeds / self.max_speeds, axis=1)
+            speed = speed / np.maximum(scale, 1.0)
+
+            # Trapezoidal profile, triangular if it can't reach the speed
+            accel = self.acceleration
+            durations = np.where(distance >= speed**2 / accel,
+                                 distance / speed + speed / accel,
+                                 2 * np.sqrt(distance / accel))
+            offsets = np.array(self._offsets, dtype=np.int64)
+            self._targets.clear()
+            self._feedrates.clear()
+            self._offsets.clear()
+        else:
+            durations = np.empty(0, dtype=np.float64)
+            offsets = np.empty(0, dtype=np.int64)
+
+        if not durations.size and not dwell_times.size:
+            return
+
+        offsets = np.concatenate((offsets, dwell_offsets))
+        durations = np.concatenate((durations, dwell_times))
+        order = np.argsort(offsets, kind="stable")
+        offsets = offsets[order]
+        cumulative = np.cumsum(durations[order]) + self._elapsed
+        self._elapsed = float(cumulative[-1])
+
+        # Keep only one entry per table resolution, plus the last one
+        buckets = offsets // MOTION_TABLE_RESOLUTION
+        keep = np.append(buckets[1:] != buckets[:-1], True)
+        keep &= offsets - self._last_sampled >= MOTION_TABLE_RESOLUTION
+        keep[-1] = True
+        self._last_sampled = int(offsets[keep][-1])
+        self._table_offsets.append(offsets[keep])
+        self._table_times.append(cumulative[keep])
+
+    def finish(self) -> None:
+        """Processes the last chunk and assembles the lookup table"""
+        self._process_chunk()
+        if self._table_offsets:
+            self.offsets = np.concatenate(self._table_offsets)
+            self.times = np.concatenate(self._table_times)
+        else:
+            self.offsets = np.zeros(1, dtype=np.int64)
+            self.times = np.zeros(1, dtype=np.float64)
+        self._table_offsets.clear()
+        self._table_times.clear()
+        log.debug("Motion model predicts %ss in %s table entries",
+                  round(self._elapsed), len(self.offsets))
+
+    def time_at(self, byte_position: int) -> float:
+        """Predicted time spent printing up to the given byte offset"""
+        if self.offsets is None or self.times is None:
+            raise RuntimeError("The motion model is not finished")
+        return float(np.interp(byte_position, self.offsets, self.times,
+                               left=0.0))
@@ -1,10 +1,14 @@
 """Contains implementation of the PrintStats class"""
 import logging
 from time import time
+from typing import Optional, Type
 
-from ..const import TAIL_COMMANDS
+from ..const import (MOTION_CORRECTION_AFTER, MOTION_CORRECTION_MAX,
+                     MOTION_CORRECTION_MIN, TAIL_COMMANDS, LimitsFDM,
+                     LimitsMK3S)
 from ..util import get_gcode
 from .model import Model
+from .motion_model import MotionModel
 from .structures.module_data_classes import PrintStatsData
 
 log = logging.getLogger(__name__)
@@ -27,24 +31,41 @@ class PrintStats:
         )
         self.data = self.model.print_stats
 
+        self.limits: Type[LimitsFDM] = LimitsMK3S
+        self.motion_model: Optional[MotionModel] = None
+        # The print time and predicted time at which the measured progress
+        # starts to count, so the heat up does not skew the correction
+        self.correction_base: Optional[tuple] = None
+
     def track_new_print(self, file_path):
         """
         Analyzes the file, to determine whether it contains progress and time
-        reporting
+        reporting. If not, builds the motion model in the same pass
         :param file_path: path of the file to analyze
         """
         self.data.total_gcode_count = 0
         self.data.print_time = 0
         self.data.has_inbuilt_stats = False
-
-        with open(file_path, encoding='utf-8') as gcode_file:
-            for line in gcode_file:
-                gcode = get_gcode(line)
+        self.correction_base = None
+        motion_model = MotionModel(self.limits)
+
+        with open(file_path, "rb") as gcode_file:
+            offset = 0
+            for raw_line in gcode_file:
+                offset += len(raw_line)
+                gcode = get_gcode(raw_line.decode("utf-8"))
                 if gcode:
                     self.data.total_gcode_count += 1
                 if "M73" in gcode:
                     self.data.has_inbuilt_stats = True
                     break
+                motion_model.feed(gcode, offset)
+
+        if self.data.has_inbuilt_stats:
+            self.motion_model = None
+        else:
+            motion_model.finish()
+            self.motion_model = motion_model
 
         log.info(
             "New file analyzed. It %s inbuilt percent and time reporting.",
@@ -65,18 +86,23 @@ class PrintStats:
         """
         self.data.segment_start = time()
 
-    def get_stats(self, gcode_number):
+    def get_stats(self, gcode_number, byte_position=None):
         """
         Based on which gcode are we now processing and how long is the print
         running, estimates the progress and time left
 
         :param gcode_number: the gcode number being printed
+        :param byte_position: the file position, if known, the motion model
+        gets used instead of the gcode count
         :return tuple containing the percentage and the estimated minutes
         remaining
         """
         self.end_time_segment()
         self.start_time_segment()
 
+        if self.motion_model is not None and byte_position is not None:
+            return self._get_modeled_stats(gcode_number, byte_position)
+
         time_per_command = self.data.print_time / gcode_number
         total_time = time_per_command * self.data.total_gcode_count
         sec_remaining = total_time - self.data.print_time
@@ -92,6 +118,39 @@ class PrintStats:
             return 100, min_remaining
         return percent_done, min_remaining
 
+    def _get_modeled_stats(self, gcode_number, byte_position):
+        """
+        Looks up the predicted time for the byte position and corrects
+        the remaining time by how fast the print actually progresses
+        compared to the prediction
+        """
+        assert self.motion_model is not None
+        total = self.motion_model.total_time
+        predicted = self.motion_model.time_at(byte_position)
+        print_time = self.data.print_time
+
+        correction = 1.0
+        if self.correction_base is None:
+            if predicted > 0:
+                self.correction_base = (print_time, predicted)
+        else:
+            base_time, base_predicted = self.correction_base
+            predicted_since = predicted - base_predicted
+            if predicted_since > MOTION_CORRECTION_AFTER:
+                correction = (print_time - base_time) / predicted_since
+                correction = min(MOTION_CORRECTION_MAX,
+                                 max(MOTION_CORRECTION_MIN, correction))
+
+        sec_remaining = (total - predicted) * correction
+        min_remaining = round(sec_remaining / 60)
+        percent_done = round(predicted / total * 100) if total else 0
+        log.debug("Modeled print stats: %s%% done, %s min, correction: %s",
+                  percent_done, min_remaining, correction)
+
+        if gcode_number == self.data.total_gcode_count - TAIL_COMMANDS:
+            return 100, min_remaining
+        return percent_done, min_remaining
+
     def get_time_printing(self):
         """Returns for how long was the print running"""
         return self.data.print_time + (time() - self.data.segment_start)
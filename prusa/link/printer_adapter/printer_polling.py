@@ -5,7 +5,6 @@ Hope I can get most of printer polling to use this mechanism.
 import itertools
 import logging
 import re
-import struct
 from datetime import timedelta
 from typing import List
 
@@ -17,12 +16,14 @@ from ..conditions import FW, ID, JOB_ID, SN
 from ..config import Settings
 from ..const import (FAST_POLL_INTERVAL, MINIMAL_FIRMWARE,
                      PRINT_MODE_ID_PAIRING, PRINT_STATE_PAIRING, PRINTER_TYPES,
-                     QUIT_INTERVAL, SLOW_POLL_INTERVAL,
+                     QUIT_INTERVAL, SERIAL_POLL_DEADLINE, SLOW_POLL_INTERVAL,
                      VERY_SLOW_POLL_INTERVAL, MK25_PRINTERS)
 from ..serial.helpers import enqueue_matchable, wait_for_instruction
+from ..serial.instruction import Priority
 from ..serial.serial_parser import ThreadedSerialParser
 from ..serial.serial_queue import SerialQueue
-from ..util import get_d3_code, make_fingerprint
+from ..util import make_fingerprint
+from .eeprom_mirror import EEPROMMirror
 from .filesystem.sd_card import SDCard
 from .job import Job
 from .model import Model
@@ -31,16 +32,18 @@ from .structures.item_updater import (ItemUpdater, SideEffectOnly,
 from .structures.model_classes import (EEPROMParams, NetworkInfo, PrintMode,
                                        Telemetry)
 from .structures.module_data_classes import Sheet
-from .structures.regular_expressions import (D3_OUTPUT_REGEX, FW_REGEX,
-                                             M27_OUTPUT_REGEX, MBL_REGEX,
-                                             NOZZLE_REGEX, PERCENT_REGEX,
-                                             PRINT_INFO_REGEX,
+from .structures.regular_expressions import (FW_REGEX, M27_OUTPUT_REGEX,
+                                             MBL_REGEX, NOZZLE_REGEX,
+                                             PERCENT_REGEX, PRINT_INFO_REGEX,
                                              PRINTER_TYPE_REGEX, SN_REGEX,
                                              VALID_SN_REGEX)
 from .telemetry_passer import TelemetryPasser
 
 log = logging.getLogger(__name__)
 
+# One sheet in the EEPROM: name, z offset, bed and PINDA temperature
+SHEET_FORMAT = "7sHBB"
+
 # pylint: disable=too-many-lines
 
 
@@ -66,7 +69,8 @@ class PrinterPolling:
                  serial_parser: ThreadedSerialParser,
                  printer: Printer, model: Model,
                  telemetry_passer: TelemetryPasser,
-                 job: Job, sd_card: SDCard, settings: Settings) -> None:
+                 job: Job, sd_card: SDCard, settings: Settings,
+                 eeprom: EEPROMMirror) -> None:
         super().__init__()
         self.item_updater = ItemUpdater()
         self.serial_queue = serial_queue
@@ -77,6 +81,7 @@ class PrinterPolling:
         self.job = job
         self.sd_card = sd_card
         self.settings = settings
+        self.eeprom = eeprom
 
         # Printer info (for init and SEND_INFO)
         self.network_info = WatchedItem("network_info",
@@ -413,24 +418,34 @@ class PrinterPolling:
         """Gather helper returning if the component is still running"""
         return self.item_updater.running
 
-    def do_matchable(self, gcode, regex, to_front=False):
-        """Analog to the command one, as the getters do this
-        over and over again"""
+    def _enqueue_poll(self, gcode, regex, drop_if_stale):
+        """
+        Polls wait for a gap in the print. The periodic ones get dropped,
+        when they wait too long, as the next poll is coming anyway
+        """
         instruction = enqueue_matchable(self.serial_queue,
                                         gcode,
                                         regex,
-                                        to_front=to_front)
+                                        priority=Priority.POLLING,
+                                        deadline=SERIAL_POLL_DEADLINE,
+                                        drop_if_stale=drop_if_stale)
         wait_for_instruction(instruction, self.should_wait)
+        if instruction.dropped:
+            raise RuntimeError(f"{gcode} did not get sent in time")
+        return instruction
+
+    def do_matchable(self, gcode, regex, drop_if_stale=False):
+        """Analog to the command one, as the getters do this
+        over and over again"""
+        instruction = self._enqueue_poll(gcode, regex, drop_if_stale)
         match = instruction.match()
         if match is None:
             raise RuntimeError("Printer responded with something unexpected")
         return match
 
-    def do_multimatch(self, gcode, regex, to_front=False):
+    def do_multimatch(self, gcode, regex, drop_if_stale=False):
         """Send an instruction with multiple lines as output"""
-        instruction = enqueue_matchable(
-            self.serial_queue, gcode, regex, to_front=to_front)
-        wait_for_instruction(instruction, self.should_wait)
+        instruction = self._enqueue_poll(gcode, regex, drop_if_stale)
         matches = instruction.get_matches()
         if not matches:
             raise RuntimeError(f"There are no matches for {gcode}. "
@@ -470,18 +485,17 @@ class PrinterPolling:
     def _get_printer_type(self):
         """Gets the printer code using the M862.2 Q gcode."""
         match = self.do_matchable("M862.2 Q",
-                                  PRINTER_TYPE_REGEX,
-                                  to_front=True)
+                                  PRINTER_TYPE_REGEX)
         return int(match.group("code"))
 
     def _get_firmware_version(self):
         """Try to get firmware version from the printer."""
-        match = self.do_matchable("PRUSA Fir", FW_REGEX, to_front=True)
+        match = self.do_matchable("PRUSA Fir", FW_REGEX)
         return match.group("version")
 
     def _get_nozzle_diameter(self):
         """Gets the printers nozzle diameter using M862.1 Q"""
-        match = self.do_matchable("M862.1 Q", NOZZLE_REGEX, to_front=True)
+        match = self.do_matchable("M862.1 Q", NOZZLE_REGEX)
         return float(match.group("size"))
 
     def _get_serial_number(self):
@@ -493,26 +507,19 @@ class PrinterPolling:
         # Do not ask MK2.5 for its SN, it would break serial communications
         if self.printer.type in MK25_PRINTERS | {None}:
             return ""
-        match = self.do_matchable("PRUSA SN", SN_REGEX, to_front=True)
+        match = self.do_matchable("PRUSA SN", SN_REGEX)
         return match.group("sn")
 
     def _get_sheet_settings(self) -> List[Sheet]:
         """Gets all the sheet settings from the EEPROM"""
         # TODO: How do we deal with default settings?
-        matches = self.do_multimatch(
-            get_d3_code(*EEPROMParams.SHEET_SETTINGS.value),
-            D3_OUTPUT_REGEX, to_front=True)
+        values = self.eeprom.read(EEPROMParams.SHEET_SETTINGS,
+                                  "<" + SHEET_FORMAT * 8, self.should_wait)
 
         sheets: List[Sheet] = []
-        str_data = ""
-        for match in matches:
-            str_data += match.group("data").replace(" ", "")
-
-        data = bytes.fromhex(str_data)
-        for i in range(0, 8*11, 11):
-            sheet_data = data[i:i+11]
+        for i in range(0, len(values), 4):
+            name, z_offset_u16, bed_temp, pinda_temp = values[i:i+4]
 
-            z_offset_u16 = struct.unpack("H", sheet_data[7:9])[0]
             max_uint16 = 2**16-1
             if z_offset_u16 in {0, max_uint16}:
                 z_offset_workaround = max_uint16
@@ -521,35 +528,27 @@ class PrinterPolling:
             z_offset = (z_offset_workaround-max_uint16)/400
 
             sheets.append(Sheet(
-                name=sheet_data[:7].decode("ascii"),
+                name=name.decode("ascii"),
                 z_offset=z_offset,
-                bed_temp=struct.unpack("B", sheet_data[9:10])[0],
-                pinda_temp=struct.unpack("B", sheet_data[10:11])[0],
+                bed_temp=bed_temp,
+                pinda_temp=pinda_temp,
             ))
 
         return sheets
 
     def get_active_sheet(self):
         """Gets the active sheet from the EEPROM"""
-        matches = self.do_matchable(
-            get_d3_code(*EEPROMParams.ACTIVE_SHEET.value),
-            D3_OUTPUT_REGEX, to_front=True)
-
-        str_data = matches.group("data").replace(" ", "")
-        data = bytes.fromhex(str_data)
-        active_sheet = struct.unpack("B", data)[0]
-        return active_sheet
+        return self.eeprom.read(EEPROMParams.ACTIVE_SHEET, "B",
+                                self.should_wait)[0]
 
     def _get_job_id(self):
         """Gets the current job_id from the printer"""
-        match = self.do_matchable(
-            get_d3_code(*EEPROMParams.JOB_ID.value),
-            D3_OUTPUT_REGEX, to_front=True)
-        return int(match.group("data").replace(" ", ""), base=16)
+        return self.eeprom.read(EEPROMParams.JOB_ID, ">I",
+                                self.should_wait)[0]
 
     def _get_mbl(self):
         """Gets the current MBL data"""
-        matches = self.do_multimatch("G81", MBL_REGEX, to_front=True)
+        matches = self.do_multimatch("G81", MBL_REGEX)
         groups = matches[0].groupdict()
 
         data = {}
@@ -569,30 +568,30 @@ class PrinterPolling:
 
     def _get_flash_air(self):
         """Determines if the Flash Air functionality is on"""
-        match = self.do_matchable(
-            get_d3_code(*EEPROMParams.FLASH_AIR.value), D3_OUTPUT_REGEX)
-        return match.group("data") == "01"
+        return self.eeprom.read(EEPROMParams.FLASH_AIR, "B",
+                                self.should_wait)[0] == 1
 
     def _get_print_mode(self):
         """Gets the print mode from the printer"""
-        match = self.do_matchable(
-            get_d3_code(*EEPROMParams.PRINT_MODE.value),
-            D3_OUTPUT_REGEX, to_front=True)
-        index = int(match.group("data").replace(" ", ""), base=16)
+        index = self.eeprom.read(EEPROMParams.PRINT_MODE, "B",
+                                 self.should_wait)[0]
         return PRINT_MODE_ID_PAIRING[index]
 
     def _get_speed_multiplier(self):
-        match = self.do_matchable("M220", PERCENT_REGEX)
+        match = self.do_matchable("M220", PERCENT_REGEX,
+                                  drop_if_stale=True)
         return int(match.group("percent"))
 
     def _get_flow_multiplier(self):
-        match = self.do_matchable("M221", PERCENT_REGEX)
+        match = self.do_matchable("M221", PERCENT_REGEX,
+                                  drop_if_stale=True)
         return int(match.group("percent"))
 
     def _get_print_info(self):
         """Polls the print info, but instead of returning it, it uses
         another method, that will eventually set it"""
-        matches = self.do_multimatch("M73", PRINT_INFO_REGEX)
+        matches = self.do_multimatch("M73", PRINT_INFO_REGEX,
+                                     drop_if_stale=True)
         self.print_info_handler(self, matches)
 
         raise SideEffectOnly()
@@ -601,7 +600,7 @@ class PrinterPolling:
         """Polls M27, sets all values got from it manually,
         and returns its own"""
         matches = self.do_multimatch("M27 P", M27_OUTPUT_REGEX,
-                                     to_front=True)
+                                     drop_if_stale=True)
 
         if len(matches) >= 3:
             third_match = matches[2]
@@ -751,26 +750,16 @@ class PrinterPolling:
                   value, adjusted_value)
         return adjusted_value
 
-    def _eeprom_little_endian_uint32(self, dcode):
-        """Reads and decodes the D-Code specified little-endian uint32_t
-        eeprom variable"""
-        match = self.do_matchable(dcode,
-                                  D3_OUTPUT_REGEX,
-                                  to_front=True)
-        str_data = match.group("data").replace(" ", "")
-        data = bytes.fromhex(str_data)
-        return struct.unpack("<I", data)[0]
-
     def _get_total_filament(self):
         """Gets the total filament used from the eeprom"""
-        total_filament = self._eeprom_little_endian_uint32(
-            get_d3_code(*EEPROMParams.TOTAL_FILAMENT.value))
+        total_filament = self.eeprom.read(EEPROMParams.TOTAL_FILAMENT, "<I",
+                                          self.should_wait)[0]
         return total_filament * 1000
 
     def _get_total_print_time(self):
         """Gets the total print time from the eeprom"""
-        total_minutes = self._eeprom_little_endian_uint32(
-            get_d3_code(*EEPROMParams.TOTAL_PRINT_TIME.value))
+        total_minutes = self.eeprom.read(EEPROMParams.TOTAL_PRINT_TIME, "<I",
+                                         self.should_wait)[0]
         return total_minutes * 60
 
     # -- Validate --
@@ -3,55 +3,41 @@ import logging
 import os
 import re
 from enum import Enum
+from functools import partial
 from threading import Event
 from threading import enumerate as enumerate_threads
-from typing import Any, Dict, Optional, List, Type
+from typing import Any, Dict, Optional, List
 
 from prusa.connect.printer import Command as SDKCommand
 from prusa.connect.printer import DownloadMgr
-from prusa.connect.printer.camera_driver import CameraDriver
 from prusa.connect.printer.conditions import API, CondState
 from prusa.connect.printer.const import Command as CommandType
 from prusa.connect.printer.const import Event as EventType
-from prusa.connect.printer.camera_configurator import CameraConfigurator
 from prusa.connect.printer.const import Source, State
 from prusa.connect.printer.files import File
 from prusa.connect.printer.models import Sheet as SDKSheet
-from ..camera_governor import CameraGovernor
-from ..cameras.v4l2_driver import V4L2Driver
-from ..cameras.picamera_driver import PiCameraDriver
 from ..conditions import HW, ROOT_COND, UPGRADED, use_connect_errors
 from ..config import Config, Settings
 from ..const import (BASE_STATES, MK25_PRINTERS, PATH_WAIT_TIMEOUT,
-                     PRINTER_CONF_TYPES, PRINTER_TYPES, PRINTING_STATES,
-                     SD_STORAGE_NAME)
+                     PRINTER_CONF_TYPES, PRINTER_LIMITS, PRINTER_TYPES,
+                     PRINTING_STATES, SD_STORAGE_NAME)
 from ..interesting_logger import InterestingLogRotator
-from ..sdk_augmentation.printer import MyPrinter
 from ..serial.helpers import enqueue_instruction, enqueue_matchable
 from ..serial.serial import SerialException
-from ..serial.serial_adapter import SerialAdapter
-from ..serial.serial_parser import ThreadedSerialParser
-from ..serial.serial_queue import MonitoredSerialQueue
-from ..service_discovery import ServiceDiscovery
 from ..util import get_print_stats_gcode, make_fingerprint, is_potato_cpu
-from .auto_telemetry import AutoTelemetry
 from .command_handlers import (CancelReady, ExecuteGcode, JobInfo,
                                LoadFilament, PausePrint, ResetPrinter,
                                ResumePrint, SetReady, StartPrint, StopPrint,
                                UnloadFilament)
-from .command_queue import CommandQueue, CommandResult
-from .file_printer import FilePrinter
+from .command_queue import CommandResult
 from .filesystem.sd_card import SDState
-from .filesystem.storage_controller import StorageController
-from .ip_updater import IPUpdater
-from .job import Job, JobState
-from .lcd_printer import LCDPrinter
+from .job import JobState
+from .lcd_printer import (CHECK_ERRORS, CHECK_IDLE, CHECK_PRINTING,
+                          CHECK_READY, CHECK_UPLOAD, NETWORK_CHECKS)
 from .model import Model
-from .print_stat_doubler import PrintStatDoubler
-from .print_stats import PrintStats
-from .printer_polling import PrinterPolling
-from .special_commands import SpecialCommands
-from .state_manager import StateChange, StateManager
+from .startup import Startup
+from .startup_phases import StartupPhases
+from .state_manager import StateChange
 from .structures.item_updater import WatchedItem
 from .structures.model_classes import PrintState, Telemetry
 from .structures.module_data_classes import Sheet
@@ -60,7 +46,6 @@ from .structures.regular_expressions import (MBL_TRIGGER_REGEX,
                                              PRINTER_BOOT_REGEX,
                                              RESUME_PRINT_REGEX,
                                              TM_ERROR_LOG_REGEX)
-from .telemetry_passer import TelemetryPasser
 from .updatable import Thread
 from ..util import prctl_name
 
@@ -75,7 +60,7 @@ class TransferCallbackState(Enum):
     PRINTER_IN_ATTENTION = 3
 
 
-class PrusaLink:
+class PrusaLink(StartupPhases):
     """
     This class is the controller for PrusaLink, more specifically the part
     that communicates with the printer.
@@ -96,38 +81,36 @@ class PrusaLink:
         HW.state = CondState.OK
         self.model = Model()
 
-        # These start by themselves
-        self.service_discovery = ServiceDiscovery(self.cfg)
+        # Independent parts start in parallel, the timings are reported
+        # at /api/v1/debug/startup
+        self.startup = Startup()
+        self.startup.add("service_discovery", self._init_service_discovery,
+                         undo=self._stop_service_discovery)
+        self.startup.add("serial", self._init_serial,
+                         undo=self._stop_serial)
+        self.startup.add("printer", self._init_printer)
+        self.startup.add("cameras", self._init_cameras,
+                         depends_on=("printer", ),
+                         undo=self._stop_cameras)
+        self.startup.add("components", self._init_components,
+                         depends_on=("serial", "printer"))
+        self.startup.add("start", self._start_components,
+                         depends_on=("service_discovery", "cameras",
+                                     "components"))
+        self.startup.run()
 
-        self.serial_parser = ThreadedSerialParser()
-
-        self.serial = SerialAdapter(self.serial_parser,
-                                    self.model,
-                                    configured_port=cfg.printer.port,
-                                    baudrate=cfg.printer.baudrate)
-
-        self.serial_queue = MonitoredSerialQueue(self.serial,
-                                                 self.serial_parser, self.cfg)
-        # -----
-
-        self.printer = MyPrinter()
-
-        drivers: List[Type[CameraDriver]] = [V4L2Driver]
-        if PiCameraDriver.supported:
-            drivers.append(PiCameraDriver)
+        log.debug("Initialization done")
 
-        self.camera_configurator = CameraConfigurator(
-            config=self.settings,
-            config_file_path=self.cfg.printer.settings,
-            camera_controller=self.printer.camera_controller,
-            drivers=drivers,
-            auto_detect=self.cfg.cameras.auto_detect
-        )
-        self.camera_governor = CameraGovernor(self.camera_configurator,
-                                              self.printer.camera_controller)
+        debug = False
+        if debug:
+            Thread(target=self.debug_shell, name="debug_shell",
+                   daemon=True).start()
 
+    def _init_components(self) -> None:
+        """Creates the components and binds their signals"""
+        # pylint: disable=too-many-statements
         self.printer.register_handler = self.printer_registered
-        self.printer.connection_from_settings(settings)
+        self.printer.connection_from_settings(self.settings)
 
         # Set download callbacks
         self.printer.printed_file_cb = self.printed_file_cb
@@ -155,49 +138,23 @@ class PrusaLink:
         self.serial_parser.add_decoupled_handler(
             RESUME_PRINT_REGEX, lambda sender, match: self.fw_resume_print())
 
-        # Init components first, so they all exist for signal binding stuff
-        self.lcd_printer = LCDPrinter(self.serial_queue, self.serial_parser,
-                                      self.model, self.settings, self.printer)
-        self.job = Job(self.serial_parser, self.serial_queue, self.model,
-                       self.printer)
-        self.state_manager = StateManager(self.serial_parser, self.model,
-                                          self.printer, self.cfg,
-                                          self.settings)
-        self.print_stats = PrintStats(self.model)
-        self.file_printer = FilePrinter(self.serial_queue, self.serial_parser,
-                                        self.model, self.cfg, self.print_stats)
-        self.storage_controller = StorageController(cfg, self.serial_queue,
-                                                    self.serial_parser,
-                                                    self.state_manager,
-                                                    self.model)
-        self.ip_updater = IPUpdater(self.model, self.serial_queue)
-        self.telemetry_passer = TelemetryPasser(self.model, self.printer)
-        self.printer_polling = PrinterPolling(self.serial_queue,
-                                              self.serial_parser, self.printer,
-                                              self.model,
-                                              self.telemetry_passer, self.job,
-                                              self.storage_controller.sd_card,
-                                              self.settings)
-        self.command_queue = CommandQueue()
-        self.special_commands = SpecialCommands(self.serial_parser,
-                                                self.command_queue,
-                                                self.lcd_printer)
+        self._create_components()
 
         # Set Transfer callbacks
-        self.printer.transfer.started_cb = self.lcd_printer.notify
-        self.printer.transfer.progress_cb = self.lcd_printer.notify
-        self.printer.transfer.stopped_cb = self.lcd_printer.notify
+        notify_upload = partial(self.lcd_printer.notify, CHECK_UPLOAD)
+        self.printer.transfer.started_cb = notify_upload
+        self.printer.transfer.progress_cb = notify_upload
+        self.printer.transfer.stopped_cb = notify_upload
         for state in ROOT_COND:
-            state.add_broke_handler(lambda *_: self.lcd_printer.notify())
-            state.add_fixed_handler(lambda *_: self.lcd_printer.notify())
+            state.add_broke_handler(
+                lambda *_: self.lcd_printer.notify(*NETWORK_CHECKS))
+            state.add_fixed_handler(
+                lambda *_: self.lcd_printer.notify(*NETWORK_CHECKS))
 
         self.serial_parser.add_decoupled_handler(
             MBL_TRIGGER_REGEX,
             lambda sender, match: self.printer_polling.invalidate_mbl())
 
-        self.print_stat_doubler = PrintStatDoubler(self.serial_parser,
-                                                   self.printer_polling)
-
         # Bind signals
         self.serial_queue.serial_queue_failed.connect(self.serial_queue_failed)
 
@@ -267,8 +224,14 @@ class PrusaLink:
             self.sheet_settings_changed)
         self.printer_polling.active_sheet.value_changed_signal.connect(
             self.active_sheet_changed)
+        self.printer_polling.firmware_version.value_changed_signal.connect(
+            self.file_printer.firmware_changed)
         self.printer_polling.speed_multiplier.value_changed_signal.connect(
-            lambda val: self.lcd_printer.notify(), weak=False)
+            lambda val: self.lcd_printer.notify(CHECK_IDLE), weak=False)
+        self.printer_polling.time_remaining.value_changed_signal.connect(
+            self.eta_estimator.remaining_updated)
+        self.printer_polling.progress_from_bytes.value_changed_signal.connect(
+            self.eta_estimator.progress_updated)
 
         API.add_fixed_handler(self.connection_renewed)
 
@@ -276,31 +239,6 @@ class PrusaLink:
         self.ip_updater.update()
         self.ip_updater.updated_signal.connect(self.ip_updated)
 
-        self.camera_governor.start()
-
-        # Leave the non-polled telemetry split from the rest
-        self.auto_telemetry = AutoTelemetry(self.serial_parser,
-                                            self.serial_queue, self.model,
-                                            self.telemetry_passer)
-        self.auto_telemetry.start()
-
-        self.printer_polling.start()
-        self.storage_controller.start()
-        self.ip_updater.start()
-        self.lcd_printer.start()
-        self.command_queue.start()
-        self.telemetry_passer.start()
-        self.printer.start()
-        # Start this last, as it might start printing right away
-        self.file_printer.start()
-
-        log.debug("Initialization done")
-
-        debug = False
-        if debug:
-            Thread(target=self.debug_shell, name="debug_shell",
-                   daemon=True).start()
-
     # pylint: disable=too-many-branches
     def debug_shell(self) -> None:
         """
@@ -358,6 +296,8 @@ class PrusaLink:
         self.printer.indicate_stop()
         self.printer_polling.stop()
         self.storage_controller.stop()
+        self.job_history.stop()
+        self.sampling_profiler.stop()
         self.lcd_printer.stop(fast)
         # This is for pylint to stop complaining, I'd like stop(fast) more
         if fast:
@@ -386,6 +326,8 @@ class PrusaLink:
             self.printer.wait_stopped()
             self.printer_polling.wait_stopped()
             self.storage_controller.wait_stopped()
+            self.job_history.wait_stopped()
+            self.sampling_profiler.wait_stopped()
             self.lcd_printer.wait_stopped()
             self.ip_updater.wait_stopped()
             self.camera_governor.wait_stopped()
@@ -570,6 +512,7 @@ class PrusaLink:
 
     def job_info_updated(self, _) -> None:
         """On job info update, sends the updated job info to the Connect"""
+        self.lcd_printer.notify(CHECK_PRINTING)
         # pylint: disable=unsupported-assignment-operation,not-a-mapping
         try:
             job_info: Dict[str, Any] = self.command_queue.do_command(JobInfo())
@@ -583,14 +526,18 @@ class PrusaLink:
         """Passes the job_id into the SDK"""
         self.printer.job_id = job_id
         self.printer_polling.ensure_job_id()
+        if job_id is None:
+            self.job_history.job_ended()
 
     def printer_type_changed(self, item: WatchedItem) -> None:
         """Watches for printer type mismatches"""
+        detected_type = PRINTER_TYPES[item.value]
+        self.print_stats.limits = PRINTER_LIMITS[detected_type]
+
         if not self.settings.printer.type:
             return
 
         settings_type = PRINTER_CONF_TYPES[self.settings.printer.type]
-        detected_type = PRINTER_TYPES[item.value]
         if not settings_type or settings_type == detected_type:
             UPGRADED.state = CondState.OK
             return
@@ -729,6 +676,7 @@ class PrusaLink:
     def ip_updated(self, _) -> None:
         """On every ip change from ip updater sends a new info"""
         self.printer_polling.invalidate_network_info()
+        self.lcd_printer.notify(*NETWORK_CHECKS)
 
     def folder_attach(self, _, path: str) -> None:
         """Connects a folder being attached to PrusaConnect events"""
@@ -766,6 +714,8 @@ class PrusaLink:
         # file printer stop print needs to happen before this
         self.state_manager.reset()
         self.lcd_printer.reset_error_grace()
+        self.lcd_printer.printer_reconnected()
+        self.eeprom.invalidate()
         self.printer_polling.invalidate_printer_info()
         # Don't wait for the instruction confirmation, we'd be blocking the
         # thread supposed to provide it
@@ -813,7 +763,15 @@ class PrusaLink:
             self.file_printer.stop_print()
 
         self.telemetry_passer.state_changed()
+        self.job_history.state_changed(from_state, to_state)
+        self.lcd_printer.notify(CHECK_PRINTING, CHECK_ERRORS, CHECK_UPLOAD,
+                                CHECK_READY)
+        if from_state not in PRINTING_STATES and to_state == State.PRINTING:
+            self.eta_estimator.new_print()
+        elif to_state == State.PAUSED:
+            self.eta_estimator.reanchor()
         if from_state in PRINTING_STATES and to_state in BASE_STATES:
+            self.eta_estimator.print_ended()
             self._reset_print_stats()
 
         # Was printing. Statistics probably changed, let's poll those now
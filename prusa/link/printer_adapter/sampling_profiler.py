@@ -0,0 +1,164 @@
+"""
+Contains implementation of the SamplingProfiler class
+
+Periodically looks at where every thread is, instead of tracing every call
+like cProfile does, so it is cheap enough even for the slowest of Pis
+"""
+import logging
+import os
+import sys
+import threading
+from threading import Lock
+from time import monotonic
+from typing import Any, Dict, List, Optional
+
+from ..config import Config
+from ..const import (PROFILER_CPU_INTERVAL, PROFILER_MAX_DEPTH,
+                     PROFILER_MAX_STACKS)
+from .updatable import ThreadedUpdatable
+
+log = logging.getLogger(__name__)
+
+OTHER_STACKS = "[other]"
+TASK_DIR = "/proc/self/task"
+
+
+def read_task_stat(tid: str) -> Optional[tuple]:
+    """
+    Reads the system thread name and the user plus system CPU time
+    in seconds of a thread from /proc
+    """
+    try:
+        with open(os.path.join(TASK_DIR, tid, "stat"),
+                  encoding="utf-8") as stat_file:
+            stat = stat_file.read()
+    except OSError:
+        return None
+    # The name is in parentheses and may contain spaces and parentheses
+    name = stat[stat.index("(") + 1:stat.rindex(")")]
+    fields = stat[stat.rindex(")") + 2:].split()
+    # utime and stime are the 14th and 15th field, counting from one
+    ticks = int(fields[11]) + int(fields[12])
+    return name, ticks / os.sysconf("SC_CLK_TCK")
+
+
+def fold_stack(frame) -> str:
+    """Makes a flame graph compatible string out of a stack"""
+    names: List[str] = []
+    while frame is not None and len(names) < PROFILER_MAX_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} "
+                     f"({os.path.basename(code.co_filename)})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler(ThreadedUpdatable):
+    """
+    Samples the stacks of all threads at a configured frequency and
+    aggregates them by thread into folded stacks for flame graphs.
+    Every few seconds reads the CPU time of each thread from /proc
+    """
+    thread_name = "sampling_profiler"
+
+    def __init__(self, cfg: Config):
+        self.frequency = cfg.profiler.frequency
+        self.update_interval = 1 / self.frequency if self.frequency else 1
+        super().__init__()
+
+        self.lock = Lock()
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self.started_at = monotonic()
+        self.cpu_read_at = 0.0
+        self.cpu_times: Dict[str, float] = {}
+        self.cpu_usage: Dict[str, Dict[str, Any]] = {}
+
+    def start(self):
+        """Starts sampling, unless disabled by the configuration"""
+        if not self.frequency:
+            log.debug("Sampling profiler is disabled")
+            return
+        super().start()
+
+    def wait_stopped(self):
+        """Wait for the sampling to stop, if it ever started"""
+        if self.thread.is_alive():
+            super().wait_stopped()
+
+    def update(self):
+        """Takes one sample of every thread"""
+        own_ident = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        # pylint: disable=protected-access
+        frames = sys._current_frames()
+        with self.lock:
+            for ident, frame in frames.items():
+                if ident == own_ident:
+                    continue
+                name = names.get(ident, str(ident))
+                folded = f"{name};{fold_stack(frame)}"
+                if folded not in self.stacks and \
+                        len(self.stacks) >= PROFILER_MAX_STACKS:
+                    folded = f"{name};{OTHER_STACKS}"
+                self.stacks[folded] = self.stacks.get(folded, 0) + 1
+            self.samples += 1
+
+        if monotonic() - self.cpu_read_at >= PROFILER_CPU_INTERVAL:
+            self.read_cpu_usage()
+
+    def read_cpu_usage(self):
+        """
+        Reads how much CPU time each thread used since the last read,
+        the names are the ones set by prctl_name like pl#sq_sender
+        """
+        now = monotonic()
+        elapsed = now - self.cpu_read_at
+        cpu_times = {}
+        cpu_usage = {}
+        try:
+            tids = os.listdir(TASK_DIR)
+        except OSError:
+            return
+        for tid in tids:
+            task_stat = read_task_stat(tid)
+            if task_stat is None:
+                continue
+            name, cpu_time = task_stat
+            cpu_times[tid] = cpu_time
+            used = cpu_time - self.cpu_times.get(tid, cpu_time)
+            cpu_usage[tid] = {
+                "tid": int(tid),
+                "name": name,
+                "cpu_time": round(cpu_time, 2),
+                "cpu_percent": round(used / elapsed * 100, 1)
+                if self.cpu_read_at else None,
+            }
+        with self.lock:
+            self.cpu_times = cpu_times
+            self.cpu_usage = cpu_usage
+            self.cpu_read_at = now
+
+    def reset(self):
+        """Forgets the collected stacks"""
+        with self.lock:
+            self.stacks = {}
+            self.samples = 0
+            self.started_at = monotonic()
+
+    def get_profile(self) -> Dict[str, Any]:
+        """Returns the aggregated samples and the CPU usage per thread"""
+        with self.lock:
+            return {
+                "frequency": self.frequency,
+                "duration": round(monotonic() - self.started_at, 1),
+                "samples": self.samples,
+                "threads": list(self.cpu_usage.values()),
+                "stacks": dict(self.stacks),
+            }
+
+    def get_folded(self) -> str:
+        """Returns the samples in the folded format of flamegraph.pl"""
+        with self.lock:
+            return "".join(f"{stack} {count}\n"
+                           for stack, count in self.stacks.items())
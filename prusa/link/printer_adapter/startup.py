@@ -0,0 +1,147 @@
+"""
+Contains implementation of the Startup class
+
+Initializes the independent parts of PrusaLink in parallel, so looking
+for the printer port does not hold up the cameras and the other way around
+"""
+import logging
+from threading import Event
+from time import monotonic
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from ..util import prctl_name
+from .updatable import Thread
+
+log = logging.getLogger(__name__)
+
+
+class StartupPhase:
+    """One named step of the startup and its timing"""
+
+    def __init__(self, name: str, function: Callable[[], None],
+                 depends_on: Sequence[str],
+                 undo: Optional[Callable[[], None]] = None) -> None:
+        self.name = name
+        self.function = function
+        self.depends_on = list(depends_on)
+        self.undo = undo
+        self.done_evt = Event()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.waited = 0.0
+        self.error: Optional[BaseException] = None
+
+    def to_dict(self, since: float) -> Dict[str, Any]:
+        """The phase timing in seconds from the startup beginning"""
+        def relative(timestamp: Optional[float]) -> Optional[float]:
+            return None if timestamp is None else round(timestamp - since, 3)
+
+        duration = None
+        if self.started_at is not None and self.finished_at is not None:
+            duration = round(self.finished_at - self.started_at, 3)
+        return {
+            "name": self.name,
+            "depends_on": self.depends_on,
+            "waited": round(self.waited, 3),
+            "started": relative(self.started_at),
+            "finished": relative(self.finished_at),
+            "duration": duration,
+            "error": None if self.error is None else repr(self.error),
+        }
+
+
+class Startup:
+    """
+    Runs the startup phases, each on its own thread, as soon as the phases
+    it depends on are done. A phase whose dependency failed does not run.
+    If any phase fails, the ones that succeeded get undone
+    """
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, StartupPhase] = {}
+        self.started_at = monotonic()
+        self.finished_at: Optional[float] = None
+
+    def add(self, name: str, function: Callable[[], None],
+            depends_on: Sequence[str] = (),
+            undo: Optional[Callable[[], None]] = None) -> None:
+        """
+        Adds a phase, its dependencies have to be added before it.
+        The undo function stops what the phase started
+        """
+        for dependency in depends_on:
+            if dependency not in self.phases:
+                raise ValueError(f"Unknown startup phase {dependency}")
+        self.phases[name] = StartupPhase(name, function, depends_on, undo)
+
+    def _run_phase(self, phase: StartupPhase) -> None:
+        """Waits for the dependencies, then runs the phase"""
+        prctl_name()
+        waiting_since = monotonic()
+        try:
+            for dependency in phase.depends_on:
+                self.phases[dependency].done_evt.wait()
+                if self.phases[dependency].error is not None:
+                    log.debug("Not running startup phase %s, because %s "
+                              "failed", phase.name, dependency)
+                    phase.error = RuntimeError(
+                        f"Startup phase {dependency} failed")
+                    return
+            phase.started_at = monotonic()
+            phase.waited = phase.started_at - waiting_since
+            phase.function()
+        except Exception as exception:  # pylint: disable=broad-except
+            phase.error = exception
+            log.exception("Startup phase %s failed", phase.name)
+        finally:
+            phase.finished_at = monotonic()
+            phase.done_evt.set()
+
+    def run(self) -> None:
+        """
+        Runs all the phases and waits for them. Re-raises the error
+        of the first phase that failed
+        """
+        threads: List[Thread] = []
+        for phase in self.phases.values():
+            thread = Thread(target=self._run_phase,
+                            args=(phase, ),
+                            name=f"startup_{phase.name}",
+                            daemon=True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        self.finished_at = monotonic()
+
+        for phase_name, phase in self.phases.items():
+            log.debug("Startup phase %s took %s", phase_name,
+                      phase.to_dict(self.started_at)["duration"])
+        failed = [phase for phase in self.phases.values()
+                  if phase.error is not None and phase.started_at is not None]
+        if failed:
+            self._undo()
+            first = min(failed, key=lambda phase: phase.finished_at or 0)
+            raise first.error  # type: ignore
+
+    def _undo(self) -> None:
+        """Undoes the phases that succeeded, the last one first"""
+        for phase in reversed(list(self.phases.values())):
+            if phase.error is not None or phase.undo is None:
+                continue
+            log.debug("Undoing startup phase %s", phase.name)
+            try:
+                phase.undo()
+            except Exception:  # pylint: disable=broad-except
+                log.exception("Failed to undo startup phase %s", phase.name)
+
+    def get_report(self) -> Dict[str, Any]:
+        """The timings of all phases"""
+        total = None
+        if self.finished_at is not None:
+            total = round(self.finished_at - self.started_at, 3)
+        return {
+            "total": total,
+            "phases": [phase.to_dict(self.started_at)
+                       for phase in self.phases.values()],
+        }
@@ -0,0 +1,219 @@
+"""
+Contains implementation of the StartupPhases class
+
+The phases PrusaLink starts in. They create its components, the PrusaLink
+class then binds their signals to its handlers
+"""
+import sys
+from typing import List, Type
+
+from prusa.connect.printer.camera_configurator import CameraConfigurator
+from prusa.connect.printer.camera_driver import CameraDriver
+
+from ..camera_governor import CameraGovernor
+from ..config import Config, Settings
+from ..const import (BACKGROUND_THREAD_NICE, GIL_SWITCH_INTERVAL,
+                     SERIAL_THREAD_NICE)
+from ..sdk_augmentation.printer import MyPrinter
+from ..serial.serial_adapter import SerialAdapter
+from ..serial.serial_parser import ThreadedSerialParser
+from ..serial.serial_queue import MonitoredSerialQueue
+from ..service_discovery import ServiceDiscovery
+from ..util import set_thread_nice
+from .auto_telemetry import AutoTelemetry
+from .command_queue import CommandQueue
+from .eeprom_mirror import EEPROMMirror
+from .eta_estimator import EtaEstimator
+from .file_printer import FilePrinter
+from .filesystem.storage_controller import StorageController
+from .ip_updater import IPUpdater
+from .job import Job
+from .job_history import JobHistory
+from .lcd_printer import LCDPrinter
+from .model import Model
+from .print_stat_doubler import PrintStatDoubler
+from .print_stats import PrintStats
+from .printer_polling import PrinterPolling
+from .sampling_profiler import SamplingProfiler
+from .special_commands import SpecialCommands
+from .state_manager import StateManager
+from .telemetry_passer import TelemetryPasser
+
+
+class StartupPhases:
+    """
+    The startup phase methods of PrusaLink, run by its Startup.
+    The components they create are listed here
+    """
+    # The components are created in the startup phases
+    # pylint: disable=attribute-defined-outside-init
+    # pylint: disable=too-few-public-methods
+    cfg: Config
+    settings: Settings
+    model: Model
+
+    service_discovery: ServiceDiscovery
+    serial_parser: ThreadedSerialParser
+    serial: SerialAdapter
+    serial_queue: MonitoredSerialQueue
+    printer: MyPrinter
+    camera_configurator: CameraConfigurator
+    camera_governor: CameraGovernor
+    lcd_printer: LCDPrinter
+    eeprom: EEPROMMirror
+    job: Job
+    state_manager: StateManager
+    job_history: JobHistory
+    sampling_profiler: SamplingProfiler
+    print_stats: PrintStats
+    file_printer: FilePrinter
+    storage_controller: StorageController
+    ip_updater: IPUpdater
+    telemetry_passer: TelemetryPasser
+    printer_polling: PrinterPolling
+    eta_estimator: EtaEstimator
+    command_queue: CommandQueue
+    special_commands: SpecialCommands
+    print_stat_doubler: PrintStatDoubler
+    auto_telemetry: AutoTelemetry
+
+    def _init_service_discovery(self) -> None:
+        """Starts advertising PrusaLink on the local network"""
+        # These start by themselves
+        self.service_discovery = ServiceDiscovery(self.cfg)
+
+    def _stop_service_discovery(self) -> None:
+        """Stops advertising PrusaLink"""
+        self.service_discovery.unregister()
+
+    def _init_serial(self) -> None:
+        """Looks for the printer and sets up the serial communication"""
+        self.serial_parser = ThreadedSerialParser()
+
+        self.serial = SerialAdapter(self.serial_parser,
+                                    self.model,
+                                    configured_port=self.cfg.printer.port,
+                                    baudrate=self.cfg.printer.baudrate)
+
+        self.serial_queue = MonitoredSerialQueue(self.serial,
+                                                 self.serial_parser, self.cfg)
+
+        if self.cfg.printer.prioritize_serial:
+            self._prioritize_serial()
+        if self.cfg.printer.short_gil_switch:
+            # A thread woken up by the printer gets the GIL sooner
+            sys.setswitchinterval(GIL_SWITCH_INTERVAL)
+
+    def _prioritize_serial(self) -> None:
+        """
+        Lets the serial threads run before the rest, so the web traffic
+        and the camera encoding do not delay the printer communication
+        """
+        for thread in (self.serial.read_thread,
+                       self.serial_queue.sender_thread,
+                       self.serial_parser.thread):
+            set_thread_nice(SERIAL_THREAD_NICE, thread.native_id)
+
+    def _init_printer(self) -> None:
+        """Creates the SDK printer object"""
+        self.printer = MyPrinter(
+            spool_path=self.cfg.daemon.uplink_spool_file)
+
+    def _stop_serial(self) -> None:
+        """Stops the serial communication threads"""
+        self.serial_queue.stop()
+        self.serial_parser.stop()
+        self.serial.stop()
+
+    def _init_cameras(self) -> None:
+        """Loads the camera drivers and looks for cameras"""
+        # The camera stack imports are heavy, so they are done only here
+        # pylint: disable=import-outside-toplevel
+        from ..cameras.picamera_driver import PiCameraDriver
+        from ..cameras.v4l2_driver import V4L2Driver
+
+        nice = None
+        if self.cfg.printer.prioritize_serial:
+            # The camera threads started from here inherit this
+            nice = BACKGROUND_THREAD_NICE
+            set_thread_nice(nice)
+
+        drivers: List[Type[CameraDriver]] = [V4L2Driver]
+        if PiCameraDriver.supported:
+            drivers.append(PiCameraDriver)
+
+        self.camera_configurator = CameraConfigurator(
+            config=self.settings,
+            config_file_path=self.cfg.printer.settings,
+            camera_controller=self.printer.camera_controller,
+            drivers=drivers,
+            auto_detect=self.cfg.cameras.auto_detect
+        )
+        self.camera_governor = CameraGovernor(self.camera_configurator,
+                                              self.printer.camera_controller,
+                                              nice=nice)
+
+    def _stop_cameras(self) -> None:
+        """Disconnects the cameras found during the startup"""
+        for camera in list(self.printer.camera_controller.cameras_in_order):
+            camera.disconnect()
+
+    def _create_components(self) -> None:
+        """Creates the components, before their signals get bound"""
+        self.lcd_printer = LCDPrinter(self.serial_queue, self.serial_parser,
+                                      self.model, self.settings, self.printer)
+        self.eeprom = EEPROMMirror(self.serial_queue)
+        self.job = Job(self.serial_parser, self.serial_queue, self.model,
+                       self.printer, self.eeprom)
+        self.state_manager = StateManager(self.serial_parser, self.model,
+                                          self.printer, self.cfg,
+                                          self.settings)
+        self.job_history = JobHistory(self.cfg, self.model)
+        self.sampling_profiler = SamplingProfiler(self.cfg)
+        self.print_stats = PrintStats(self.model)
+        self.file_printer = FilePrinter(self.serial_queue, self.serial_parser,
+                                        self.model, self.cfg, self.print_stats)
+        self.storage_controller = StorageController(self.cfg,
+                                                    self.serial_queue,
+                                                    self.serial_parser,
+                                                    self.state_manager,
+                                                    self.model)
+        self.ip_updater = IPUpdater(self.model, self.serial_queue)
+        self.telemetry_passer = TelemetryPasser(self.model, self.printer)
+        self.printer_polling = PrinterPolling(self.serial_queue,
+                                              self.serial_parser, self.printer,
+                                              self.model,
+                                              self.telemetry_passer, self.job,
+                                              self.storage_controller.sd_card,
+                                              self.settings, self.eeprom)
+        self.eta_estimator = EtaEstimator(self.cfg, self.printer,
+                                          self.telemetry_passer)
+        self.command_queue = CommandQueue()
+        self.special_commands = SpecialCommands(self.serial_parser,
+                                                self.command_queue,
+                                                self.lcd_printer)
+
+        self.print_stat_doubler = PrintStatDoubler(self.serial_parser,
+                                                   self.printer_polling)
+
+        # Leave the non-polled telemetry split from the rest
+        self.auto_telemetry = AutoTelemetry(self.serial_parser,
+                                            self.serial_queue, self.model,
+                                            self.telemetry_passer)
+
+    def _start_components(self) -> None:
+        """Starts the components, once everything is in place"""
+        self.camera_governor.start()
+        self.auto_telemetry.start()
+
+        self.printer_polling.start()
+        self.storage_controller.start()
+        self.ip_updater.start()
+        self.job_history.start()
+        self.sampling_profiler.start()
+        self.lcd_printer.start()
+        self.command_queue.start()
+        self.telemetry_passer.start()
+        self.printer.start()
+        # Start this last, as it might start printing right away
+        self.file_printer.start()
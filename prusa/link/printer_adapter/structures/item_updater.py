@@ -5,15 +5,20 @@ from math import inf
 from multiprocessing import Event
 from queue import Empty, PriorityQueue, Queue
 from threading import RLock, Thread, current_thread
-from time import time
+from time import monotonic, time
 from typing import Any, Callable, Iterable, Optional, Set
 
 from blinker import Signal  # type: ignore
 
+from ...metrics import REGISTRY
 from ...util import prctl_name
 
 log = logging.getLogger(__name__)
 
+GATHER_SECONDS = REGISTRY.histogram(
+    "prusalink_item_gather_seconds",
+    "Time to gather the value of a watched item")
+
 
 class SideEffectOnly(Exception):
     """An exception to raise in a gatherer that has nothing to return,
@@ -415,6 +420,7 @@ class ItemUpdater:
             return
 
         log.debug("Gathering new value for item %s", item.name)
+        started_at = monotonic()
         try:
             value = item.gather_function()
         # pylint: disable=broad-except
@@ -438,6 +444,8 @@ class ItemUpdater:
         else:
             with item.lock:
                 self.set_value(item, value)
+        finally:
+            GATHER_SECONDS.observe(monotonic() - started_at)
 
     def _gather_error_reschedule(self, item):
         """
@@ -33,6 +33,8 @@ class Telemetry(BaseModel):
     time_printing: Optional[int] = None
     time_transferring: Optional[int] = None
     time_remaining: Optional[int] = None
+    time_remaining_corrected: Optional[int] = None
+    time_remaining_confidence: Optional[float] = None
     odometer_x: Optional[int] = None
     odometer_y: Optional[int] = None
     odometer_z: Optional[int] = None
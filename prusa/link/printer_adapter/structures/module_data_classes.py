@@ -2,7 +2,7 @@
 Decided that keeping module data externally will aid with gathering them for
 the api, definitions of which is what this module contains
 """
-from typing import Any, Deque, Dict, List, Optional, Set
+from typing import Any, Deque, List, Optional, Set
 
 from pydantic import BaseModel
 from prusa.connect.printer.const import State
@@ -115,9 +115,10 @@ class SDCardData(BaseModel):
     last_checked_flash_air: float
     sd_state: SDState
     files: Any  # We cannot type-check SDFile, only basic ones
-    sfn_to_lfn_paths: Dict[str, str]
-    lfn_to_sfn_paths: Dict[str, str]
-    mixed_to_lfn_paths: Dict[str, str]
+    # PathTrie mappings of path strings
+    sfn_to_lfn_paths: Any
+    lfn_to_sfn_paths: Any
+    mixed_to_lfn_paths: Any
 
 
 class StorageData(BaseModel):
@@ -41,6 +41,8 @@ SD_PRESENT_REGEX = re.compile(r"^(?P<ok>echo:SD card ok)|"
                               r"(Error:volume\.init failed)|"
                               r"(Error:openRoot failed))$")
 SD_EJECTED_REGEX = re.compile(r"^(echo:SD card released)$")
+SD_WRITE_REGEX = re.compile(r"^(?P<ok>Writing to file: (?P<sfn>.*))|"
+                            r"(?P<nok>open failed, File: .*)$")
 
 ANY_REGEX = re.compile(r".*")
 CONFIRMATION_REGEX = re.compile(
@@ -6,7 +6,7 @@ send telemetry and what actual telemetry to send
 import logging
 from threading import Event, RLock, Thread
 from time import time
-from typing import Any
+from typing import Any, Dict
 
 from prusa.connect.printer import Printer
 from prusa.connect.printer.const import State
@@ -16,6 +16,7 @@ from ..const import (JITTER_THRESHOLD, PRINTING_STATES,
                      TELEMETRY_IDLE_INTERVAL, TELEMETRY_PRINTING_INTERVAL,
                      TELEMETRY_SLEEP_AFTER, TELEMETRY_SLEEPING_INTERVAL,
                      TELEMETRY_REFRESH_INTERVAL)
+from ..metrics import REGISTRY
 from ..util import loop_until
 from .model import Model
 from .structures.mc_singleton import MCSingleton
@@ -23,10 +24,6 @@ from .structures.model_classes import Telemetry
 
 log = logging.getLogger(__name__)
 
-# beyond this many things waiting to get sent by the SDK,
-# we'll stop sending telemetry
-QUEUE_LENGTH_LIMIT = 4
-
 JITTERY_TEMPERATURES = {"temp_nozzle", "temp_bed"}
 ACTIVATING_CHANGES = {
     "target_nozzle", "target_bed", "axis_x", "axis_y", "axis_z",
@@ -35,11 +32,17 @@ ACTIVATING_CHANGES = {
 NOT_PRINTING_IGNORED = {
     "time_printing",
     "time_remaining",
+    "time_remaining_corrected",
+    "time_remaining_confidence",
     "progress",
     "inaccurate_estimates"
 }
 PRINTING_IGNORED = {"axis_x", "axis_y"}
 
+PASS_TIME = REGISTRY.histogram(
+    "prusalink_telemetry_pass_seconds",
+    "Time to pass the telemetry to the SDK")
+
 
 class TelemetryPasser(metaclass=MCSingleton):
     """Tasked with passing the correct telemetry with the correct timing"""
@@ -118,6 +121,7 @@ class TelemetryPasser(metaclass=MCSingleton):
             self._to_send = {}
             return to_return
 
+    @PASS_TIME.time()
     def pass_telemetry(self):
         """Passes the telemetry to the SDK
         and pushes the newer telemetry into the sent telemetry"""
@@ -133,10 +137,6 @@ class TelemetryPasser(metaclass=MCSingleton):
             log.debug("Wizard has not been completed yet -> no telemetry")
             return
 
-        if self.printer.queue.qsize() >= QUEUE_LENGTH_LIMIT:
-            log.debug("SDK queue looks stuck -> no telemetry")
-            return
-
         with self.lock:
             # Update what we sent last time
             self._last_sent.update(self._to_send)
@@ -167,9 +167,13 @@ class TelemetryPasser(metaclass=MCSingleton):
     def set_telemetry(self, new_telemetry: Telemetry):
         """Filters jitter, state inappropriate or unchanged data
         Updates the telemetries with new data"""
+        self.set_telemetry_values(new_telemetry.dict(exclude_none=True))
+
+    def set_telemetry_values(self, values: Dict[str, Any]):
+        """Like set_telemetry, but takes the values without the model
+        around them. The keys have to be the Telemetry field names"""
         with self.lock:
-            new_telemetry_dict = new_telemetry.dict(exclude_none=True)
-            for key, value in new_telemetry_dict.items():
+            for key, value in values.items():
                 if value is None:
                     continue
 
@@ -2,7 +2,7 @@
 from logging import getLogger
 from pathlib import Path
 from time import sleep
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from prusa.connect.printer import Printer as SDKPrinter
 from prusa.connect.printer import const
@@ -21,6 +21,7 @@ from ..printer_adapter.structures.mc_singleton import MCSingleton
 from ..printer_adapter.updatable import Thread
 from ..util import file_is_on_sd, prctl_name
 from .command_handler import CommandHandler
+from .uplink import Uplink
 
 log = getLogger("connect-printer")
 
@@ -31,8 +32,9 @@ class MyPrinter(SDKPrinter, metaclass=MCSingleton):
     PrusaLink
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, spool_path: Optional[str] = None, **kwargs):
         super().__init__(*args, **kwargs)
+        self.queue = Uplink(spool_path)  # type: ignore
         self.lcd_printer = LCDPrinter.get_instance()
         self.download_thread = Thread(target=self.download_loop,
                                       name="download")
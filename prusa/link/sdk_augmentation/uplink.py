@@ -0,0 +1,250 @@
+"""
+Contains implementation of the Uplink class
+
+Stands in for the queue the SDK loop sends from. The telemetry waiting
+to be sent gets merged into one, the events go before it. What fails
+to send is retried with a growing delay, and during the outage the
+events are kept in a size capped spool file, so they survive a restart
+"""
+import json
+import logging
+import os
+from collections import deque
+from functools import partial
+from queue import Empty
+from threading import Condition
+from time import monotonic
+from typing import Any, Deque, Dict, List, Optional
+
+from prusa.connect.printer import const
+from prusa.connect.printer.models import Event, LoopObject, Telemetry
+
+from ..const import UPLINK_MAX_BACKOFF, UPLINK_MIN_BACKOFF, UPLINK_SPOOL_SIZE
+from ..metrics import REGISTRY
+
+log = logging.getLogger(__name__)
+
+MERGED = REGISTRY.counter(
+    "prusalink_uplink_merged_telemetry_total",
+    "Telemetry merged into the one waiting to be sent")
+FAILED = REGISTRY.counter(
+    "prusalink_uplink_failed_sends_total",
+    "Sends to Connect, which failed and got queued for a retry")
+DROPPED = REGISTRY.counter(
+    "prusalink_uplink_dropped_events_total",
+    "Events dropped, because too many of them were waiting")
+
+# Added by the SDK, these describe the moment of sending and are not
+# deltas like the rest of the telemetry, only the newest ones count
+SNAPSHOT_KEYS = frozenset((
+    "command_id", "job_id", "transfer_id", "transfer_progress",
+    "transfer_time_remaining", "transfer_transferred", "time_transferring"))
+
+
+class SpooledEvent(LoopObject):
+    """An event read back from the spool file"""
+    endpoint = Event.endpoint
+    method = Event.method
+
+    def __init__(self, payload: Dict[str, Any], timestamp: float) -> None:
+        super().__init__(timestamp=timestamp)
+        self.payload = payload
+
+    def to_payload(self):
+        return self.payload
+
+    def __repr__(self):
+        return f"<SpooledEvent at {id(self)}> {self.payload}"
+
+
+SPOOLED = (Event, SpooledEvent)
+
+
+def merge_telemetry(older: Telemetry, newer: Telemetry) -> Telemetry:
+    """One telemetry with the values of both, the newer ones win"""
+    payload = {key: value for key, value in older.to_payload().items()
+               if key not in SNAPSHOT_KEYS}
+    payload.update(newer.to_payload())
+    state = const.State(payload.pop("state"))
+    return Telemetry(state, newer.timestamp, **payload)
+
+
+class Uplink:
+    """
+    A queue of the things to send to Connect. Has the put(), get() and
+    qsize() the SDK uses.
+
+    Every item handed out has its send() wrapped, so the uplink learns
+    how it went. A connection error or a server error puts the item
+    back to the front, and nothing gets handed out until the retry
+    delay passes. The first successful send ends the outage and
+    the waiting items follow in their original order
+    """
+
+    def __init__(self, spool_path: Optional[str] = None) -> None:
+        self.spool_path = spool_path
+        self.condition = Condition()
+        self.events: Deque[LoopObject] = deque()
+        self.telemetry: Optional[Telemetry] = None
+        self.in_flight: Optional[LoopObject] = None
+
+        self.offline = False
+        self.spooled = False  # whether the spool file has events in it
+        self.failures = 0
+        self.retry_at = 0.
+        self._load()
+
+    def put(self, item: Optional[LoopObject]) -> None:
+        """Adds an item, None just wakes up the waiting get()"""
+        with self.condition:
+            if isinstance(item, Telemetry):
+                if self.telemetry is not None:
+                    item = merge_telemetry(self.telemetry, item)
+                    MERGED.inc()
+                self.telemetry = item
+            elif item is not None:
+                self.events.append(item)
+                self._trim()
+                if self.offline:
+                    self._save()
+            self.condition.notify()
+
+    def get(self, timeout: Optional[float] = None) -> LoopObject:
+        """
+        Like Queue.get(), the events go first.
+        Raises Empty if there's nothing to send before the timeout
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        with self.condition:
+            # Without a server or a token, the SDK skips the item
+            # without sending it, so it's not on its way anymore
+            self.in_flight = None
+            while True:
+                now = monotonic()
+                if now >= self.retry_at and (self.events
+                                             or self.telemetry is not None):
+                    break
+                wait = self.retry_at - now if now < self.retry_at else None
+                if deadline is not None:
+                    if now >= deadline:
+                        raise Empty
+                    wait = deadline - now if wait is None \
+                        else min(wait, deadline - now)
+                self.condition.wait(wait)
+
+            item: Optional[LoopObject]
+            if self.events:
+                item = self.events.popleft()
+            else:
+                item, self.telemetry = self.telemetry, None
+            assert item is not None
+            self.in_flight = item
+        item.send = partial(self._send, item)  # type: ignore
+        return item
+
+    def qsize(self) -> int:
+        """How many items wait to be sent"""
+        with self.condition:
+            return len(self.events) + (self.telemetry is not None)
+
+    def _send(self, item: LoopObject, conn, server, headers):
+        """Sends the item the usual way, notes if it went through"""
+        try:
+            res = type(item).send(item, conn, server, headers)
+        except Exception:
+            self._failed(item)
+            raise
+        if res.status_code >= 500:
+            self._failed(item)
+        else:
+            self._delivered()
+        return res
+
+    def _failed(self, item: LoopObject) -> None:
+        """Puts the item back and delays the retry"""
+        FAILED.inc()
+        with self.condition:
+            self.in_flight = None
+            if isinstance(item, Telemetry):
+                if self.telemetry is not None:
+                    item = merge_telemetry(item, self.telemetry)
+                self.telemetry = item
+            else:
+                self.events.appendleft(item)
+            self.failures += 1
+            delay = min(UPLINK_MIN_BACKOFF * 2**(self.failures - 1),
+                        UPLINK_MAX_BACKOFF)
+            self.retry_at = monotonic() + delay
+            if not self.offline:
+                log.warning("Connect is unreachable, keeping what's to be "
+                            "sent until it's back")
+            self.offline = True
+            self._save()
+
+    def _delivered(self) -> None:
+        """Ends the outage, if there was one"""
+        with self.condition:
+            self.in_flight = None
+            self.failures = 0
+            self.retry_at = 0.
+            if self.offline:
+                self.offline = False
+                log.info("Connect is reachable again, %s items to send",
+                         len(self.events) + (self.telemetry is not None))
+            if self.spooled:
+                self._save()
+
+    def _trim(self) -> None:
+        """Drops the oldest event, if there are too many"""
+        if len(self.events) <= UPLINK_SPOOL_SIZE:
+            return
+        for item in self.events:
+            if isinstance(item, SPOOLED):
+                self.events.remove(item)
+                DROPPED.inc()
+                log.warning("Too many events waiting, dropped %s", item)
+                return
+
+    def _save(self) -> None:
+        """Writes the waiting events into the spool file"""
+        if self.spool_path is None:
+            return
+        items: List[LoopObject] = list(self.events)
+        if self.in_flight is not None:
+            items.insert(0, self.in_flight)
+        records = [{"timestamp": item.timestamp,
+                    "payload": item.to_payload()}
+                   for item in items if isinstance(item, SPOOLED)]
+        try:
+            if not records:
+                if self.spooled:
+                    os.remove(self.spool_path)
+                self.spooled = False
+                return
+            temp_path = self.spool_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as spool_file:
+                json.dump(records, spool_file)
+            os.replace(temp_path, self.spool_path)
+            self.spooled = True
+        except FileNotFoundError:
+            self.spooled = False
+        except (OSError, TypeError, ValueError):
+            log.exception("Failed to write the uplink spool %s",
+                          self.spool_path)
+
+    def _load(self) -> None:
+        """Queues the events spooled before a restart"""
+        if self.spool_path is None or not os.path.exists(self.spool_path):
+            return
+        try:
+            with open(self.spool_path, "r", encoding="utf-8") as spool_file:
+                records = json.load(spool_file)
+            for record in records[-UPLINK_SPOOL_SIZE:]:
+                self.events.append(
+                    SpooledEvent(record["payload"], record["timestamp"]))
+        except (OSError, ValueError, TypeError, KeyError):
+            log.exception("Failed to read the uplink spool %s",
+                          self.spool_path)
+        self.spooled = True
+        log.info("Loaded %s events spooled during an outage",
+                 len(self.events))
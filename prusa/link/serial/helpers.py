@@ -1,11 +1,11 @@
 """Contains helper functions, for instruction enqueuing"""
 import re
 from threading import Event
-from typing import Callable, List
+from typing import Callable, List, Optional
 
 from ..const import QUIT_INTERVAL
 from ..serial.instruction import (Instruction, MandatoryMatchableInstruction,
-                                  MatchableInstruction)
+                                  MatchableInstruction, Priority)
 from .serial_queue import SerialQueue
 
 
@@ -30,7 +30,8 @@ def wait_for_instruction(instruction,
 def enqueue_instruction(queue: SerialQueue,
                         message: str,
                         to_front=False,
-                        to_checksum=False) -> Instruction:
+                        to_checksum=False,
+                        priority: Optional[Priority] = None) -> Instruction:
     """
     Creates an instruction, which it enqueues right away
     :param queue: the queue to enqueue into
@@ -38,9 +39,11 @@ def enqueue_instruction(queue: SerialQueue,
     :param to_front: Whether the instruction has a higher priority
     :param to_checksum: Whether to number and checksum the instruction (use
     only for print instructions!)
+    :param priority: The scheduling class, if the default one does not fit
     :return the enqueued instruction
     """
-    instruction = Instruction(message, to_checksum=to_checksum)
+    instruction = Instruction(message, to_checksum=to_checksum,
+                              priority=priority)
     queue.enqueue_one(instruction, to_front=to_front)
     return instruction
 
@@ -49,7 +52,10 @@ def enqueue_matchable(queue: SerialQueue,
                       message: str,
                       regexp: re.Pattern,
                       to_front=False,
-                      to_checksum=False) -> MandatoryMatchableInstruction:
+                      to_checksum=False,
+                      priority: Optional[Priority] = None,
+                      deadline: Optional[float] = None,
+                      drop_if_stale=False) -> MandatoryMatchableInstruction:
     """
     Creates a matchable instruction, which it enqueues right away
     :param queue: the queue to enqueue into
@@ -59,11 +65,19 @@ def enqueue_matchable(queue: SerialQueue,
     :param to_front: Whether the instruction has a higher priority
     :param to_checksum: Whether to number and checksum the instruction (use
     only for print instructions!)
+    :param priority: The scheduling class, if the default one does not fit
+    :param deadline: How many seconds can the instruction wait for a gap
+    in the print, before it goes ahead of it
+    :param drop_if_stale: Instead of going ahead of the print after the
+    deadline, the instruction gets dropped without being sent
     :return the enqueued instruction
     """
     instruction = MandatoryMatchableInstruction(message,
                                                 capture_matching=regexp,
-                                                to_checksum=to_checksum)
+                                                to_checksum=to_checksum,
+                                                priority=priority,
+                                                deadline=deadline,
+                                                drop_if_stale=drop_if_stale)
     queue.enqueue_one(instruction, to_front=to_front)
     return instruction
 
@@ -72,7 +86,9 @@ def enqueue_list_from_str(queue: SerialQueue,
                           message_list: List[str],
                           regexp: re.Pattern,
                           to_front=False,
-                          to_checksum=False) -> List[MatchableInstruction]:
+                          to_checksum=False,
+                          priority: Optional[Priority] = None
+                          ) -> List[MatchableInstruction]:
     """
     Creates a list of instructions, which it enqueues right away
     :param queue: Queue to enqueue into
@@ -84,13 +100,15 @@ def enqueue_list_from_str(queue: SerialQueue,
     :param to_front: Whether the instruction has a higher priority
     :param to_checksum: Whether to number and checksum the instruction (use
     only for print instructions!)
+    :param priority: The scheduling class, if the default one does not fit
     :return List of enqueued instructions
     """
     instruction_list: List[MatchableInstruction] = []
     for message in message_list:
         instruction = MatchableInstruction(message,
                                            capture_matching=regexp,
-                                           to_checksum=to_checksum)
+                                           to_checksum=to_checksum,
+                                           priority=priority)
         instruction_list.append(instruction)
     queue.enqueue_list(instruction_list, to_front=to_front)
     return instruction_list
@@ -4,6 +4,7 @@ serial queue
 """
 import logging
 import re
+from enum import IntEnum
 from threading import Event
 from time import time
 from typing import List, Optional
@@ -11,12 +12,26 @@ from typing import List, Optional
 log = logging.getLogger(__name__)
 
 
+class Priority(IntEnum):
+    """
+    The scheduling classes of the serial queue, the lower the value,
+    the more important. Re-sends and recoveries go before all of them
+    """
+    CONTROL = 0  # user commands, stopping, things that can't wait
+    PRINT = 1  # the numbered print stream
+    POLLING = 2  # reading and writing of the printer state
+    COSMETIC = 3  # LCD messages, network info for the printer menu
+
+
 class Instruction:
     """Basic instruction which can be enqueued into SerialQueue"""
     def __init__(self,
                  message: str,
                  to_checksum: bool = False,
-                 data: Optional[bytes] = None):
+                 data: Optional[bytes] = None,
+                 priority: Optional[Priority] = None,
+                 deadline: Optional[float] = None,
+                 drop_if_stale: bool = False):
         if message.count("\n") != 0:
             raise RuntimeError("Instructions cannot contain newlines.")
 
@@ -44,6 +59,17 @@ class Instruction:
         self.sent_at: Optional[float] = None
         self.time_to_confirm: Optional[float] = None
 
+        # The scheduling class, None lets the serial queue decide
+        self.priority = priority
+        # Seconds after enqueueing, after which the instruction gets sent
+        # before the print stream, or gets dropped if it's stale
+        self.deadline = deadline
+        self.drop_if_stale = drop_if_stale
+        # Set by the serial queue, in the time.monotonic() time
+        self.enqueued_at: Optional[float] = None
+        # Confirmed without being sent, because its deadline passed
+        self.dropped = False
+
     def __str__(self):
         return f"Instruction '{self.message.strip()}'"
 
@@ -8,9 +8,16 @@ import termios
 from select import select
 from time import time
 
+from ..metrics import REGISTRY
+
 TIOCM_DTR_str = struct.pack('I', termios.TIOCM_DTR)
 TIOCM_RTS_str = struct.pack('I', termios.TIOCM_RTS)
 
+BYTES_IN = REGISTRY.counter("prusalink_serial_received_bytes_total",
+                            "Bytes read from the printer")
+BYTES_OUT = REGISTRY.counter("prusalink_serial_sent_bytes_total",
+                             "Bytes written to the printer")
+
 
 class SerialException(RuntimeError):
     """Own exception type."""
@@ -112,6 +119,7 @@ class Serial:
                 if not read_bytes:
                     raise SerialException("The serial became disconnected.")
                 self.__buffer += read_bytes
+                BYTES_IN.inc(len(read_bytes))
         except (BlockingIOError, InterruptedError, TypeError) as err:
             self.close()
             raise SerialException(f"read failed: {err}") from err
@@ -139,7 +147,9 @@ class Serial:
 
     def write(self, data: bytes):
         """Write data to serial port."""
-        return os.write(self.fd, data)
+        written = os.write(self.fd, data)
+        BYTES_OUT.inc(written)
+        return written
 
     @property
     def is_open(self):
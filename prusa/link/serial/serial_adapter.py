@@ -7,7 +7,7 @@ from importlib import util
 from pathlib import Path
 from threading import RLock
 from time import sleep, time
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import pyudev  # type: ignore
 from blinker import Signal  # type: ignore
@@ -21,7 +21,8 @@ from ..printer_adapter.structures.mc_singleton import MCSingleton
 from ..printer_adapter.structures.module_data_classes import Port, \
     SerialAdapterData
 from ..printer_adapter.structures.regular_expressions import \
-    PRINTER_TYPE_REGEX, FW_REGEX, BUSY_REGEX, ATTENTION_REGEX, VALID_SN_REGEX
+    PRINTER_TYPE_REGEX, FW_REGEX, BUSY_REGEX, ATTENTION_REGEX, \
+    VALID_SN_REGEX, PRINTER_BOOT_REGEX
 from ..printer_adapter.updatable import Thread
 from .serial import SerialException, Serial
 from .serial_parser import ThreadedSerialParser
@@ -37,6 +38,43 @@ class PortAdapter:
         self.serial: Optional[Serial] = None
 
 
+class HotplugMonitor:
+    """
+    Listens for udev events of newly plugged in Prusa USB devices,
+    so the port re-scan does not have to wait for its next attempt
+    """
+
+    def __init__(self) -> None:
+        self.monitor: Optional[pyudev.Monitor] = None
+        try:
+            self.monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+            self.monitor.filter_by(subsystem="tty")
+            self.monitor.start()
+        except (OSError, ValueError):
+            log.warning("Cannot monitor udev, the printer serial port will "
+                        "be looked for only periodically")
+            self.monitor = None
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Waits at most timeout seconds for a Prusa device to get plugged in,
+        returns True if one did
+        """
+        if self.monitor is None:
+            sleep(timeout)
+            return False
+        wait_until = time() + timeout
+        while (remaining := wait_until - time()) > 0:
+            device = self.monitor.poll(timeout=remaining)
+            if device is None:
+                return False
+            vendor_id = device.properties.get("ID_VENDOR_ID")
+            if device.action == "add" and vendor_id == PRUSA_VENDOR_ID:
+                log.info("A Prusa device appeared at %s", device.device_node)
+                return True
+        return False
+
+
 class SerialAdapter(metaclass=MCSingleton):
     """
     Class handling the basic serial management, opening, re-opening,
@@ -89,6 +127,10 @@ class SerialAdapter(metaclass=MCSingleton):
         self.failed_signal = Signal()
         self.renewed_signal = Signal()
 
+        # The path and USB serial number of the port that worked last time
+        self.last_port: Optional[Tuple[str, Optional[str]]] = None
+        self.hotplug = HotplugMonitor()
+
         self.running = True
 
         self.read_thread = Thread(target=self._read_continually,
@@ -140,6 +182,19 @@ class SerialAdapter(metaclass=MCSingleton):
                 return
         port.description = "A printer did not answer in time"
 
+    @staticmethod
+    def _wait_for_boot(serial: Serial) -> bool:
+        """
+        Opening a USB port resets the printer. Instead of sleeping through
+        the whole boot, waits for the "start" the firmware says once booted
+        """
+        boot_until = time() + PRINTER_BOOT_WAIT
+        while time() < boot_until:
+            line = decode_line(serial.readline())
+            if PRINTER_BOOT_REGEX.match(line):
+                return True
+        return False
+
     @staticmethod
     def _detect(port_adapter: PortAdapter):
         """
@@ -157,7 +212,9 @@ class SerialAdapter(metaclass=MCSingleton):
                 port_adapter.serial = serial
                 if not port.is_rpi_port:
                     port.description = "Waiting for printer to boot"
-                    sleep(8)
+                    if not SerialAdapter._wait_for_boot(serial):
+                        log.debug("Port '%s' did not boot a printer, "
+                                  "asking anyway", port.path)
 
             SerialAdapter._get_info(port_adapter)
 
@@ -185,11 +242,8 @@ class SerialAdapter(metaclass=MCSingleton):
 
     def _reopen(self) -> bool:
         """Re-open the configured serial port. Do a full re-scan if
-        auto is configured"""
-        self.data.using_port = None
-        self.data.ports = []
-        port_adapters: List[PortAdapter] = []
-        threads = []
+        auto is configured. The port that worked the last time gets tried
+        first on its own, if it still belongs to the same printer"""
         with self.write_lock:
             self.close()
 
@@ -201,41 +255,58 @@ class SerialAdapter(metaclass=MCSingleton):
                 paths = [self.configured_port]
             serial_numbers = SerialAdapter._get_prusa_usb_serial_numbers()
 
-            for path in paths:
-                port = Port(path=path,
-                            baudrate=115200,
-                            timeout=2,
-                            is_rpi_port=self.is_rpi_port(path))
-                if path in serial_numbers:
-                    port.sn = serial_numbers[path]
-                port_adapter = PortAdapter(port)
-                self.data.ports.append(port)
-                port_adapters.append(port_adapter)
-                thread = Thread(target=self._detect,
-                                args=(port_adapter,),
-                                name="port_detector",
-                                daemon=True)
-                threads.append(thread)
-                thread.start()
-
-            for thread in threads:
-                thread.join()
-
-            found = False
-            for port_adapter in port_adapters:
-                if port_adapter.port.usable and not found:
-                    found = True
-                    port_adapter.port.selected = True
-                    self.data.using_port = port_adapter.port
-                    self.serial = port_adapter.serial
-                    log.info("Using the serial port %s",
-                             self.data.using_port.path)
-                elif self.is_open(port_adapter.serial):
-                    # The above if guarantees there's not a None
-                    # in port.serial. Mypy is being dramatic again
-                    port_adapter.serial.close()  # type: ignore
-                    log.debug("Other port - %s", port)
-            return found
+            if self.last_port is not None and len(paths) > 1:
+                last_path, last_sn = self.last_port
+                if last_path in paths and \
+                        serial_numbers.get(last_path) == last_sn:
+                    if self._probe([last_path], serial_numbers):
+                        return True
+            return self._probe(paths, serial_numbers)
+
+    def _probe(self, paths: List[str], serial_numbers: Dict[str, str]) -> bool:
+        """Detects printers on the given ports in parallel, uses the first
+        usable one"""
+        self.data.using_port = None
+        self.data.ports = []
+        port_adapters: List[PortAdapter] = []
+        threads = []
+        for path in paths:
+            port = Port(path=path,
+                        baudrate=115200,
+                        timeout=2,
+                        is_rpi_port=self.is_rpi_port(path))
+            if path in serial_numbers:
+                port.sn = serial_numbers[path]
+            port_adapter = PortAdapter(port)
+            self.data.ports.append(port)
+            port_adapters.append(port_adapter)
+            thread = Thread(target=self._detect,
+                            args=(port_adapter,),
+                            name="port_detector",
+                            daemon=True)
+            threads.append(thread)
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        found = False
+        for port_adapter in port_adapters:
+            if port_adapter.port.usable and not found:
+                found = True
+                port_adapter.port.selected = True
+                self.data.using_port = port_adapter.port
+                self.serial = port_adapter.serial
+                self.last_port = (port_adapter.port.path,
+                                  port_adapter.port.sn)
+                log.info("Using the serial port %s",
+                         self.data.using_port.path)
+            elif self.is_open(port_adapter.serial):
+                # The above if guarantees there's not a None
+                # in port.serial. Mypy is being dramatic again
+                port_adapter.serial.close()  # type: ignore
+                log.debug("Other port - %s", port_adapter.port)
+        return found
 
     def close(self):
         """Close the serial. If the read thread is running,
@@ -267,7 +338,8 @@ class SerialAdapter(metaclass=MCSingleton):
                 log.warning("Error when connecting to serial according to "
                             "user config:  %s",
                             self.configured_port)
-                sleep(SERIAL_REOPEN_TIMEOUT)
+                # Try again sooner, if a printer gets plugged in
+                self.hotplug.wait(SERIAL_REOPEN_TIMEOUT)
             else:
                 break
 
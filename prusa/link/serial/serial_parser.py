@@ -9,18 +9,26 @@ evaluated first.
 """
 import logging
 import re
-from functools import partial
 from queue import Queue
 from threading import Lock, Thread
+from time import monotonic
 from typing import Any, Callable, Dict, Union, Optional, Match
 
 from blinker import Signal  # type: ignore
 from sortedcontainers import SortedKeyList  # type: ignore
 
+from ..metrics import REGISTRY
 from ..printer_adapter.structures.mc_singleton import MCSingleton
 
 log = logging.getLogger(__name__)
 
+DECIDE_TIME = REGISTRY.histogram(
+    "prusalink_serial_parser_decide_seconds",
+    "Time to find and call the handlers of a printer output line")
+HANDLER_QUEUE_WAIT = REGISTRY.histogram(
+    "prusalink_serial_parser_queue_wait_seconds",
+    "Time a decoupled handler waits in the queue before getting called")
+
 
 class RegexPairing:
     """
@@ -68,6 +76,7 @@ class SerialParser(metaclass=MCSingleton):
         self.pattern_list = SortedKeyList(key=lambda item: -item.priority)
         self.pairing_dict: Dict[re.Pattern, RegexPairing] = {}
 
+    @DECIDE_TIME.time()
     def decide(self, line: str) -> None:
         """
         The meat of the class, trying different RegexPairings ordered
@@ -159,7 +168,12 @@ class ThreadedSerialParser(SerialParser):
         """A function generator decoupling the caller thread by enqueuing
         instead of calling the provided handler with its call arguments"""
         def inner(sender, match):
-            self.handler_queue.put(partial(handler, sender, match=match))
+            enqueued_at = monotonic()
+
+            def call():
+                HANDLER_QUEUE_WAIT.observe(monotonic() - enqueued_at)
+                handler(sender, match=match)
+            self.handler_queue.put(call)
         return inner
 
     def process(self):
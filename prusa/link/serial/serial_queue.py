@@ -8,8 +8,8 @@ import logging
 import re
 from collections import deque
 from threading import Event, Lock
-from time import time
-from typing import Deque, List, Optional
+from time import monotonic, time
+from typing import Deque, Dict, List, Optional
 
 from blinker import Signal  # type: ignore
 from prusa.connect.printer.conditions import CondState
@@ -17,15 +17,17 @@ from prusa.connect.printer.conditions import CondState
 from ..conditions import RPI_ENABLED, SERIAL
 from ..config import Config
 from ..const import (HISTORY_LENGTH, MAX_INT, QUIT_INTERVAL, RX_SIZE,
+                     SERIAL_COSMETIC_WEIGHT, SERIAL_POLLING_WEIGHT,
                      SERIAL_QUEUE_MONITOR_INTERVAL, SERIAL_QUEUE_TIMEOUT)
 from ..interesting_logger import InterestingLogRotator
+from ..metrics import REGISTRY
 from ..printer_adapter.structures.mc_singleton import MCSingleton
 from ..printer_adapter.structures.regular_expressions import (
     ATTENTION_REGEX, BUSY_REGEX, CONFIRMATION_REGEX, HEATING_HOTEND_REGEX,
     HEATING_REGEX, M110_REGEX, RESEND_REGEX)
 from ..printer_adapter.updatable import Thread
 from ..util import loop_until, prctl_name
-from .instruction import Instruction, MatchableInstruction
+from .instruction import Instruction, MatchableInstruction, Priority
 from .is_planner_fed import IsPlannerFed
 from .serial import SerialException
 from .serial_adapter import SerialAdapter
@@ -33,6 +35,38 @@ from .serial_parser import ThreadedSerialParser
 
 log = logging.getLogger(__name__)
 
+CONFIRM_TIME = REGISTRY.histogram(
+    "prusalink_serial_confirm_seconds",
+    "Time from sending an instruction to its confirmation")
+RESENDS = REGISTRY.counter(
+    "prusalink_serial_resends_total",
+    "Re-sends of instructions requested by the printer")
+STUCK = REGISTRY.counter(
+    "prusalink_serial_stuck_total",
+    "Instructions not confirmed in time")
+LCD_BYTES = REGISTRY.counter(
+    "prusalink_lcd_bytes_total",
+    "Bytes of LCD messages sent to the printer")
+LCD_SUPERSEDED = REGISTRY.counter(
+    "prusalink_lcd_skipped_total",
+    "LCD messages not sent to the printer",
+    reason="superseded")
+QUEUE_WAIT = {
+    priority: REGISTRY.histogram(
+        "prusalink_serial_queue_wait_seconds",
+        "Time from enqueueing an instruction to sending it",
+        priority=priority.name.lower())
+    for priority in Priority}
+DROPPED = REGISTRY.counter(
+    "prusalink_serial_dropped_total",
+    "Instructions not sent, because they got stale waiting")
+
+# The classes sharing the gaps in the print stream and their weights
+SHARES = {
+    Priority.POLLING: SERIAL_POLLING_WEIGHT,
+    Priority.COSMETIC: SERIAL_COSMETIC_WEIGHT,
+}
+
 
 class SerialQueue(metaclass=MCSingleton):
     """
@@ -42,6 +76,12 @@ class SerialQueue(metaclass=MCSingleton):
     There are many edge cases like resend requests, message number resets
     RX buffer dumping and so on, which this class works around to provide
     as deterministic of a serial connection to a Prusa printer as possible
+
+    The instructions are scheduled by their Priority class. Control goes
+    first, then the print stream. Polling and cosmetic instructions share
+    the gaps, when the planner buffer is full, by their weights. A polling
+    instruction past its deadline goes before the print stream, or gets
+    dropped if it does not make sense to send it that late
     """
 
     def __init__(self,
@@ -57,11 +97,20 @@ class SerialQueue(metaclass=MCSingleton):
         self.serial_queue_failed = Signal()
         self.instruction_confirmed_signal = Signal()
 
-        # A queue of instructions for the printer
-        self.queue: Deque[Instruction] = deque()
+        # The instructions for the printer, by their scheduling class
+        self.queues: Dict[Priority, Deque[Instruction]] = {
+            priority: deque() for priority in Priority}
+        # Smooth weighted round-robin balance of the classes in SHARES
+        self.balance: Dict[Priority, int] = dict.fromkeys(SHARES, 0)
+
+        # While a component has the printer for itself, like when writing
+        # to the SD card, only its instructions get sent, the rest waits
+        self.exclusive_queue: Deque[Instruction] = deque()
+        self.exclusive = False
 
-        # This one shall contain time critical instructions
-        self.priority_queue: Deque[Instruction] = deque()
+        # The newest LCD message, it waits for a gap in the print
+        # and a newer one replaces it, if it did not get sent by then
+        self.lcd_slot: Optional[Instruction] = None
 
         # Instruction that is currently being handled
         self.current_instruction: Optional[Instruction] = None
@@ -155,13 +204,102 @@ class SerialQueue(metaclass=MCSingleton):
             return self.rx_yeet_slot
         if self.recovery_list:
             return self.recovery_list[-1]
-        if self.priority_queue:
-            if self.is_planner_fed() and self.queue:
-                return self.queue[-1]
-            return self.priority_queue[-1]
-        if self.queue:
-            return self.queue[-1]
-        return None
+        if self.exclusive:
+            if self.exclusive_queue:
+                return self.exclusive_queue[-1]
+            return None
+        priority = self._pick_class(commit=False)
+        if priority is None:
+            return None
+        if self.queues[priority]:
+            return self.queues[priority][-1]
+        return self.lcd_slot
+
+    def _is_waiting(self, priority: Priority) -> bool:
+        """Is there an instruction of the class waiting to be sent?"""
+        if priority == Priority.COSMETIC and self.lcd_slot is not None:
+            return True
+        return bool(self.queues[priority])
+
+    @staticmethod
+    def _is_overdue(instruction: Instruction, now: float) -> bool:
+        """Has the instruction waited longer than its deadline?"""
+        return instruction.deadline is not None \
+            and instruction.enqueued_at is not None \
+            and now - instruction.enqueued_at >= instruction.deadline
+
+    def _drop_stale(self):
+        """
+        Confirms the overdue instructions, which do not make sense to send
+        anymore, without sending them. Whoever waits on them, finds out
+        from their dropped flag, or from them not having any output
+        """
+        now = monotonic()
+        for priority in SHARES:
+            queue = self.queues[priority]
+            stale = [instruction for instruction in queue
+                     if instruction.drop_if_stale
+                     and self._is_overdue(instruction, now)]
+            for instruction in stale:
+                log.debug("Dropping stale %s", instruction)
+                queue.remove(instruction)
+                DROPPED.inc()
+                instruction.dropped = True
+                instruction.sent()
+                instruction.confirm(force=True)
+
+    def _pick_class(self, commit: bool) -> Optional[Priority]:
+        """
+        Decides which class goes next, None if there's nothing to send.
+        Without commit, the round-robin state stays the same and nothing
+        gets dropped, so peeking does not change the queues
+        """
+        if commit:
+            self._drop_stale()
+        if self.queues[Priority.CONTROL]:
+            return Priority.CONTROL
+        # The queues are FIFO, so it's enough to look at the oldest one
+        polling = self.queues[Priority.POLLING]
+        if polling and self._is_overdue(polling[-1], monotonic()):
+            return Priority.POLLING
+
+        waiting = [priority for priority in SHARES
+                   if self._is_waiting(priority)]
+        if self.queues[Priority.PRINT] and (
+                not waiting or not self.is_planner_fed()):
+            return Priority.PRINT
+        if not waiting:
+            return None
+        if len(waiting) == 1:
+            return waiting[0]
+
+        balance = dict(self.balance)
+        for priority in waiting:
+            balance[priority] += SHARES[priority]
+        chosen = max(waiting, key=balance.__getitem__)
+        balance[chosen] -= sum(SHARES[priority] for priority in waiting)
+        if commit:
+            self.balance = balance
+        return chosen
+
+    def _pop_class(self, priority: Priority) -> Instruction:
+        """Takes the oldest instruction of the class out of its queue"""
+        instruction: Optional[Instruction]
+        if self.queues[priority]:
+            instruction = self.queues[priority].pop()
+        else:
+            instruction = self.lcd_slot
+            self.lcd_slot = None
+            assert instruction is not None
+            LCD_BYTES.inc(len(instruction.message) + 1)
+        if priority > Priority.PRINT and self.queues[Priority.PRINT]:
+            # Invalidate, so the rest doesn't go through all at once
+            self.is_planner_fed.is_fed = False
+            log.debug("Allowing a non-print instruction through")
+        if instruction.enqueued_at is not None:
+            QUEUE_WAIT[priority].observe(
+                monotonic() - instruction.enqueued_at)
+        return instruction
 
     def _next_instruction(self):
         """
@@ -180,28 +318,26 @@ class SerialQueue(metaclass=MCSingleton):
             self.rx_yeet_slot = None
         elif self.recovery_list:
             self.current_instruction = self.recovery_list.pop()
-        elif self.priority_queue:
-            if self.is_planner_fed() and self.queue:
-                # Invalidate, so the unimportant queue doesn't go all at once
-                self.is_planner_fed.is_fed = False
-                log.debug("Allowing a non-important instruction through")
-                self.current_instruction = self.queue.pop()
-            else:
-                self.current_instruction = self.priority_queue.pop()
-        elif self.queue:
-            self.current_instruction = self.queue.pop()
+        elif self.exclusive:
+            if self.exclusive_queue:
+                self.current_instruction = self.exclusive_queue.pop()
+        else:
+            priority = self._pick_class(commit=True)
+            if priority is not None:
+                self.current_instruction = self._pop_class(priority)
 
     # --- If statements in methods ---
     def can_write(self):
         """Determines whether we're in a state suitable for writing"""
-        return self.current_instruction is None and not self.is_empty() and \
-            not self.closed
+        return self.current_instruction is None and \
+            self.peek_next() is not None and not self.closed
 
     def is_empty(self):
         """Determines whether all queues and slots for writing are empty"""
-        return not self.queue and not self.priority_queue and \
+        return not any(self.queues.values()) and \
             not self.recovery_list and self.rx_yeet_slot is None\
-            and self.m110_workaround_slot is None
+            and self.m110_workaround_slot is None \
+            and not self.exclusive_queue and self.lcd_slot is None
 
     # --- Actual methods ---
 
@@ -270,6 +406,9 @@ class SerialQueue(metaclass=MCSingleton):
 
         self._next_instruction()
         instruction = self.current_instruction
+        if instruction is None:
+            # The peeked instruction got dropped as stale
+            return
 
         if instruction.data is None:
             if instruction.to_checksum:
@@ -304,12 +443,26 @@ class SerialQueue(metaclass=MCSingleton):
         self.current_instruction.sent()
         self.serial_adapter.write(self.current_instruction.data)
 
+    @staticmethod
+    def _classify(instruction: Instruction, to_front: bool) -> Priority:
+        """
+        The class of an instruction. Without one set, the numbered ones
+        are the print, the ones to the front are control and the rest
+        is polling
+        """
+        if instruction.priority is not None:
+            return instruction.priority
+        if instruction.to_checksum:
+            return Priority.PRINT
+        if to_front:
+            return Priority.CONTROL
+        return Priority.POLLING
+
     def _enqueue(self, instruction: Instruction, to_front=False):
         """Internal method for enqueuing when already locked"""
-        if to_front:
-            self.priority_queue.appendleft(instruction)
-        else:
-            self.queue.appendleft(instruction)
+        instruction.enqueued_at = monotonic()
+        self.queues[self._classify(instruction, to_front)].appendleft(
+            instruction)
 
     def enqueue_one(self, instruction: Instruction, to_front=False):
         """
@@ -346,6 +499,46 @@ class SerialQueue(metaclass=MCSingleton):
 
         self._try_writing()
 
+    def replace_lcd(self, instruction: Instruction) -> Optional[Instruction]:
+        """
+        Puts an LCD message into its slot. Returns the message it replaced,
+        if that one did not get sent yet. The replaced one gets confirmed
+        without being sent, so nobody waits for it forever
+        """
+        with self.write_lock:
+            replaced = self.lcd_slot
+            self.lcd_slot = instruction
+
+        if replaced is not None:
+            LCD_SUPERSEDED.inc()
+            replaced.sent()
+            replaced.confirm(force=True)
+        self._try_writing()
+        return replaced
+
+    def begin_exclusive(self):
+        """
+        From now on, only instructions enqueued using enqueue_exclusive
+        get sent. The instruction being sent right now is still handled
+        """
+        with self.write_lock:
+            self.exclusive = True
+
+    def enqueue_exclusive(self, instruction: Instruction):
+        """Enqueue an instruction of the component owning the printer"""
+        with self.write_lock:
+            self.exclusive_queue.appendleft(instruction)
+
+        self._try_writing()
+
+    def end_exclusive(self):
+        """Lets the other instructions through again"""
+        with self.write_lock:
+            self.exclusive = False
+            self.exclusive_queue.clear()
+
+        self._try_writing()
+
     # --- Static capture handlers ---
 
     def _confirmation_handler(self, sender, match: re.Match):
@@ -364,6 +557,7 @@ class SerialQueue(metaclass=MCSingleton):
         number = int(match.group("cmd_number"))
         log.info("Resend of %s requested. Current is %s", number,
                  self.message_number)
+        RESENDS.inc()
         if self.message_number >= number:
             if (self.current_instruction is None
                     or not self.current_instruction.to_checksum):
@@ -421,8 +615,11 @@ class SerialQueue(metaclass=MCSingleton):
 
                 self._teardown_output_capture()
 
-                if instruction.to_checksum:
+                if instruction.time_to_confirm is not None:
+                    CONFIRM_TIME.observe(instruction.time_to_confirm)
+                if instruction.to_checksum and not self.exclusive:
                     # Only check those times for check-summed instructions
+                    # of a print, not of an SD upload
                     self.is_planner_fed.process_value(
                         instruction.time_to_confirm)
 
@@ -476,10 +673,10 @@ class SerialQueue(metaclass=MCSingleton):
         with self.write_lock:
             InterestingLogRotator.trigger("flushing of the serial queue.")
             new_queue = deque()
-            for instruction in self.priority_queue:
+            for instruction in self.queues[Priority.PRINT]:
                 if not instruction.to_checksum:
                     new_queue.append(instruction)
-            self.priority_queue = new_queue
+            self.queues[Priority.PRINT] = new_queue
             self.recovery_list.clear()
             self._throw_out_current_instruction()
 
@@ -489,6 +686,12 @@ class SerialQueue(metaclass=MCSingleton):
         instructions, to keep the serial queue consistent for example after
         a reboot.
         """
+        # Whoever had the printer for itself, lost it
+        self.exclusive = False
+        while self.exclusive_queue:
+            instruction = self.exclusive_queue.pop()
+            instruction.sent()
+            instruction.confirm(force=True)
         if self.current_instruction is not None:
             # To flush the one instruction, that has not yet been confirmed
             # but has been sent, use the usual way
@@ -621,6 +824,7 @@ class MonitoredSerialQueue(SerialQueue):
                      self.current_instruction, SERIAL_QUEUE_TIMEOUT)
             log.debug("Assuming the printer yeeted our RX buffer")
             self.stuck_counter += 1
+            STUCK.inc()
             if self.stuck_counter > 2:
                 log.warning("Closing the serial, because it's stuck")
                 self.serial_adapter.close()
@@ -7,10 +7,10 @@ import socket
 import typing
 from hashlib import sha256
 from pathlib import Path
-from threading import Event, current_thread
+from threading import Event, current_thread, get_native_id
 
 from time import time
-from typing import Callable, Union
+from typing import Callable, Optional, Union
 
 import prctl  # type: ignore
 import unidecode
@@ -27,6 +27,26 @@ def prctl_name():
     prctl.set_name(f"pl#{current_thread().name}")
 
 
+def set_thread_nice(nice: int, native_id: Optional[int] = None) -> bool:
+    """
+    Sets the nice value of a thread, the calling one by default.
+    Threads started afterwards by that thread inherit it
+    """
+    if native_id is None:
+        native_id = get_native_id()
+    try:
+        os.setpriority(os.PRIO_PROCESS, native_id, nice)
+    except PermissionError:
+        log.debug("Not allowed to set nice %s for thread %s", nice,
+                  native_id)
+        return False
+    except OSError:
+        log.exception("Failed to set nice %s for thread %s", nice,
+                      native_id)
+        return False
+    return True
+
+
 def loop_until(loop_evt: Event, run_every_sec: Callable[[], float], to_run,
                *arg_getters, **kwarg_getters):
     """
@@ -5,6 +5,8 @@ from wsgiref.simple_server import make_server
 
 import prctl  # type: ignore
 
+from ..const import BACKGROUND_THREAD_NICE
+from ..util import set_thread_nice
 from .lib.auth import REALM
 from .lib.classes import RequestHandler, ThreadingServer
 from .lib.core import app
@@ -22,6 +24,7 @@ __import__('connection', globals=globals(), level=1)
 __import__('settings', globals=globals(), level=1)
 __import__('controls', globals=globals(), level=1)
 __import__('cameras', globals=globals(), level=1)
+__import__('debug', globals=globals(), level=1)
 
 
 def init(daemon):
@@ -56,6 +59,9 @@ def init(daemon):
 def run_http(daemon, foreground=False):
     """Run http thread"""
     prctl.set_name("pl#http")
+    if daemon.cfg.printer.prioritize_serial:
+        # The request threads inherit this
+        set_thread_nice(BACKGROUND_THREAD_NICE)
     log.info('Starting server for http://%s:%d', daemon.cfg.http.address,
              daemon.cfg.http.port)
 
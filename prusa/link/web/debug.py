@@ -0,0 +1,43 @@
+"""Debugging and monitoring endpoint handlers"""
+from poorwsgi.response import JSONResponse, Response
+
+from .. import conditions
+from ..metrics import REGISTRY
+from .lib.auth import check_api_digest
+from .lib.core import app
+
+
+@app.route('/metrics')
+@check_api_digest
+def metrics(req):
+    """Returns the hot path metrics in the Prometheus text format"""
+    # pylint: disable=unused-argument
+    return Response(REGISTRY.export(),
+                    content_type="text/plain; version=0.0.4")
+
+
+@app.route('/api/v1/debug/profile')
+@check_api_digest
+def debug_profile(req):
+    """Returns the sampled stacks and the CPU usage of each thread.
+    With format=folded, returns the stacks for flamegraph.pl"""
+    if app.daemon.prusa_link is None:
+        raise conditions.PrinterUnavailable()
+    profiler = app.daemon.prusa_link.sampling_profiler
+    if req.args.get('format') == 'folded':
+        response = Response(profiler.get_folded(), content_type="text/plain")
+    else:
+        response = JSONResponse(**profiler.get_profile())
+    if req.args.get('reset', '').lower() in ('1', 'true', 'yes'):
+        profiler.reset()
+    return response
+
+
+@app.route('/api/v1/debug/startup')
+@check_api_digest
+def debug_startup(req):
+    """Returns how long each of the startup phases took"""
+    # pylint: disable=unused-argument
+    if app.daemon.prusa_link is None:
+        raise conditions.PrinterUnavailable()
+    return JSONResponse(**app.daemon.prusa_link.startup.get_report())
@@ -13,17 +13,20 @@ from prusa.connect.printer.const import StorageType, Source, FileType, \
     TransferType
 
 from .. import conditions
-from ..const import LOCAL_STORAGE_NAME
-from ..printer_adapter.command_handlers import StartPrint
+from ..const import LOCAL_STORAGE_NAME, UPLOAD_BLOCK_SIZE
+from ..printer_adapter.command_handlers import StartPrint, UploadToSD
 from ..printer_adapter.command import NotStateToPrint, FileNotFound
+from ..printer_adapter.filesystem.sd_upload import is_sfn_path
 from ..printer_adapter.job import Job
+from ..printer_adapter.structures.model_classes import JobState, SDState
 from .lib.auth import check_api_digest
 from .lib.core import app
 from .lib.files import (check_os_path, check_read_only, storage_display_path,
                         fill_printfile_data, get_os_path, check_storage,
                         get_files_size, partfilepath, make_headers, check_job,
                         fill_file_data, get_last_modified, make_cache_headers,
-                        check_cache_headers, get_boolean_header)
+                        check_cache_headers, get_boolean_header, preallocate,
+                        upload_budget)
 
 log = logging.getLogger(__name__)
 
@@ -172,7 +175,7 @@ def file_upload(req, storage, path):
     print_after_upload = get_boolean_header(req.headers, 'Print-After-Upload')
 
     uploaded = 0
-    # checksum = sha256() # - # We don't use this value yet
+    first_block = b''
 
     # Create folders within the path
     Path(split(abs_path)[0]).mkdir(parents=True, exist_ok=True)
@@ -186,31 +189,38 @@ def file_upload(req, storage, path):
     transfer.size = req.content_length
     transfer.start_ts = monotonic()
 
-    with open(part_path, 'w+b') as temp:
-        block = min(app.cached_size, req.content_length)
+    with open(part_path, 'w+b', buffering=0) as temp:
+        preallocate(temp, req.content_length)
+        block = min(UPLOAD_BLOCK_SIZE, req.content_length)
         data = req.read(block)
+        first_block = data
         while data:
             if transfer.stop_ts:
                 break
-            uploaded += temp.write(data)
+            upload_budget.throttle(len(data))
+            with memoryview(data) as view:
+                written = 0
+                while written < len(data):
+                    written += temp.write(view[written:])
+            uploaded += written
             transfer.transferred = uploaded
-            # checksum.update(data) # - we don't use the value yet
-            block = min(app.cached_size, req.content_length - uploaded)
+            block = min(UPLOAD_BLOCK_SIZE, req.content_length - uploaded)
             if block > 1:
                 data = req.read(block)
             else:
                 data = b''
+        temp.truncate(uploaded)
 
     transfer.type = TransferType.NO_TRANSFER
 
     if req.content_length > uploaded:
         raise conditions.FileUploadFailed()
 
-    # Mine a real mime_type from the file using magic
+    # Mine a real mime_type from the start of the file using magic
     if req.mime_type == 'application/octet-stream':
-        mime_type = Magic(mime=True).from_file(abs_path)
+        mime_type = Magic(mime=True).from_buffer(first_block)
         if mime_type not in allowed_types:
-            unlink(abs_path)
+            unlink(part_path)
             raise conditions.UnsupportedMediaError()
 
     if not overwrite:
@@ -284,6 +294,35 @@ def file_start_print(req, storage, path):
     return Response(status_code=state.HTTP_NO_CONTENT)
 
 
+@app.route('/api/v1/sd_upload/<storage>/<path:re:.+>',
+           method=state.METHOD_POST)
+@check_api_digest
+@check_storage
+def file_upload_to_sd(req, storage, path):
+    """Copy a local file onto the SD card. Runs in the background,
+    the progress can be watched as a transfer"""
+    if storage == 'sdcard':
+        raise conditions.SDCardNotSupported()
+    sd_path = req.json.get('sd_path')
+    if not isinstance(sd_path, str) or not is_sfn_path(sd_path):
+        raise conditions.InvalidSDPath()
+
+    prusa_link = app.daemon.prusa_link
+    if prusa_link.model.job.job_state != JobState.IDLE:
+        raise conditions.CurrentlyPrinting()
+    if prusa_link.model.sd_card.sd_state != SDState.PRESENT:
+        raise conditions.StorageNotExist()
+    local_path = storage_display_path(storage, path)
+    if prusa_link.printer.fs.get(local_path) is None:
+        raise conditions.FileNotFound()
+    if prusa_link.printer.transfer.in_progress:
+        raise conditions.TransferConflict()
+
+    prusa_link.command_queue.enqueue_command(
+        UploadToSD(local_path, sd_path, source=Source.WUI))
+    return Response(status_code=state.HTTP_ACCEPTED)
+
+
 @app.route('/api/v1/transfer')
 @check_api_digest
 def transfer_info(req):
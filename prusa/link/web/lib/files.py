@@ -3,9 +3,11 @@ from functools import wraps
 from io import FileIO
 from os import statvfs
 from os.path import abspath, dirname, exists, join
-from time import sleep, time
+from threading import Lock
+from time import monotonic, sleep, time
 from datetime import datetime
 from hashlib import md5
+import os
 
 from poorwsgi.request import Request, Headers
 
@@ -23,7 +25,8 @@ from .core import app
 from ... import conditions
 from ...printer_adapter.job import JobState
 from ...const import SD_STORAGE_NAME, LOCAL_STORAGE_NAME, \
-    HEADER_DATETIME_FORMAT
+    HEADER_DATETIME_FORMAT, QUIT_INTERVAL, UPLOAD_BLOCK_SIZE, UPLOAD_BURST, \
+    UPLOAD_MAX_RATE, UPLOAD_MIN_RATE
 from ...printer_adapter.job import Job
 
 
@@ -376,19 +379,81 @@ def get_files_size(files: dict, file_type: str):
     return size
 
 
+class UploadBudget:
+    """Token bucket for writing uploads while printing from USB.
+
+    The bytes per second refill rate follows the file printer headroom,
+    so uploads slow down only when the print's read ahead runs low."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.tokens = float(UPLOAD_BURST)
+        self.updated = monotonic()
+
+    @staticmethod
+    def should_throttle():
+        """Only USB prints read the local storage while printing"""
+        printer = app.daemon.prusa_link.printer
+        return printer.state == State.PRINTING \
+            and not Job.get_instance().data.from_sd
+
+    @staticmethod
+    def rate():
+        """Bytes per second we can write without starving the print"""
+        headroom = app.daemon.prusa_link.file_printer.headroom
+        return UPLOAD_MIN_RATE + (UPLOAD_MAX_RATE - UPLOAD_MIN_RATE) * headroom
+
+    def consume(self, size: int):
+        """Waits until there's budget to write size bytes"""
+        while True:
+            with self.lock:
+                now = monotonic()
+                self.tokens = min(
+                    float(UPLOAD_BURST),
+                    self.tokens + (now - self.updated) * self.rate())
+                self.updated = now
+                # Writes bigger than the burst go into debt
+                if self.tokens > 0:
+                    self.tokens -= size
+                    return
+                wait = -self.tokens / self.rate()
+            sleep(min(wait, QUIT_INTERVAL))
+
+    def throttle(self, size: int):
+        """Waits for the budget if a USB print is running"""
+        if self.should_throttle():
+            self.consume(size)
+
+
+upload_budget = UploadBudget()
+
+
+def preallocate(file, size: int):
+    """Reserve the space for the whole upload up front, so the file does not
+    get fragmented. Not every filesystem supports it, that's fine"""
+    try:
+        os.posix_fallocate(file.fileno(), 0, size)
+    except (AttributeError, OSError):
+        pass
+
+
 class GCodeFile(FileIO):
-    """Own file class to control processing data when POST"""
+    """Own file class to control processing data when POST
+
+    Data get written in whole UPLOAD_BLOCK_SIZE blocks
+    """
 
     def __init__(self, filepath: str, transfer: Transfer):
         assert (app.daemon and app.daemon.prusa_link
                 and app.daemon.prusa_link.printer)
         self.transfer = transfer
-        job = Job.get_instance()
         self.filepath = filepath
         self.__uploaded = 0
-        self.job_data = job.data
-        self.printer = app.daemon.prusa_link.printer
+        self.buffer = bytearray()
         super().__init__(filepath, 'w+b')
+        # Content-Length is not the file size, but close enough
+        if transfer.size:
+            preallocate(self, transfer.size)
 
     @property
     def uploaded(self):
@@ -403,15 +468,39 @@ class GCodeFile(FileIO):
                      transfer_id=self.transfer.transfer_id)
             self.transfer.type = TransferType.NO_TRANSFER
             raise conditions.TransferStopped()
-        if self.printer.state == State.PRINTING \
-                and not self.job_data.from_sd:
-            sleep(0.01)
-        size = super().write(data)
-        self.__uploaded += size
+        self.buffer += data
+        if len(self.buffer) >= UPLOAD_BLOCK_SIZE:
+            aligned = len(self.buffer) // UPLOAD_BLOCK_SIZE * UPLOAD_BLOCK_SIZE
+            self._write_block(aligned)
+        self.__uploaded += len(data)
         self.transfer.transferred = self.__uploaded
-        return size
+        return len(data)
+
+    def _write_block(self, size):
+        """Writes size bytes from the start of the buffer"""
+        upload_budget.throttle(size)
+        with memoryview(self.buffer) as view:
+            written = 0
+            while written < size:
+                written += super().write(view[written:size])
+        del self.buffer[:size]
+
+    def flush(self):
+        """Writes out the buffer, even if it's not a whole block"""
+        if self.buffer:
+            self._write_block(len(self.buffer))
+        super().flush()
+
+    def seek(self, *args, **kwargs):
+        """The form parser seeks back to the start after writing"""
+        self.flush()
+        return super().seek(*args, **kwargs)
 
     def close(self):
+        if not self.closed:
+            self.flush()
+            # Give back what the preallocation took over the real size
+            self.truncate(self.__uploaded)
         super().close()
         event_cb = app.daemon.prusa_link.printer.event_cb
         event_cb(Event.TRANSFER_FINISHED,
@@ -2,7 +2,7 @@
 import logging
 import subprocess
 from os import listdir
-from os.path import basename, dirname, getmtime, getsize, join
+from os.path import basename, dirname, exists, getmtime, getsize, join
 from socket import gethostname
 from subprocess import check_output, CalledProcessError
 from sys import version, executable
@@ -79,6 +79,14 @@ def websocket(req):
     return EmptyResponse()
 
 
+def get_binary_log_path():
+    """The binary interesting log, if it's turned on and exists"""
+    cfg = app.cfg.daemon
+    if cfg.binary_log_size and exists(cfg.binary_log_file):
+        return cfg.binary_log_file
+    return None
+
+
 @app.route('/api/logs')
 @check_api_digest
 def api_logs(req):
@@ -94,6 +102,13 @@ def api_logs(req):
                 'size': getsize(path),
                 'date': int(getmtime(path))
             })
+    binary_log = get_binary_log_path()
+    if binary_log:
+        logs_list.append({
+            'name': basename(binary_log),
+            'size': getsize(binary_log),
+            'date': int(getmtime(binary_log))
+        })
     logs_list = sorted(logs_list, key=lambda key: key['name'])
 
     return JSONResponse(files=logs_list)
@@ -104,6 +119,11 @@ def api_logs(req):
 def api_log(req, filename):
     """Returns content of intended log file"""
     # pylint: disable=unused-argument
+    binary_log = get_binary_log_path()
+    if binary_log and filename == basename(binary_log):
+        # Decode it with prusalink logdump
+        return FileResponse(binary_log,
+                            content_type="application/octet-stream")
     if not filename.startswith(LOGS_FILES):
         return Response(status_code=state.HTTP_NOT_FOUND)
 
@@ -546,6 +566,19 @@ def job_info(req):
     return Response(status_code=state.HTTP_NO_CONTENT)
 
 
+@app.route("/api/v1/jobs/<job_id:int>/history")
+@check_api_digest
+def job_history(req, job_id):
+    """Returns the journaled history of a job"""
+    # pylint: disable=unused-argument
+    history = app.daemon.prusa_link.job_history.get_history(job_id)
+    if history is None:
+        return JSONResponse(status_code=state.HTTP_NOT_FOUND,
+                            message=f"No history for the job with id: "
+                                    f"{job_id}")
+    return JSONResponse(**history)
+
+
 @app.route("/api/v1/update/<env>")
 @check_api_digest
 def api_update(req, env):
@@ -0,0 +1,62 @@
+"""
+Measures what the interesting logger costs per printed G-code
+
+Run with: python tests/benchmark_interesting_logger.py
+Every G-code goes through four debug calls on its way to the printer,
+the same as "USB enqueuing gcode", "Sent to printer", "Printer says"
+and "Matched %s calling %s" do. DEBUG output is disabled, as it is
+in production, so only the interesting log ring gets written.
+"""
+import logging
+import sys
+from threading import Thread
+from time import perf_counter
+
+from prusa.link.interesting_logger import (InterestingLogger,
+                                           InterestingLogRotator)
+
+GCODES = 100_000
+THREAD_COUNTS = (1, 4)
+
+
+def log_gcodes(logger: logging.Logger, count: int) -> None:
+    """Logs like the serial threads do for each G-code"""
+    for number in range(count):
+        logger.debug("USB enqueuing gcode: %s", "G1 X10 Y10 E0.5")
+        logger.debug("Sent to printer: %s", b"N42 G1 X10 Y10 E0.5*77")
+        logger.debug("Printer says: '%s'", "ok")
+        logger.debug("Matched %s calling %s", number, "handler")
+
+
+def measure(logger: logging.Logger, threads: int) -> float:
+    """Nanoseconds of logging per G-code, with threads logging at once"""
+    per_thread = GCODES // threads
+    workers = [Thread(target=log_gcodes, args=(logger, per_thread))
+               for _ in range(threads)]
+    started_at = perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (perf_counter() - started_at) / (per_thread * threads) * 1e9
+
+
+def main():
+    """Prints the overhead with and without the interesting log"""
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    InterestingLogRotator()
+    logging.setLoggerClass(InterestingLogger)
+    interesting = logging.getLogger("benchmark.interesting")
+    logging.setLoggerClass(logging.Logger)
+    plain = logging.getLogger("benchmark.plain")
+
+    for threads in THREAD_COUNTS:
+        baseline = measure(plain, threads)
+        with_ring = measure(interesting, threads)
+        print(f"{threads} thread(s): plain logger {baseline:.0f} ns, "
+              f"interesting logger {with_ring:.0f} ns, "
+              f"overhead {with_ring - baseline:.0f} ns per G-code")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+M73 P0 R12
+M862.3 P "MK3S"
+M117 Heating to 215.000 C
+M104 S215
+G28 W
+G80
+G21
+G90
+M83
+G92 E0
+G1 Z.2 F720
+G1 Y-3 F1000
+G1 X60 E9
+G1 X100 E12.5
+G92 E0
+G1 E-.8 F2100
+G1 Z.4 F720
+G1 X94.193 Y96.508
+G1 Z.2
+G1 E.8 F2100
+G1 F1200
+G1 X94.65 Y95.98 E.02188
+G1 X95.17 Y95.515 E.02188
+G1 X95.744 Y95.119 E.02188
+G1 X96.364 Y95.8 E0
+G1 X96.5 Y96
+G0 X100 Y100 F9000
+G1 X101 Y101
+M204 P800
+G1 X102 Y102 F9000
+G2 X110 Y110 I5 J0 E1.2
+G3 X100 Y100 R10.5
+G1 X1e3 F9000
+g1 x10 f9000
+G1 X10 F9000
+G1 X11 F9000 F9000
+G1 X12 F9000
+M117 G1 X10.000 F9000
+G4 S0
+M107
+G1 Z10
@@ -0,0 +1,44 @@
+; generated by PrusaSlicer 2.6.0
+M73 P0 R12
+M862.3 P "MK3S" ; printer model check
+M117 Heating to 215.000 C
+M104 S215
+G28 W ; home all without mesh bed level
+G80 ; mesh bed leveling
+G21 ; set units to millimeters
+G90 ; use absolute coordinates
+M83 ; extruder relative mode
+G92 E0.0
+G1  Z0.200 F720.000
+G1 Y-3.0 F1000.0 ; go outside print area
+G1 X60.0 E9.0 F1000.0 ; intro line
+G1 X100.0 E12.5 F1000.0 ; intro line
+G92 E0.0
+;LAYER_CHANGE
+;Z:0.2
+G1 E-.8 F2100
+G1 Z.4 F720
+G1 X94.193 Y96.508
+G1 Z.2
+G1 E.8 F2100
+G1 F1200
+G1 X94.650 Y95.980 E0.02188
+G1 X95.170 Y95.515 E0.02188 F1200
+G1 X95.744 Y95.119 E0.02188 F1200.000
+G1 X+96.364 Y095.800 E-0.00000
+G1	X96.5	Y96.0	F1200
+G0 X100 Y100 F9000
+G1 X101 Y101 F9000
+M204 P800
+G1 X102 Y102 F9000
+G2 X110.000 Y110.000 I5.000 J0.000 E1.2000 F9000
+G3 X100 Y100 R10.500 F9000
+G1 X1e3 F9000
+g1 x10 f9000
+G1 X10 F9000
+G1 X11 F9000 F9000
+G1 X12 F9000
+M117 G1 X10.000 F9000
+G4 S0
+M107
+G1 Z10.000
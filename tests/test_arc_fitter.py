@@ -0,0 +1,109 @@
+"""Tests of the arc fitting of USB prints"""
+from math import cos, hypot, pi, sin
+from typing import List
+
+from prusa.link.printer_adapter.arc_fitter import ArcFitter
+from prusa.link.printer_adapter.gcode_line import GcodeLine
+
+TOLERANCE = 0.05
+
+
+def circle_gcodes(center_x=100.0, center_y=100.0, radius=20.0,
+                  segments=32, turn=pi, clockwise=False) -> List[str]:
+    """G1 moves along a part of a circle, with even relative extrusion"""
+    direction = -1 if clockwise else 1
+    gcodes = ["G90", "M83", f"G1 X{center_x + radius:.3f} Y{center_y:.3f}"]
+    step = turn / segments
+    length = 2 * radius * sin(step / 2)
+    for number in range(1, segments + 1):
+        angle = direction * step * number
+        gcodes.append(f"G1 X{center_x + radius * cos(angle):.3f} "
+                      f"Y{center_y + radius * sin(angle):.3f} "
+                      f"E{length * 0.05:.5f}")
+    return gcodes
+
+
+def fit(gcodes: List[str]) -> List[GcodeLine]:
+    """Runs the G-codes through a fresh arc fitter"""
+    fitter = ArcFitter(TOLERANCE)
+    lines = []
+    for index, gcode in enumerate(gcodes):
+        lines.extend(fitter.feed(GcodeLine(index, index, gcode, False)))
+    lines.extend(fitter.flush())
+    return lines
+
+
+def words(gcode: str):
+    """The parameters of a G-code by their letters"""
+    return {word[0]: float(word[1:]) for word in gcode.split()[1:]}
+
+
+def test_arc_replaces_segments():
+    """A half circle becomes arcs ending where the moves did"""
+    gcodes = circle_gcodes()
+    lines = fit(gcodes)
+    arcs = [line for line in lines if line.gcode.startswith("G3")]
+    assert arcs
+    assert len(lines) < len(gcodes) / 4
+    assert not any(line.gcode.startswith("G1 X") for line in lines[3:])
+
+    # Ends at the same place, extrudes the same amount
+    assert lines[-1].line_index == len(gcodes) - 1
+    assert words(lines[-1].gcode)["X"] == words(gcodes[-1])["X"]
+    assert words(lines[-1].gcode)["Y"] == words(gcodes[-1])["Y"]
+    extruded = sum(words(gcode).get("E", 0) for gcode in gcodes)
+    assert abs(sum(words(line.gcode).get("E", 0) for line in lines)
+               - extruded) < 1e-4
+
+
+def test_arcs_stay_within_tolerance():
+    """The original points lie on the fitted arcs"""
+    gcodes = circle_gcodes(segments=48, turn=1.5 * pi, clockwise=True)
+    position = (120.0, 100.0)
+    originals = iter(gcodes[3:])
+    for line in fit(gcodes)[3:]:
+        assert line.gcode.startswith("G2")
+        parameters = words(line.gcode)
+        center = (position[0] + parameters["I"],
+                  position[1] + parameters["J"])
+        radius = hypot(position[0] - center[0], position[1] - center[1])
+        while True:
+            point = words(next(originals))
+            distance = hypot(point["X"] - center[0], point["Y"] - center[1])
+            assert abs(distance - radius) <= TOLERANCE
+            if (point["X"], point["Y"]) == (parameters["X"],
+                                            parameters["Y"]):
+                break
+        position = (parameters["X"], parameters["Y"])
+
+
+def test_lines_stay():
+    """Straight moves are not arcs"""
+    gcodes = ["G90", "M83", "G1 X0 Y0"] + [
+        f"G1 X{number} Y{number * 2} E.1" for number in range(1, 20)]
+    assert [line.gcode for line in fit(gcodes)] == gcodes
+
+
+def test_unknown_position():
+    """Nothing gets fitted after homing, before the position is known"""
+    gcodes = ["G90", "M83", "G28"] + [
+        f"G1 X{100 + 20 * cos(angle / 10):.3f} E.1"
+        for angle in range(1, 20)]
+    assert [line.gcode for line in fit(gcodes)] == gcodes
+
+
+def test_relative_positioning():
+    """Only the absolute moves get fitted"""
+    gcodes = circle_gcodes()
+    gcodes.insert(3, "G91")
+    assert [line.gcode for line in fit(gcodes)] == gcodes
+
+
+def test_feed_rate_change_splits():
+    """A new feed rate starts a new arc, which keeps it"""
+    gcodes = circle_gcodes(segments=16)
+    gcodes[12] += " F1200"
+    lines = fit(gcodes)
+    with_feed_rate = [line for line in lines if "F1200" in line.gcode]
+    assert len(with_feed_rate) == 1
+    assert with_feed_rate[0].line_index >= 12
@@ -0,0 +1,116 @@
+"""Tests for the autoreport handlers, fuzzed with random reports"""
+import random
+from unittest.mock import Mock
+
+import pytest
+
+from prusa.link.printer_adapter.auto_telemetry import \
+    AutoTelemetry  # type:ignore
+from prusa.link.printer_adapter.structures.model_classes import Telemetry
+from prusa.link.printer_adapter.structures.regular_expressions import (
+    FAN_REGEX, HEATING_HOTEND_REGEX, HEATING_REGEX, POSITION_REGEX,
+    TEMPERATURE_REGEX)
+
+
+def decimal(rng: random.Random) -> str:
+    """A random number of the -?\\d+\\.\\d+ format"""
+    sign = rng.choice(("", "-"))
+    fraction = str(rng.randint(0, 999)).zfill(rng.randint(1, 3))
+    return f"{sign}{rng.randint(0, 400)}.{fraction}"
+
+
+def integer(rng: random.Random) -> str:
+    """A random number of the \\d+ format"""
+    return str(rng.randint(0, 9999))
+
+
+def temperature_line(rng: random.Random) -> str:
+    """A random temperature autoreport"""
+    line = f"T:{decimal(rng)} /{decimal(rng)} B:{decimal(rng)} " \
+           f"/{decimal(rng)} T0:{decimal(rng)} /{decimal(rng)} " \
+           f"@:{integer(rng)} B@:{integer(rng)} P:{decimal(rng)}"
+    if rng.random() < 0.5:
+        line += f" A:{decimal(rng)}"
+    return line
+
+
+def heating_line(rng: random.Random) -> str:
+    """A random report of the M109 or M190 heating"""
+    return f"T:{decimal(rng).lstrip('-')} E:{integer(rng)} " \
+           f"B:{decimal(rng).lstrip('-')}"
+
+
+def heating_hotend_line(rng: random.Random) -> str:
+    """A random report of the M109 heating"""
+    return f"T:{decimal(rng).lstrip('-')} E:{integer(rng)} " \
+           f"W:{rng.choice(('?', integer(rng)))}"
+
+
+def position_line(rng: random.Random) -> str:
+    """A random position autoreport"""
+    return f"X:{decimal(rng)} Y:{decimal(rng)} Z:{decimal(rng)} " \
+           f"E:{decimal(rng)} Count X: {decimal(rng)} Y:{decimal(rng)} " \
+           f"Z:{decimal(rng)} E:{decimal(rng)}"
+
+
+def fan_line(rng: random.Random) -> str:
+    """A random fan autoreport"""
+    return f"E0:{integer(rng)} RPM PRN1:{integer(rng)} RPM " \
+           f"E0@:{integer(rng)} PRN1@:{integer(rng)}"
+
+
+def expected_temps(match):
+    """What the handler used to put into the Telemetry model"""
+    values = match.groupdict()
+    telemetry = Telemetry(temp_nozzle=values["ntemp"])
+    if "btemp" in values:
+        telemetry.temp_bed = float(values["btemp"])
+    if "set_ntemp" in values and "set_btemp" in values:
+        telemetry.target_nozzle = float(values["set_ntemp"])
+        telemetry.target_bed = float(values["set_btemp"])
+    return telemetry
+
+
+def expected_positions(match):
+    """What the handler used to put into the Telemetry model"""
+    return Telemetry(axis_x=match.group("x"), axis_y=match.group("y"),
+                     axis_z=match.group("z"))
+
+
+def expected_fans(match):
+    """What the handler used to put into the Telemetry model"""
+    return Telemetry(fan_extruder=match.group("hotend_rpm"),
+                     fan_hotend=match.group("hotend_rpm"),
+                     fan_print=match.group("print_rpm"),
+                     target_fan_extruder=match.group("hotend_power"),
+                     target_fan_hotend=match.group("hotend_power"),
+                     target_fan_print=match.group("print_power"))
+
+
+@pytest.mark.parametrize("regexp, make_line, handler, expected", [
+    (TEMPERATURE_REGEX, temperature_line, "temps_recorded", expected_temps),
+    (HEATING_REGEX, heating_line, "temps_recorded", expected_temps),
+    (HEATING_HOTEND_REGEX, heating_hotend_line, "temps_recorded",
+     expected_temps),
+    (POSITION_REGEX, position_line, "positions_recorded",
+     expected_positions),
+    (FAN_REGEX, fan_line, "fans_recorded", expected_fans),
+])
+def test_handlers(regexp, make_line, handler, expected):
+    """
+    The handlers pass the same values of the same types,
+    as the Telemetry model would hold
+    """
+    auto_telemetry = Mock()
+    rng = random.Random(49)
+    for _ in range(500):
+        line = make_line(rng)
+        match = regexp.match(line)
+        assert match is not None, line
+        getattr(AutoTelemetry, handler)(auto_telemetry, Mock(), match)
+        values = auto_telemetry.telemetry_passer.set_telemetry_values. \
+            call_args.args[0]
+        telemetry = expected(match).dict(exclude_none=True)
+        assert values == telemetry, line
+        assert [type(value) for value in values.values()] == \
+               [type(value) for value in telemetry.values()], line
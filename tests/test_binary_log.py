@@ -0,0 +1,83 @@
+"""Tests for the memory mapped binary log"""
+# pylint: disable=redefined-outer-name
+import logging
+from unittest import mock
+
+import pytest
+
+from prusa.link.binary_log import (HEADER, RECORD, BinaryLog,
+                                   read_binary_log)
+from prusa.link.const import BINARY_LOG_TEMPLATE_SIZE
+
+RING_SIZE = 1024
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    """Where the log file goes"""
+    return str(tmp_path / "log.bin")
+
+
+def clocks(wall, boot):
+    """Patches the clocks, as if the system booted boot seconds ago"""
+    return mock.patch.multiple("prusa.link.binary_log",
+                               time=lambda: wall,
+                               monotonic=lambda: boot)
+
+
+def open_log(log_path):
+    """A binary log with a small ring"""
+    return BinaryLog(log_path, HEADER.size + BINARY_LOG_TEMPLATE_SIZE
+                     + RING_SIZE)
+
+
+def test_round_trip(log_path):
+    """The records decode back, the argument types are kept"""
+    binary_log = open_log(log_path)
+    args = (None, True, -5, 2.5, "text", b"\x00\xff", ["other"])
+    with clocks(1000.0, 10.0):
+        binary_log.write(10.0, "main", logging.INFO,
+                         "%s %s %s %s %s %s %s", args)
+        binary_log.write(9.5, "serial", logging.DEBUG, "no args")
+    binary_log.close()
+
+    first, second = read_binary_log(log_path)
+    assert first.timestamp == 1000.0
+    assert first.thread == "main"
+    assert first.level == logging.INFO
+    assert first.args == args[:-1] + ("['other']", )
+    assert second.timestamp == 999.5
+    assert second.format().endswith("DEBUG [serial] no args")
+
+
+def test_wrap(log_path):
+    """A full ring drops the oldest records, the rest stays in order"""
+    binary_log = open_log(log_path)
+    record_size = RECORD.size + 9
+    written = RING_SIZE // record_size * 3
+    with clocks(1000.0, 0.0):
+        for number in range(written):
+            binary_log.write(0.0, "main", logging.INFO, "%s", (number, ))
+    binary_log.close()
+
+    numbers = [record.args[0] for record in read_binary_log(log_path)]
+    assert numbers == list(range(written - len(numbers), written))
+    assert RING_SIZE // record_size - 1 <= len(numbers)
+
+
+def test_reboot(log_path):
+    """The records from before a reboot keep their time"""
+    binary_log = open_log(log_path)
+    with clocks(1000.0, 500.0):
+        binary_log.write(500.0, "main", logging.INFO, "before")
+    binary_log.close()
+
+    # Booted again, the monotonic time started over
+    binary_log = open_log(log_path)
+    with clocks(2000.0, 5.0):
+        binary_log.write(5.0, "main", logging.INFO, "after")
+    binary_log.close()
+
+    assert [(record.timestamp, record.template)
+            for record in read_binary_log(log_path)] == [
+        (1000.0, "before"), (2000.0, "after")]
@@ -0,0 +1,180 @@
+"""Tests for the local image of the printer EEPROM"""
+# pylint: disable=redefined-outer-name
+import re
+import struct
+from unittest import mock
+
+import pytest
+
+from prusa.link.const import EEPROM_MIRROR_MAX_AGE
+from prusa.link.printer_adapter.eeprom_mirror import (  # type:ignore
+    EEPROMMirror)
+from prusa.link.printer_adapter.structures.model_classes import EEPROMParams
+from prusa.link.serial.instruction import Priority
+from prusa.link.printer_adapter.structures.regular_expressions import \
+    D3_OUTPUT_REGEX
+
+READ_REGEX = re.compile(r"D3 Ax(?P<address>[0-9A-F]+) C(?P<size>\d+)")
+WRITE_REGEX = re.compile(r"D3 Ax(?P<address>[0-9A-F]+) X(?P<data>[0-9a-f]+)")
+
+
+class FakeQueue:
+    """
+    A printer with its own EEPROM, answering the D3 codes right away.
+    Can hold the writes back, like when they wait in line for a gap
+    in the print
+    """
+
+    def __init__(self):
+        self.eeprom = bytearray(4096)
+        self.messages = []
+        self.priorities = []
+        self.held = []
+        self.hold_writes = False
+
+    def enqueue_one(self, instruction, to_front=False):
+        """Sends the instruction, unless it's a held back write"""
+        assert not to_front
+        self.messages.append(instruction.message)
+        self.priorities.append(instruction.priority)
+        if WRITE_REGEX.match(instruction.message) and self.hold_writes:
+            self.held.append(instruction)
+        else:
+            self.handle(instruction)
+
+    def release(self):
+        """Sends the held back writes"""
+        for instruction in self.held:
+            self.handle(instruction)
+        self.held.clear()
+
+    def handle(self, instruction):
+        """Does what the printer would, confirms the instruction"""
+        if match := READ_REGEX.match(instruction.message):
+            address = int(match.group("address"), base=16)
+            end = address + int(match.group("size"))
+            for line_address in range(address, end, 16):
+                data = self.eeprom[line_address:min(line_address + 16, end)]
+                line = f"{line_address:04x}  {data.hex(' ')}"
+                instruction.output_captured(self, D3_OUTPUT_REGEX.match(line))
+        elif match := WRITE_REGEX.match(instruction.message):
+            address = int(match.group("address"), base=16)
+            data = bytes.fromhex(match.group("data"))
+            self.eeprom[address:address + len(data)] = data
+        instruction.sent()
+        instruction.confirm()
+
+    def reads(self):
+        """The D3 reads sent so far, forgets them"""
+        reads = [message for message in self.messages
+                 if READ_REGEX.match(message)]
+        self.messages.clear()
+        return reads
+
+
+class Clock:
+    """A monotonic clock moved by hand"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def age(self):
+        """Moves past the age, when the values need a refresh"""
+        self.now += EEPROM_MIRROR_MAX_AGE + 1
+
+
+@pytest.fixture
+def clock():
+    """The clock of the mirror"""
+    clock = Clock()
+    with mock.patch("prusa.link.printer_adapter.eeprom_mirror.monotonic",
+                    clock):
+        yield clock
+
+
+def job_id(mirror):
+    """The job id as the mirror sees it"""
+    return mirror.read(EEPROMParams.JOB_ID, ">I")[0]
+
+
+def set_job_id(queue, value):
+    """Changes the job id in the printer, like the firmware would"""
+    address, _ = EEPROMParams.JOB_ID.value
+    queue.eeprom[address:address + 4] = struct.pack(">I", value)
+
+
+@pytest.mark.usefixtures("clock")
+def test_region_read():
+    """The values near each other share the first read"""
+    queue = FakeQueue()
+    queue.eeprom[EEPROMParams.ACTIVE_SHEET.value[0]] = 3
+    set_job_id(queue, 42)
+    mirror = EEPROMMirror(queue)
+    assert job_id(mirror) == 42
+    assert mirror.read(EEPROMParams.ACTIVE_SHEET, "B")[0] == 3
+    assert queue.reads() == ["D3 AxD05 C157"]
+
+
+def test_single_refresh(clock):
+    """An old value gets refreshed on its own, not with its region"""
+    queue = FakeQueue()
+    mirror = EEPROMMirror(queue)
+    mirror.read(EEPROMParams.ACTIVE_SHEET, "B")
+    queue.reads()
+
+    queue.eeprom[EEPROMParams.ACTIVE_SHEET.value[0]] = 5
+    assert mirror.read(EEPROMParams.ACTIVE_SHEET, "B")[0] == 0
+    clock.age()
+    assert mirror.read(EEPROMParams.ACTIVE_SHEET, "B")[0] == 5
+    assert queue.reads() == ["D3 AxDA1 C1"]
+
+    mirror.invalidate()
+    mirror.read(EEPROMParams.ACTIVE_SHEET, "B")
+    assert queue.reads() == ["D3 AxD05 C157"]
+
+
+def test_dirty_write(clock):
+    """A refresh sent before the write does not bring the old value back"""
+    queue = FakeQueue()
+    set_job_id(queue, 1)
+    mirror = EEPROMMirror(queue)
+    assert job_id(mirror) == 1
+
+    queue.hold_writes = True
+    mirror.write(EEPROMParams.JOB_ID, struct.pack(">I", 2))
+    assert job_id(mirror) == 2
+    clock.age()
+    assert job_id(mirror) == 2
+    assert mirror.dirty
+
+    queue.release()
+    clock.age()
+    assert job_id(mirror) == 2
+    assert not mirror.dirty
+
+
+def test_printer_change_after_write(clock):
+    """Once written, the value follows the printer again"""
+    queue = FakeQueue()
+    mirror = EEPROMMirror(queue)
+    mirror.write(EEPROMParams.JOB_ID, struct.pack(">I", 2))
+    assert job_id(mirror) == 2
+    assert not mirror.dirty
+
+    set_job_id(queue, 3)
+    clock.age()
+    assert job_id(mirror) == 3
+
+
+@pytest.mark.usefixtures("clock")
+def test_write_priority():
+    """The writes wait for the print gaps, unless asked otherwise"""
+    queue = FakeQueue()
+    mirror = EEPROMMirror(queue)
+    mirror.write(EEPROMParams.JOB_ID, struct.pack(">I", 2))
+    mirror.write(EEPROMParams.JOB_ID, struct.pack(">I", 3),
+                 priority=Priority.CONTROL)
+    assert queue.priorities == [Priority.POLLING, Priority.CONTROL]
@@ -0,0 +1,74 @@
+"""Tests for the corrected time remaining"""
+# pylint: disable=redefined-outer-name protected-access
+from unittest import mock
+
+import pytest
+
+from prusa.link.printer_adapter.eta_estimator import (  # type:ignore
+    EtaEstimator, Ewma)
+
+
+@pytest.fixture
+def estimator(tmp_path):
+    """An estimator remembering its factors in a temporary directory"""
+    cfg = mock.Mock()
+    cfg.daemon.eta_file = str(tmp_path / "eta.json")
+    printer = mock.Mock()
+    printer.sn = "SN123"
+    estimator = EtaEstimator(cfg, printer, mock.Mock())
+    yield estimator
+    EtaEstimator._MCSingleton__instance = None
+
+
+def published(estimator):
+    """The last corrected time remaining passed into telemetry"""
+    telemetry = estimator.telemetry_passer.set_telemetry.call_args.args[0]
+    return telemetry.time_remaining_corrected
+
+
+def test_unseeded_ewma():
+    """Without an initial value, the first sample is the mean"""
+    ewma = Ewma(initial=None)
+    ewma.update(60)
+    assert ewma.mean == 60
+    ewma.update(40)
+    assert ewma.mean == pytest.approx(58)
+
+
+def test_seeded_ewma():
+    """The initial value is where the mean starts from"""
+    ewma = Ewma(initial=1.0, alpha=0.5)
+    ewma.update(2.0)
+    assert ewma.mean == 1.5
+    assert ewma.weight == 0.5
+
+
+def test_pace_first_sample(estimator):
+    """One sample of the pace is enough for a sensible estimate"""
+    with mock.patch("prusa.link.printer_adapter.eta_estimator.monotonic",
+                    side_effect=[0, 60]):
+        estimator.progress_updated(49)
+        estimator.progress_updated(50)
+    assert published(estimator) == 60 * 50
+
+
+def test_pace_steady(estimator):
+    """A steady pace keeps the estimate where it belongs"""
+    times = iter(range(0, 60 * 30, 60))
+    with mock.patch("prusa.link.printer_adapter.eta_estimator.monotonic",
+                    side_effect=lambda: next(times)):
+        for progress in range(20, 50):
+            estimator.progress_updated(progress)
+    assert published(estimator) == 60 * 51
+
+
+def test_new_print_forgets_pace(estimator):
+    """The pace is learned anew for each print"""
+    with mock.patch("prusa.link.printer_adapter.eta_estimator.monotonic",
+                    side_effect=[0, 60, 100, 110]):
+        estimator.progress_updated(10)
+        estimator.progress_updated(11)
+        estimator.new_print()
+        estimator.progress_updated(10)
+        estimator.progress_updated(11)
+    assert published(estimator) == 10 * 89
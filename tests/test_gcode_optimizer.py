@@ -0,0 +1,117 @@
+"""Tests of the G-code optimizer against the golden files"""
+import os
+from typing import Dict, List, Optional, Tuple, Union
+
+import pytest
+
+from prusa.link.printer_adapter.gcode_optimizer import (GcodeOptimizer,
+                                                        canonical_number,
+                                                        with_feed_rate)
+
+DATA = os.path.join(os.path.dirname(__file__), "gcode_optimizer")
+
+Motion = Union[str, Tuple[str, Dict[str, float]]]
+
+
+def read_gcodes(name: str) -> List[str]:
+    """The G-codes of a golden file, without comments and empty lines"""
+    with open(os.path.join(DATA, name), encoding="utf-8") as file:
+        lines = [line.split(";", 1)[0].strip() for line in file]
+    return [line for line in lines if line]
+
+
+def optimize(gcodes: List[str]) -> Tuple[List[str], GcodeOptimizer]:
+    """Runs the G-codes through a fresh optimizer"""
+    optimizer = GcodeOptimizer()
+    return [optimizer.optimize(gcode) for gcode in gcodes], optimizer
+
+
+def simulate(gcodes: List[str]) -> List[Motion]:
+    """
+    What a firmware keeping the feed rate between moves makes of the
+    G-codes. The numeric commands become their values with the feed rate
+    filled in, the rest stays as it was
+    """
+    feed_rate: Optional[float] = None
+    motions: List[Motion] = []
+    for gcode in gcodes:
+        command, *words = gcode.split()
+        if command not in {"G0", "G1", "G2", "G3", "G92"}:
+            motions.append(gcode)
+            continue
+        try:
+            parameters = {word[0]: float(word[1:]) for word in words}
+        except ValueError:
+            motions.append(gcode)
+            continue
+        if command != "G92":
+            feed_rate = parameters.get("F", feed_rate)
+            parameters["F"] = feed_rate
+        motions.append((command, parameters))
+    return motions
+
+
+def test_golden():
+    """The input gets minimized exactly like the last time"""
+    optimized, _ = optimize(read_gcodes("input.gcode"))
+    assert optimized == read_gcodes("expected.gcode")
+
+
+def test_motion_equivalence():
+    """The printer moves the same with the optimized G-codes"""
+    original = read_gcodes("input.gcode")
+    optimized, _ = optimize(original)
+    assert simulate(optimized) == simulate(original)
+
+
+def test_saved_bytes():
+    """The saved bytes add up"""
+    original = read_gcodes("input.gcode")
+    optimized, optimizer = optimize(original)
+    assert optimizer.original_bytes == sum(map(len, original))
+    assert optimizer.saved_bytes == \
+        optimizer.original_bytes - sum(map(len, optimized))
+    assert optimizer.saved_bytes > 0
+
+
+def test_feed_rate_forgotten():
+    """Other commands make the optimizer send the feed rate again"""
+    optimizer = GcodeOptimizer()
+    assert optimizer.optimize("G1 X1 F1200") == "G1 X1 F1200"
+    assert optimizer.optimize("G1 X2 F1200") == "G1 X2"
+    assert optimizer.optimize("G28") == "G28"
+    assert optimizer.optimize("G1 X3 F1200") == "G1 X3 F1200"
+    optimizer.forget()
+    assert optimizer.optimize("G1 X4 F1200") == "G1 X4 F1200"
+    # A lone feed rate has to stay, so the line does not become empty
+    assert optimizer.optimize("G1 F1200") == "G1 F1200"
+
+
+def test_with_feed_rate():
+    """After a pause, the first move gets the left out feed rate back"""
+    optimizer = GcodeOptimizer()
+    optimizer.optimize("G1 X1 F1200")
+    # Read ahead, before the pause
+    optimized = optimizer.optimize("G1 X2 F1200")
+    assert optimized == "G1 X2"
+    assert with_feed_rate(optimized, optimizer.feed_rate) == "G1 X2 F1200"
+    assert with_feed_rate("G1 X2 F600", "F1200") == "G1 X2 F600"
+    assert with_feed_rate("G28", "F1200") == "G28"
+    assert with_feed_rate("G1 X2", None) == "G1 X2"
+
+
+@pytest.mark.parametrize("number, expected", [
+    ("10.000", "10"),
+    ("+010.500", "10.5"),
+    ("-0.250", "-.25"),
+    ("-0.000", "0"),
+    ("0", "0"),
+    ("00", "0"),
+    (".5", ".5"),
+    ("7.", "7"),
+    ("-3", "-3"),
+])
+def test_canonical_number(number, expected):
+    """Numbers get shorter, but keep their value"""
+    assert canonical_number(number) == expected
+    assert float(canonical_number(number)) == float(number)
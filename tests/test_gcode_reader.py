@@ -0,0 +1,52 @@
+"""Tests for the read ahead of the printed file"""
+from unittest import mock
+
+from prusa.link.printer_adapter.gcode_optimizer import GcodeOptimizer
+from prusa.link.printer_adapter.gcode_reader import \
+    GcodeReader  # type:ignore
+
+
+def read_all(reader):
+    """Collects the lines until the reader reports the end"""
+    reader.start()
+    lines = []
+    while (line := reader.get(lambda: True)) is not None:
+        lines.append(line)
+    reader.wait_stopped()
+    return lines
+
+
+def test_read(tmp_path):
+    """Comments and empty lines are left out, the indexes are kept"""
+    path = tmp_path / "print.gcode"
+    path.write_bytes(b"; comment\nG28\n\n;LAYER_CHANGE\nG1 X10 ; move")
+    reader = GcodeReader(str(path))
+    lines = read_all(reader)
+    assert [(line.line_index, line.gcode, line.layer_change)
+            for line in lines] == [(1, "G28", False), (3, "", True),
+                                   (4, "G1 X10", False)]
+    assert lines[-1].end_offset == path.stat().st_size
+    assert reader.error is None
+
+
+def test_read_feed_rate(tmp_path):
+    """The optimized lines remember the feed rate they were sent with"""
+    path = tmp_path / "print.gcode"
+    path.write_bytes(b"G1 X1 F1200\nG1 X2 F1200\nG28\nG1 X3\n")
+    reader = GcodeReader(str(path), optimizer=GcodeOptimizer())
+    assert [(line.gcode, line.feed_rate) for line in read_all(reader)] == [
+        ("G1 X1 F1200", "F1200"), ("G1 X2", "F1200"), ("G28", None),
+        ("G1 X3", None)]
+
+
+def test_read_error(tmp_path):
+    """A failed read does not pass for the end of the file"""
+    path = tmp_path / "print.gcode"
+    path.write_bytes(b"G28\n" * 10)
+    reader = GcodeReader(str(path))
+    error = OSError("I/O error")
+    with mock.patch("prusa.link.printer_adapter.gcode_reader.open",
+                    side_effect=error):
+        lines = read_all(reader)
+    assert not lines
+    assert reader.error is error
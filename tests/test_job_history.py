@@ -0,0 +1,155 @@
+"""Tests for the job history journals"""
+# pylint: disable=redefined-outer-name
+import json
+import os
+from unittest.mock import Mock
+
+import pytest
+from prusa.connect.printer.const import State
+
+from prusa.link.printer_adapter.job_history import (  # type:ignore
+    PROGRESS, TEMPERATURES, TIMESTAMP, JobHistory, RecordType,
+    decode_records, encode_record)
+
+JOB_ID = 7
+
+
+def progress(timestamp, percent):
+    """A progress record payload"""
+    return encode_record(RecordType.PROGRESS,
+                         PROGRESS.pack(timestamp, percent, 100 - percent))
+
+
+def temperatures(timestamp, nozzle, bed):
+    """A temperatures record payload"""
+    return encode_record(
+        RecordType.TEMPERATURES,
+        TEMPERATURES.pack(timestamp, nozzle, 215, bed, float("nan")))
+
+
+def pause(timestamp):
+    """A pause event"""
+    return encode_record(RecordType.PAUSE, TIMESTAMP.pack(timestamp))
+
+
+@pytest.fixture
+def history(tmp_path):
+    """A job history in a temporary directory, printing job JOB_ID"""
+    cfg = Mock()
+    cfg.daemon.job_history_dir = str(tmp_path)
+    model = Mock()
+    model.job.get_job_id_for_api.return_value = JOB_ID
+    model.state_manager.current_state = State.PRINTING
+    return JobHistory(cfg, model)
+
+
+def test_round_trip():
+    """Encoded records decode back, the whole data is valid"""
+    data = progress(1, 10) + pause(2) + temperatures(3, 210.5, 60)
+    records, valid_length = decode_records(data)
+    assert [record_type for record_type, _ in records] == [
+        RecordType.PROGRESS, RecordType.PAUSE, RecordType.TEMPERATURES]
+    assert valid_length == len(data)
+
+
+@pytest.mark.parametrize("cut", [1, 5, 8, 12])
+def test_truncated(cut):
+    """A torn last record is left out, the ones before it are kept"""
+    whole = progress(1, 10) + pause(2)
+    records, valid_length = decode_records(whole + progress(3, 20)[:cut])
+    assert len(records) == 2
+    assert valid_length == len(whole)
+
+
+def test_corrupted():
+    """Nothing after a record with a wrong crc is trusted"""
+    first = progress(1, 10)
+    corrupted = bytearray(progress(2, 20))
+    corrupted[-1] ^= 0xFF
+    records, valid_length = decode_records(
+        first + bytes(corrupted) + pause(3))
+    assert len(records) == 1
+    assert valid_length == len(first)
+
+
+def test_unknown_type():
+    """A record of an unknown type ends the valid part"""
+    first = pause(1)
+    unknown = bytearray(pause(2))
+    unknown[0] = 99
+    records, valid_length = decode_records(first + bytes(unknown))
+    assert len(records) == 1
+    assert valid_length == len(first)
+
+
+def test_torn_tail_repaired(history):
+    """Appending to a journal cut short by a power loss cuts the tail off"""
+    valid = progress(1, 10) + pause(2)
+    with open(history.journal_path(JOB_ID), "wb") as journal:
+        journal.write(valid + progress(3, 20)[:7])
+
+    history.pending[JOB_ID] = [progress(4, 30)]
+    history.flush()
+
+    with open(history.journal_path(JOB_ID), "rb") as journal:
+        data = journal.read()
+    assert data == valid + progress(4, 30)
+    records, valid_length = decode_records(data)
+    assert len(records) == 3
+    assert valid_length == len(data)
+
+
+def test_compaction(history):
+    """Samples fold into a summary, events stay, pending ones are read too"""
+    with open(history.journal_path(JOB_ID), "wb") as journal:
+        journal.write(progress(10, 5) + temperatures(11, 200, 55)
+                      + pause(12) + progress(20, 40)
+                      + temperatures(21, 215, 60))
+    history.compact(JOB_ID)
+    history.pending[JOB_ID] = [progress(30, 50)]
+
+    result = history.get_history(JOB_ID)
+    assert [event["type"] for event in result["events"]] == ["PAUSE"]
+    assert len(result["samples"]) == 1
+    summary = result["summary"]
+    assert summary["samples"] == 4
+    assert summary["pauses"] == 1
+    assert summary["started"] == 10
+    assert summary["ended"] == 21
+    assert summary["last_progress"] == 40
+    assert summary["max_temp_nozzle"] == 215
+    assert summary["max_temp_bed"] == 60
+    assert not os.path.exists(history.journal_path(JOB_ID) + ".tmp")
+
+
+def test_compaction_merges_summaries(history):
+    """Compacting twice keeps the counts of the first compaction"""
+    with open(history.journal_path(JOB_ID), "wb") as journal:
+        journal.write(progress(10, 5) + temperatures(11, 200, 55))
+    history.compact(JOB_ID)
+    with open(history.journal_path(JOB_ID), "ab") as journal:
+        journal.write(progress(20, 40) + temperatures(21, 190, 70))
+    history.compact(JOB_ID)
+
+    with open(history.journal_path(JOB_ID), "rb") as journal:
+        records, _ = decode_records(journal.read())
+    assert [record_type for record_type, _ in records] == [
+        RecordType.SUMMARY]
+    summary = json.loads(records[0][1])
+    assert summary["samples"] == 4
+    assert summary["started"] == 10
+    assert summary["ended"] == 21
+    assert summary["max_temp_nozzle"] == 200
+    assert summary["max_temp_bed"] == 70
+
+
+def test_compaction_of_damaged_journal(history):
+    """Compaction keeps what's valid and drops the torn tail"""
+    with open(history.journal_path(JOB_ID), "wb") as journal:
+        journal.write(pause(1) + progress(2, 10) + progress(3, 20)[:9])
+    history.compact(JOB_ID)
+
+    result = history.get_history(JOB_ID)
+    assert len(result["events"]) == 1
+    assert result["summary"]["samples"] == 1
+    assert result["summary"]["last_progress"] == 10
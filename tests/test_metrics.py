@@ -0,0 +1,43 @@
+"""Tests for the Prometheus export of the metrics"""
+from prusa.link.metrics import BOUNDS, Histogram, MetricsRegistry
+
+
+def buckets(lines):
+    """The le labels and the counts of the bucket lines"""
+    result = []
+    for line in lines:
+        if "_bucket" not in line:
+            continue
+        labels, count = line.rsplit(" ", 1)
+        result.append((labels.split('le="')[1].rstrip('"}'), int(count)))
+    return result
+
+
+def test_histogram_buckets():
+    """Every bucket gets exported, counting everything up to its bound"""
+    histogram = Histogram()
+    histogram.observe(BOUNDS[2])
+    histogram.observe(BOUNDS[5] * 0.99)
+    histogram.observe(BOUNDS[-1] * 2)
+    exported = buckets(histogram.export("test", ()))
+
+    assert [bound for bound, _ in exported] == \
+           [str(bound) for bound in BOUNDS] + ["+Inf"]
+    counts = [count for _, count in exported]
+    assert counts[:2] == [0, 0]
+    assert counts[2:5] == [1, 1, 1]
+    assert set(counts[5:-1]) == {2}
+    assert counts[-1] == 3
+    assert counts == sorted(counts)
+
+
+def test_registry_export():
+    """The series of one name share the help and type lines"""
+    registry = MetricsRegistry()
+    registry.counter("test_total", "Things counted", kind="a").inc()
+    registry.counter("test_total", "Things counted", kind="b").inc(2)
+    assert registry.export() == (
+        "# HELP test_total Things counted\n"
+        "# TYPE test_total counter\n"
+        'test_total{kind="a"} 1\n'
+        'test_total{kind="b"} 2\n')
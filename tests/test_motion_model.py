@@ -0,0 +1,82 @@
+"""Tests for the motion time model of USB prints"""
+from unittest import mock
+
+import pytest
+
+from prusa.link.const import LimitsMK3S
+from prusa.link.printer_adapter.motion_model import \
+    MotionModel  # type:ignore
+
+
+class Limits(LimitsMK3S):
+    """Round numbers to compute the expected times with"""
+    max_feedrate_x = 200
+    max_feedrate_y = 200
+    max_feedrate_z = 10
+    max_feedrate_e = 100
+    acceleration = 1000
+
+
+def model_of(gcodes):
+    """Feeds the G-codes, one byte offset per line, returns the model"""
+    model = MotionModel(Limits)
+    for offset, gcode in enumerate(gcodes, start=1):
+        model.feed(gcode, offset)
+    model.finish()
+    return model
+
+
+@pytest.mark.parametrize("gcodes, expected", [
+    # Reaches 100 mm/s: 1 s cruising plus 0.1 s of speeding up and down
+    (["G1 X100 F6000"], 1.1),
+    # Too short to reach the speed, triangular profile
+    (["G1 X4 F6000"], 2 * (4 / 1000)**0.5),
+    # The Z limit of 10 mm/s slows the whole move down
+    (["G1 Z10 F6000"], 1 + 10 / 1000),
+    # Extruder only moves go by the extruded length
+    (["M83", "G1 E5 F600", "G1 E5"], 2 * (0.5 + 10 / 1000)),
+    # Relative moves add up, absolute ones don't move when repeated
+    (["G91", "G1 X50 F6000", "G1 X50"], 2 * (0.5 + 0.1)),
+    (["G1 X100 F6000", "G1 X100"], 1.1),
+    # Dwells in milliseconds and in seconds
+    (["G4 P500", "G4 S2"], 2.5),
+    # G92 and G28 don't take time, but move the starting point
+    (["G1 X100 F6000", "G92 X0", "G1 X100"], 2.2),
+    (["G1 X100 F6000", "G28 X", "G1 X100"], 2.2),
+])
+def test_move_times(gcodes, expected):
+    """The total time of simple moves matches the trapezoid formulas"""
+    assert model_of(gcodes).total_time == pytest.approx(expected)
+
+
+def test_chunking():
+    """Splitting the moves into chunks doesn't change the times"""
+    gcodes = ["G1 X10 Y5 F3000", "G4 P250", "G1 X20 Y30", "G1 Z0.2 F600",
+              "G1 X0 Y0 E3 F4800", "M83", "G1 E-2 F2100", "G1 X5 Y5"]
+    whole = model_of(gcodes)
+    with mock.patch(
+            "prusa.link.printer_adapter.motion_model.MOTION_CHUNK_SIZE", 2):
+        chunked = model_of(gcodes)
+    assert chunked.total_time == pytest.approx(whole.total_time)
+
+
+def test_time_at():
+    """The table maps the byte offsets to the time spent up to them"""
+    with mock.patch("prusa.link.printer_adapter.motion_model."
+                    "MOTION_TABLE_RESOLUTION", 1):
+        model = model_of(["G1 X100 F6000", "G4 S2", "G1 X0"])
+    assert model.time_at(0) == 0
+    assert model.time_at(1) == pytest.approx(1.1)
+    assert model.time_at(2) == pytest.approx(3.1)
+    assert model.time_at(3) == pytest.approx(4.2)
+    assert model.time_at(1000) == pytest.approx(4.2)
+    # Between the entries, the time gets interpolated
+    assert model.time_at(1.5) == pytest.approx(2.1)
+
+
+def test_not_finished():
+    """Asking before the table is assembled is an error"""
+    model = MotionModel(Limits)
+    model.feed("G1 X100 F6000", 10)
+    with pytest.raises(RuntimeError):
+        model.time_at(5)
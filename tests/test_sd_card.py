@@ -0,0 +1,101 @@
+"""Tests for parsing the SD card file listing"""
+# pylint: disable=redefined-outer-name
+import pytest
+
+from prusa.link.printer_adapter.filesystem.sd_card import (  # type:ignore
+    FileTreeParser)
+from prusa.link.printer_adapter.filesystem.sd_index import SDIndex
+from prusa.link.printer_adapter.structures.regular_expressions import \
+    LFN_CAPTURE
+
+LONG_NAME = "a_file_name_that_is_longer_than_the_printer_can_show"
+ALTERNATIVE_NAME = f"longna~1.gco - ({LONG_NAME}).gcode"
+
+LISTING = [
+    "Begin file list",
+    'A.GCO 0x5a8c6b4d 100 "a.gcode"',
+    'DIR_ENTER: /.HIDDEN/ ".hidden"',
+    '/.HIDDEN/B.GCO 200 "b.gcode"',
+    "DIR_EXIT",
+    'DIR_ENTER: /FOLDER~1/ "Folder"',
+    '/FOLDER~1/C.GCO 300 "c.gcode"',
+    'DIR_ENTER: /FOLDER~1/SUB/ "sub"',
+    '/FOLDER~1/SUB/D.GCO 400 "d.gcode"',
+    "DIR_EXIT",
+    f'/FOLDER~1/LONGNA~1.GCO 500 "{LONG_NAME}"',
+    "/FOLDER~1/NOLFN.GCO 600",
+    "DIR_EXIT",
+    'Z.GCO 700 "z.gcode"',
+    "End file list",
+]
+
+LFN_TO_SFN = {
+    "/a.gcode": "/a.gco",
+    "/.hidden/b.gcode": "/.hidden/b.gco",
+    "/Folder/c.gcode": "/folder~1/c.gco",
+    "/Folder/sub/d.gcode": "/folder~1/sub/d.gco",
+    f"/Folder/{ALTERNATIVE_NAME}": "/folder~1/longna~1.gco",
+    "/z.gcode": "/z.gco",
+}
+
+MIXED_TO_LFN = {
+    "/a.gcode": "/a.gcode",
+    "/.hidden/b.gcode": "/.hidden/b.gcode",
+    "/folder~1/c.gcode": "/Folder/c.gcode",
+    "/folder~1/sub/d.gcode": "/Folder/sub/d.gcode",
+    f"/folder~1/{LONG_NAME}": f"/Folder/{ALTERNATIVE_NAME}",
+    "/z.gcode": "/z.gcode",
+}
+
+
+@pytest.fixture
+def matches():
+    """The captured lines of the listing"""
+    return [LFN_CAPTURE.match(line) for line in LISTING]
+
+
+def tree_of(node):
+    """The names of the tree nodes, in their order"""
+    return [(name, tree_of(child) if child.is_dir else child.size)
+            for name, child in node.children.items()]
+
+
+def check(parser):
+    """The parser got everything from the listing"""
+    assert parser.lfn_to_sfn_paths == LFN_TO_SFN
+    assert parser.sfn_to_lfn_paths == {
+        short: long for long, short in LFN_TO_SFN.items()}
+    assert parser.mixed_to_lfn_paths == MIXED_TO_LFN
+    # In the order of the listing, without the hidden directory
+    assert tree_of(parser.tree) == [
+        ("a.gcode", 100),
+        ("Folder", [("c.gcode", 300),
+                    ("sub", [("d.gcode", 400)]),
+                    (ALTERNATIVE_NAME, 500)]),
+        ("z.gcode", 700),
+    ]
+    folder = parser.tree.children["Folder"]
+    assert folder.attrs["sfn"] == "FOLDER~1"
+    assert folder.children[ALTERNATIVE_NAME].attrs["filename_too_long"]
+    assert "m_timestamp" in parser.tree.children["a.gcode"].attrs
+
+
+def test_parse(matches):
+    """The tree and the path translations follow the listing"""
+    check(FileTreeParser(matches))
+
+
+def test_parse_indexed(matches, tmp_path):
+    """The directories listed the same way before are not parsed again"""
+    index = SDIndex(str(tmp_path / "sd_index.json"))
+    assert FileTreeParser(matches, index).reused == 0
+    parser = FileTreeParser(matches, index)
+    assert parser.reused == 4
+    check(parser)
+
+
+def test_unexpected_output(matches):
+    """An incomplete listing is ignored"""
+    parser = FileTreeParser(matches[:-1])
+    assert not parser.tree.children
+    assert not parser.lfn_to_sfn_paths
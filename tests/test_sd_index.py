@@ -0,0 +1,120 @@
+"""Tests for the path trie and the on-disk SD index"""
+# pylint: disable=redefined-outer-name
+import json
+from unittest import mock
+
+import pytest
+
+from prusa.link.printer_adapter.filesystem.sd_index import (
+    INDEX_VERSION, FileRecord, PathTrie, SDIndex, directory_signature)
+
+RECORD = FileRecord("a.gcode", "a.gco", False, "/a.gcode", "/a.gco",
+                    "/a.gcode", 100, 1500000000)
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    """Where the index goes, in a directory not made yet"""
+    return str(tmp_path / "index" / "sd_index.json")
+
+
+def test_trie_mapping():
+    """The trie behaves like a dict keyed by paths"""
+    trie = PathTrie({"/a/b.gcode": 1, "/a/c.gcode": 2})
+    trie["/d.gcode"] = 3
+    trie["/a/b.gcode"] = 4
+    assert len(trie) == 3
+    assert trie["/a/b.gcode"] == 4
+    assert trie == {"/a/b.gcode": 4, "/a/c.gcode": 2, "/d.gcode": 3}
+
+    del trie["/a/c.gcode"]
+    assert len(trie) == 2
+    assert "/a/c.gcode" not in trie
+    assert sorted(trie) == ["/a/b.gcode", "/d.gcode"]
+
+
+def test_trie_directories():
+    """The directory parts of the paths are not keys on their own"""
+    trie = PathTrie({"/a/b.gcode": 1})
+    assert "/a" not in trie
+    assert trie.get("/a/b.gcode/c") is None
+    with pytest.raises(KeyError):
+        del trie["/a"]
+    with pytest.raises(KeyError):
+        del trie["/x/y"]
+    assert len(trie) == 1
+
+
+def test_trie_root():
+    """The root path is a key like any other"""
+    trie = PathTrie()
+    trie["/"] = 0
+    trie["/a"] = 1
+    assert trie["/"] == 0
+    assert sorted(trie) == ["/", "/a"]
+    del trie["/"]
+    assert list(trie) == ["/a"]
+
+
+def test_signature():
+    """The same listing in another directory gets parsed again"""
+    lines = ['A.GCO 100 "a.gcode"']
+    assert directory_signature("/a", lines) == \
+        directory_signature("/a", list(lines))
+    assert directory_signature("/a", lines) != \
+        directory_signature("/b", lines)
+    assert directory_signature("/a", lines) != \
+        directory_signature("/a", lines + ['B.GCO 100 "b.gcode"'])
+
+
+def test_round_trip(index_path):
+    """The saved records load back the same"""
+    index = SDIndex(index_path)
+    assert index.get("signature") is None
+    index.put("signature", [RECORD])
+    index.save()
+    assert not index.changed
+
+    assert SDIndex(index_path).get("signature") == [RECORD]
+
+
+def test_pruning(index_path):
+    """The least recently used directories get forgotten first"""
+    index = SDIndex(index_path)
+    with mock.patch("prusa.link.printer_adapter.filesystem.sd_index."
+                    "SD_INDEX_MAX_DIRECTORIES", 2):
+        index.put("first", [RECORD])
+        index.put("second", [RECORD])
+        assert index.get("first") == [RECORD]
+        index.put("third", [])
+    assert list(index.directories) == ["first", "third"]
+
+
+@pytest.mark.parametrize("content", [
+    "not json",
+    "[]",
+    json.dumps({"version": INDEX_VERSION + 1,
+                "directories": {"signature": [list(RECORD)]}}),
+    json.dumps({"version": INDEX_VERSION}),
+])
+def test_corrupt_file(index_path, tmp_path, content):
+    """An unusable index file is ignored and replaced"""
+    (tmp_path / "index").mkdir()
+    with open(index_path, "w", encoding="utf-8") as index_file:
+        index_file.write(content)
+    index = SDIndex(index_path)
+    assert not index.directories
+    index.put("signature", [RECORD])
+    index.save()
+    assert SDIndex(index_path).get("signature") == [RECORD]
+
+
+def test_corrupt_record(index_path, tmp_path):
+    """A directory with broken records gets parsed again"""
+    (tmp_path / "index").mkdir()
+    with open(index_path, "w", encoding="utf-8") as index_file:
+        json.dump({"version": INDEX_VERSION,
+                   "directories": {"signature": [["a.gcode"]]}}, index_file)
+    index = SDIndex(index_path)
+    assert index.get("signature") is None
+    assert "signature" not in index.directories
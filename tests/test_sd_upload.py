@@ -0,0 +1,123 @@
+"""Tests for writing files onto the SD card over serial"""
+# pylint: disable=redefined-outer-name
+import pytest
+
+from prusa.link.printer_adapter.filesystem.sd_upload import (  # type:ignore
+    SDUpload, is_sfn_path)
+from prusa.link.printer_adapter.structures.regular_expressions import \
+    SD_WRITE_REGEX
+
+GCODES = [f"G1 X{number}" for number in range(40)]
+
+
+class FakeQueue:
+    """
+    Confirms the instructions right away, like a printer writing them
+    onto the SD card. Can refuse to open the file and can lose
+    the exclusivity, like after a printer reset
+    """
+
+    def __init__(self, refuse=False, reset_at=None):
+        self.refuse = refuse
+        self.reset_at = reset_at
+        self.exclusive = False
+        self.closed = False
+        self.messages = []
+
+    def begin_exclusive(self):
+        """Starts the upload"""
+        self.exclusive = True
+
+    def end_exclusive(self):
+        """Ends the upload"""
+        self.exclusive = False
+
+    def enqueue_exclusive(self, instruction):
+        """Sends the instruction, confirms it"""
+        self.messages.append(instruction.message)
+        if instruction.message.startswith("M28"):
+            name = instruction.message.split()[1]
+            output = f"open failed, File: {name}" if self.refuse \
+                else f"Writing to file: {name}"
+            instruction.output_captured(self, SD_WRITE_REGEX.match(output))
+        if len(self.messages) == self.reset_at:
+            self.exclusive = False
+        instruction.sent()
+        instruction.confirm(force=not self.exclusive)
+
+    def enqueue_one(self, instruction, to_front=False):
+        """An instruction waiting in line with the others"""
+        assert to_front
+        self.messages.append(instruction.message)
+
+
+@pytest.fixture
+def source(tmp_path):
+    """A file to upload, with comments that are not worth sending"""
+    path = tmp_path / "source.gcode"
+    path.write_text("; generated\n" + "\n".join(
+        f"{gcode} ; move" for gcode in GCODES) + "\n", encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("path, valid", [
+    ("/file.gco", True),
+    ("/FOLDER/FILE.G", True),
+    ("/a/b/c~1.gco", True),
+    ("file.gco", False),
+    ("/", False),
+    ("/long_name.gco", False),
+    ("/file.gcode", False),
+    ("/file.txt", False),
+    ("/folder.ext/file.gco", False),
+    ("/fi le.gco", False),
+    ("//file.gco", False),
+])
+def test_sfn_path(path, valid):
+    """Only the 8.3 names of G-codes can be written"""
+    assert is_sfn_path(path) == valid
+
+
+def test_invalid_path(source):
+    """The upload is refused right away, without touching the printer"""
+    queue = FakeQueue()
+    with pytest.raises(ValueError):
+        SDUpload(queue, source, "/long_name.gcode")
+    assert not queue.messages
+
+
+def test_upload(source):
+    """The G-codes are written between M28 and M29, without comments"""
+    queue = FakeQueue()
+    upload = SDUpload(queue, source, "/FILE.GCO")
+    assert upload.run()
+    assert queue.messages == ["M28 /file.gco", *GCODES, "M29"]
+    assert upload.confirmed_line == len(GCODES) + 1
+    assert not queue.exclusive
+
+
+def test_refused(source):
+    """Nothing gets written or deleted, if the file cannot be opened"""
+    queue = FakeQueue(refuse=True)
+    assert not SDUpload(queue, source, "/file.gco").run()
+    assert queue.messages == ["M28 /file.gco"]
+
+
+def test_stopped(source):
+    """A stopped upload closes and deletes the incomplete file"""
+    queue = FakeQueue()
+    upload = SDUpload(queue, source, "/file.gco")
+    assert not upload.run(lambda: len(queue.messages) < 10)
+    assert queue.messages[-2:] == ["M29", "M30 /file.gco"]
+    assert "G1 X39" not in queue.messages
+    assert not queue.exclusive
+
+
+def test_interrupted(source):
+    """After a reset, the deletion waits in line with the others"""
+    queue = FakeQueue(reset_at=5)
+    upload = SDUpload(queue, source, "/file.gco")
+    assert not upload.run()
+    assert upload.interrupted
+    assert "M29" not in queue.messages
+    assert queue.messages[-1] == "M30 /file.gco"
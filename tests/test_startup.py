@@ -0,0 +1,51 @@
+"""Tests for the parallel startup phases"""
+import pytest
+
+from prusa.link.printer_adapter.startup import Startup  # type:ignore
+
+
+def failing():
+    """A phase that fails"""
+    raise RuntimeError("failed")
+
+
+def test_report():
+    """Every phase runs once its dependencies are done"""
+    done = []
+    startup = Startup()
+    startup.add("first", lambda: done.append("first"))
+    startup.add("second", lambda: done.append("second"),
+                depends_on=("first", ))
+    startup.run()
+    assert done == ["first", "second"]
+    report = startup.get_report()
+    assert report["total"] is not None
+    assert [phase["error"] for phase in report["phases"]] == [None, None]
+
+
+def test_failure_undoes():
+    """The phases that succeeded get undone, the skipped ones don't"""
+    undone = []
+    startup = Startup()
+    startup.add("first", lambda: None, undo=lambda: undone.append("first"))
+    startup.add("second", lambda: None,
+                undo=lambda: undone.append("second"))
+    startup.add("broken", failing, depends_on=("first", ),
+                undo=lambda: undone.append("broken"))
+    startup.add("skipped", lambda: None, depends_on=("broken", ),
+                undo=lambda: undone.append("skipped"))
+    with pytest.raises(RuntimeError, match="failed"):
+        startup.run()
+    assert undone == ["second", "first"]
+
+
+def test_failed_undo():
+    """A failing undo does not stop the others from being undone"""
+    undone = []
+    startup = Startup()
+    startup.add("first", lambda: None, undo=lambda: undone.append("first"))
+    startup.add("second", lambda: None, undo=failing)
+    startup.add("broken", failing)
+    with pytest.raises(RuntimeError):
+        startup.run()
+    assert undone == ["first"]
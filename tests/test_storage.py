@@ -0,0 +1,58 @@
+"""Tests for the watching of the storage directories"""
+# pylint: disable=redefined-outer-name
+import os
+from threading import Event
+from time import monotonic, sleep
+from unittest.mock import Mock, patch
+
+import pytest
+
+from prusa.link.printer_adapter.filesystem.storage import \
+    FolderStorage  # type:ignore
+
+TIMEOUT = 5
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Watches a directory, which does not exist yet"""
+    cfg = Mock()
+    cfg.printer.directories = [str(tmp_path / "parent" / "gcodes")]
+    # The temporary directory is in /tmp, which is blacklisted
+    with patch("prusa.link.printer_adapter.filesystem.storage."
+               "BLACKLISTED_PATHS", []):
+        storage = FolderStorage(Mock(), cfg)
+    yield storage
+    storage.stop()
+    storage.wait_stopped()
+
+
+def test_rescan_on_event(storage, tmp_path):
+    """A removed directory gets noticed and made again right away"""
+    directory = tmp_path / "parent" / "gcodes"
+    attached = Event()
+    storage.attached_signal.connect(lambda sender, path: attached.set(),
+                                    weak=False)
+    storage.start()
+    # The directory gets created by the first scan
+    assert attached.wait(TIMEOUT)
+    while not storage.inotify.paths:
+        sleep(0.01)
+
+    os.rmdir(directory)
+    started_at = monotonic()
+    while not directory.is_dir():
+        assert monotonic() - started_at < TIMEOUT
+        sleep(0.01)
+
+
+def test_stop_wakes(storage):
+    """The thread sleeping until an event quits right away on stop"""
+    storage.start()
+    while not storage.scanned_at:
+        sleep(0.01)
+    started_at = monotonic()
+    storage.stop()
+    storage.thread.join(TIMEOUT)
+    assert not storage.thread.is_alive()
+    assert monotonic() - started_at < 1
@@ -0,0 +1,152 @@
+"""Tests for the batching uplink to Connect"""
+import json
+from queue import Empty
+from time import sleep
+from unittest import mock
+
+import pytest
+from requests import ConnectionError as RequestsConnectionError
+
+from prusa.connect.printer import const
+from prusa.connect.printer.models import Event, Telemetry
+from prusa.link.sdk_augmentation.uplink import Uplink
+
+SERVER = "http://connect"
+
+
+def event(number):
+    """A numbered event"""
+    return Event(const.Event.INFO, const.Source.CONNECT,
+                 state=const.State.IDLE, number=number)
+
+
+def connection(status_code=200):
+    """A session responding with the given status code"""
+    conn = mock.Mock()
+    conn.request.return_value = mock.Mock(status_code=status_code)
+    return conn
+
+
+def broken_connection():
+    """A session failing to connect"""
+    conn = mock.Mock()
+    conn.request.side_effect = RequestsConnectionError("unreachable")
+    return conn
+
+
+@pytest.fixture(autouse=True)
+def short_backoff():
+    """Makes the retries come fast"""
+    with mock.patch("prusa.link.sdk_augmentation.uplink.UPLINK_MIN_BACKOFF",
+                    0.05):
+        yield
+
+
+def test_telemetry_merged():
+    """The waiting telemetry deltas become one, the newer values win"""
+    uplink = Uplink()
+    uplink.put(Telemetry(const.State.IDLE, temp_nozzle=20, temp_bed=30,
+                         job_id=5))
+    uplink.put(Telemetry(const.State.PRINTING, temp_bed=60))
+    assert uplink.qsize() == 1
+    assert uplink.get(timeout=0).to_payload() == {
+        "temp_nozzle": 20, "temp_bed": 60, "state": "PRINTING"}
+
+
+def test_events_first():
+    """Events go before the telemetry, in the order they came in"""
+    uplink = Uplink()
+    uplink.put(Telemetry(const.State.IDLE, temp_nozzle=20))
+    uplink.put(event(1))
+    uplink.put(event(2))
+    assert uplink.get(timeout=0).data == {"number": 1}
+    assert uplink.get(timeout=0).data == {"number": 2}
+    assert isinstance(uplink.get(timeout=0), Telemetry)
+    with pytest.raises(Empty):
+        uplink.get(timeout=0)
+
+
+def test_failed_send_retried():
+    """A failed event goes back to the front, after a delay"""
+    uplink = Uplink()
+    uplink.put(event(1))
+    uplink.put(event(2))
+    item = uplink.get(timeout=0)
+    with pytest.raises(RequestsConnectionError):
+        item.send(broken_connection(), SERVER, {})
+    assert uplink.offline
+    with pytest.raises(Empty):
+        uplink.get(timeout=0)
+
+    sleep(0.06)
+    item = uplink.get(timeout=0)
+    assert item.data == {"number": 1}
+    item.send(connection(), SERVER, {})
+    assert not uplink.offline
+    assert uplink.get(timeout=0).data == {"number": 2}
+
+
+def test_failed_telemetry_merged_back():
+    """The values of a failed telemetry don't get lost"""
+    uplink = Uplink()
+    uplink.put(Telemetry(const.State.IDLE, temp_nozzle=20, temp_bed=30))
+    item = uplink.get(timeout=0)
+    uplink.put(Telemetry(const.State.IDLE, temp_bed=40))
+    assert item.send(connection(503), SERVER, {}).status_code == 503
+
+    sleep(0.06)
+    assert uplink.get(timeout=0).to_payload() == {
+        "temp_nozzle": 20, "temp_bed": 40, "state": "IDLE"}
+
+
+def test_skipped_send():
+    """An item the SDK did not send is not kept as being on its way"""
+    uplink = Uplink()
+    uplink.put(event(1))
+    uplink.get(timeout=0)
+    assert uplink.in_flight is not None
+    with pytest.raises(Empty):
+        uplink.get(timeout=0)
+    assert uplink.in_flight is None
+
+
+def test_client_error_not_retried():
+    """Connect refusing the item is not an outage"""
+    uplink = Uplink()
+    uplink.put(event(1))
+    uplink.get(timeout=0).send(connection(400), SERVER, {})
+    assert not uplink.offline
+    assert uplink.qsize() == 0
+
+
+def test_spool(tmp_path):
+    """The events of an outage survive a restart and get sent in order"""
+    spool_path = str(tmp_path / "spool.json")
+    uplink = Uplink(spool_path)
+    uplink.put(event(1))
+    with pytest.raises(RequestsConnectionError):
+        uplink.get(timeout=0).send(broken_connection(), SERVER, {})
+    uplink.put(event(2))
+    uplink.put(Telemetry(const.State.IDLE, temp_nozzle=20))
+    with open(spool_path, encoding="utf-8") as spool_file:
+        assert len(json.load(spool_file)) == 2
+
+    restarted = Uplink(spool_path)
+    conn = connection()
+    for number in (1, 2):
+        item = restarted.get(timeout=0)
+        assert item.to_payload()["data"] == {"number": number}
+        item.send(conn, SERVER, {})
+    assert conn.request.call_args.kwargs["url"] == SERVER + "/p/events"
+    assert not (tmp_path / "spool.json").exists()
+
+
+def test_spool_size():
+    """The oldest events get dropped when too many are waiting"""
+    uplink = Uplink()
+    with mock.patch("prusa.link.sdk_augmentation.uplink.UPLINK_SPOOL_SIZE",
+                    3):
+        for number in range(5):
+            uplink.put(event(number))
+    assert [uplink.get(timeout=0).data["number"] for _ in range(3)] == \
+           [2, 3, 4]